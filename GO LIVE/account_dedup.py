@@ -0,0 +1,259 @@
+import os
+from difflib import SequenceMatcher
+import pandas as pd
+from account_index import REBUILD, max_timestamp
+from bulk_export import bulk_query_frames
+from metrics import timed
+
+# 👯 Duplicitní accounty ještě před uploadem – v souboru i proti accountům v org (cache snapshotu)
+#    Normalizace názvu/e-mailu/telefonu/adresy → blokovací klíče → porovnání jen uvnitř bloků (ne všech dvojic)
+#    ACCOUNT_DEDUP=plan (výchozí) jen zapíše plán sloučení, skip navíc neodešle jisté duplicity, off vypne
+DEDUP_MODE = os.getenv("ACCOUNT_DEDUP", "plan")
+SNAPSHOT_DIR = os.getenv("DELTA_STATE_DIR", "state")
+PLAN_FILE = "accounts_merge_plan.csv"
+
+MATCH_FIELDS = ["Name", "E_mail__c", "Phone", "BillingStreet", "BillingPostalCode", "BillingCity", "BillingCountry"]
+SNAPSHOT_FIELDS = ["Id", "Import_ID__c", *MATCH_FIELDS, "LastModifiedDate"]
+PLAN_COLUMNS = ["Cluster", "Role", "Zdroj", "Import_ID__c", "Salesforce_ID", *MATCH_FIELDS,
+                "Duplicita_k", "Důvod", "Skóre"]
+
+# Větší bloky (obecný název, sdílený telefon účetní firmy) se po dvojicích neporovnávají
+MAX_BLOCK_SIZE = 50
+NAME_PREFIX_LENGTH = 5
+PHONE_DIGITS = 9  # poslední číslice – bez ohledu na předvolbu (+420, 00420, 1-...)
+MIN_PHONE_DIGITS = 7
+NAME_SIMILARITY = 0.88
+ADDRESS_NAME_SIMILARITY = 0.6
+# Váhy shod; dvojice od MIN_SCORE je duplicita, od CERTAIN_SCORE jistá (ACCOUNT_DEDUP=skip ji neodešle)
+#    (sdílený e-mail/telefon bez shody názvu bývá jedna osoba s více firmami → nikdy jistá)
+MATCH_WEIGHTS = {"název": 0.6, "podobný název": 0.4, "e-mail": 0.4, "telefon": 0.3, "adresa": 0.4}
+MIN_SCORE = 0.3
+CERTAIN_SCORE = 0.8
+LEGAL_FORMS = (r"\b(?:s ?r ?o|spol|a ?s|v ?o ?s|k ?s|z ?s|llc|l ?l ?c|inc|ltd|limited|gmbh|ag|corp|corporation"
+               r"|co|company|plc|pty|bv|sa|sarl|srl|spa|oy|ab|kft|sp ?z ?o ?o)\b")
+DUPLICATE_ERROR_CODE = "DUPLICATE_LOCAL"
+
+
+class AccountDedup:
+    def __init__(self, sf, mode=DEDUP_MODE):
+        self.sf = sf
+        self.enabled = mode in ("plan", "skip")
+        self.skip = mode == "skip"
+        self.duplicates = {}  # Import_ID__c jisté duplicity → (duplicita k, důvod)
+        self.skipped_count = 0
+
+    # 🧮 Plán sloučení ze všech chunků souboru (DataFrame po prepare_accounts) a snapshotu org
+    @timed("dedup", rows_arg=None)
+    def build(self, frames):
+        file_rows = pd.concat([f[["Import_ID__c", *MATCH_FIELDS]] for f in frames], ignore_index=True)
+        org_rows = load_snapshot(self.sf)
+        # Accounty nahrané dřívějšími běhy jsou tytéž záznamy (upsert podle Import_ID__c), ne duplicity
+        org_rows = org_rows[~org_rows["Import_ID__c"].isin(file_rows["Import_ID__c"])]
+        rows = pd.concat([file_rows.assign(Zdroj="soubor", Salesforce_ID=None),
+                          org_rows.rename(columns={"Id": "Salesforce_ID"}).assign(Zdroj="org")],
+                         ignore_index=True)[["Zdroj", "Import_ID__c", "Salesforce_ID", *MATCH_FIELDS]]
+
+        keys = normalize_accounts(rows)
+        key_rows = keys.to_dict("records")
+        is_org = (rows["Zdroj"] == "org").to_numpy()
+        edges = [edge for edge in (score_pair(key_rows, i, j) for i, j in candidate_pairs(keys))
+                 if edge and not (is_org[edge[0]] and is_org[edge[1]])]
+        plan = merge_plan(rows, edges)
+        plan.to_csv(PLAN_FILE, index=False, encoding="utf-8-sig")
+
+        merged = plan[(plan["Role"] == "sloučit") & (plan["Zdroj"] == "soubor")]
+        self.duplicates = certain_duplicates(rows, edges)
+        clusters = plan["Cluster"].nunique()
+        against_org = plan.loc[plan["Zdroj"] == "org", "Cluster"].nunique()
+        print(f"👯 Duplicity accountů: {clusters} skupin ({against_org} proti org), {len(merged)} řádků souboru "
+              f"ke sloučení, z toho {len(self.duplicates)} jistých → plán {PLAN_FILE}")
+        return plan
+
+    # 🚫 ACCOUNT_DEDUP=skip – jisté duplicity se neodešlou, ve výsledcích jsou jako odmítnuté (formát Bulk API)
+    def filter(self, df, records):
+        if not self.skip or not self.duplicates:
+            return df, records, df.iloc[:0], []
+        duplicate = df["Import_ID__c"].isin(self.duplicates).to_numpy()
+        if not duplicate.any():
+            return df, records, df.iloc[:0], []
+        self.skipped_count += int(duplicate.sum())
+        print(f"👯 {int(duplicate.sum())} jistých duplicit neodesláno (viz {PLAN_FILE})")
+        rejected_response = [
+            {"success": False, "created": False, "id": None,
+             "errors": [{"statusCode": DUPLICATE_ERROR_CODE,
+                         "message": f"Duplicita k {self.duplicates[key][0]} ({self.duplicates[key][1]})",
+                         "fields": []}]}
+            for key in df.loc[duplicate, "Import_ID__c"]
+        ]
+        records = [rec for rec, dup in zip(records, duplicate) if not dup]
+        return df[~duplicate], records, df[duplicate], rejected_response
+
+
+# 📸 Snapshot accountů org v parquetu – další běhy dotahují jen změněné od posledního LastModifiedDate
+def load_snapshot(sf):
+    org = getattr(sf, "sf_instance", "default").split(".")[0]
+    path = os.path.join(SNAPSHOT_DIR, f"account_snapshot__{org}.parquet")
+    snapshot = pd.read_parquet(path) if os.path.exists(path) and not REBUILD else None
+    where = None
+    if snapshot is not None:
+        last_modified = max_timestamp(snapshot["LastModifiedDate"])
+        if last_modified is not None:
+            where = f"LastModifiedDate >= {last_modified.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+
+    pages = list(bulk_query_frames(sf, "Account", SNAPSHOT_FIELDS, where))
+    received = sum(len(p) for p in pages)
+    frames = ([snapshot] if snapshot is not None else []) + pages
+    snapshot = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SNAPSHOT_FIELDS)
+    snapshot = snapshot.drop_duplicates("Id", keep="last").reset_index(drop=True)
+    snapshot = snapshot.astype(object).where(snapshot.notna(), None)
+
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    snapshot.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    print(f"📸 Snapshot accountů org: {received} nových/změněných, celkem {len(snapshot)} ({path})")
+    return snapshot
+
+
+# 🧽 Normalizované klíče: bez diakritiky, velikosti písmen, interpunkce a právní formy
+def normalize_accounts(rows):
+    name = fold(rows["Name"]).str.replace(LEGAL_FORMS, " ", regex=True).str.split().str.join(" ")
+    phone = rows["Phone"].fillna("").astype(str).str.replace(r"\D", "", regex=True)
+    return pd.DataFrame({
+        "name": name,
+        "name_tokens": name.str.split().map(lambda tokens: " ".join(sorted(tokens))),
+        "email": rows["E_mail__c"].fillna("").astype(str).str.strip().str.lower(),
+        "phone": phone.str[-PHONE_DIGITS:].where(phone.str.len() >= MIN_PHONE_DIGITS, ""),
+        "street": fold(rows["BillingStreet"]),
+        "postal": rows["BillingPostalCode"].fillna("").astype(str).str.replace(r"\W", "", regex=True).str.upper(),
+        "city": fold(rows["BillingCity"]),
+        "country": fold(rows["BillingCountry"]),
+    })
+
+
+def fold(values):
+    text = values.fillna("").astype(str).str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    return text.str.lower().str.replace(r"[^a-z0-9]+", " ", regex=True).str.strip()
+
+
+# 🧱 Kandidátní dvojice jen uvnitř bloků se stejným klíčem → počet porovnání roste lineárně
+def candidate_pairs(keys):
+    blocks = {
+        "email": keys["email"],
+        "phone": keys["phone"],
+        "name": keys["name_tokens"],
+        "name_postal": keys["name"].str[:NAME_PREFIX_LENGTH] + "|" + keys["postal"],
+        "address": keys["street"] + "|" + keys["postal"],
+    }
+    pairs = set()
+    oversized = 0
+    for kind, block_keys in blocks.items():
+        valid = block_keys[(block_keys != "") & ~block_keys.str.startswith("|") & ~block_keys.str.endswith("|")]
+        for members in valid.groupby(valid).indices.values():
+            if len(members) < 2:
+                continue
+            if len(members) > MAX_BLOCK_SIZE:
+                oversized += 1
+                continue
+            members = valid.index[members]
+            pairs.update((a, b) for n, a in enumerate(members) for b in members[n + 1:])
+    if oversized:
+        print(f"⚠️ Dedup: {oversized} bloků nad {MAX_BLOCK_SIZE} záznamů přeskočeno (příliš obecný klíč)")
+    return sorted(pairs)
+
+
+# ⚖️ Skóre dvojice podle shodných polí → (i, j, skóre, důvod) nebo None
+def score_pair(key_rows, i, j):
+    a, b = key_rows[i], key_rows[j]
+    same_place = bool(a["postal"]) and a["postal"] == b["postal"] or bool(a["city"]) and a["city"] == b["city"]
+    place_unknown = not (a["postal"] or a["city"]) or not (b["postal"] or b["city"])
+    name_similarity = SequenceMatcher(None, a["name"], b["name"]).ratio() if a["name"] and b["name"] else 0.0
+
+    reasons = []
+    if a["name_tokens"] and a["name_tokens"] == b["name_tokens"] and (same_place or place_unknown):
+        reasons.append("název")
+    elif name_similarity >= NAME_SIMILARITY and same_place:
+        reasons.append("podobný název")
+    if a["email"] and a["email"] == b["email"]:
+        reasons.append("e-mail")
+    if a["phone"] and a["phone"] == b["phone"]:
+        reasons.append("telefon")
+    if a["street"] and a["street"] == b["street"] and a["postal"] == b["postal"] \
+            and name_similarity >= ADDRESS_NAME_SIMILARITY:
+        reasons.append("adresa")
+
+    score = round(min(1.0, sum(MATCH_WEIGHTS[r] for r in reasons)), 2)
+    return (i, j, score, ", ".join(reasons)) if score >= MIN_SCORE else None
+
+
+# 🗺️ Skupiny (union-find přes všechny hrany) → řádek plánu pro každý člen
+#    ponechává se account z org, jinak první řádek souboru; Duplicita_k = nejsilnější shoda řádku
+def merge_plan(rows, edges):
+    root = union_find(len(rows), edges)
+    best = best_edges(edges)
+    members = sorted(best)
+    if not members:
+        return pd.DataFrame(columns=PLAN_COLUMNS)
+    plan = rows.loc[members].copy()
+    label = member_labels(rows)
+    plan["Duplicita_k"] = [label[best[i][0]] for i in members]
+    plan["Skóre"] = [best[i][1] for i in members]
+    plan["Důvod"] = [best[i][2] for i in members]
+
+    plan = rank_survivors(plan, [root(i) for i in members])
+    plan["Role"] = plan["_survivor"].map({True: "ponechat", False: "sloučit"})
+    plan["Cluster"] = plan["_root"].rank(method="dense").astype(int)
+    return plan.sort_values(["Cluster", "_rank"])[PLAN_COLUMNS]
+
+
+# 🚫 Jisté duplicity pro ACCOUNT_DEDUP=skip – skupiny jen z jistých hran (slabá hrana, např. samotný telefon,
+#    by spojila různé firmy a bez přeživšího by zmizely) → Import_ID__c řádku souboru → (přeživší, důvod)
+def certain_duplicates(rows, edges):
+    certain = [edge for edge in edges if edge[2] >= CERTAIN_SCORE]
+    if not certain:
+        return {}
+    root = union_find(len(rows), certain)
+    best = best_edges(certain)
+    members = sorted(best)
+    plan = rank_survivors(rows.loc[members].copy(), [root(i) for i in members])
+    label = member_labels(rows)
+    survivor_of = {r: label[i] for i, r in zip(plan.index[plan["_survivor"]], plan["_root"][plan["_survivor"]])}
+    skipped = plan[~plan["_survivor"] & (plan["Zdroj"] == "soubor")]
+    return {rows.at[i, "Import_ID__c"]: (survivor_of[r], best[i][2]) for i, r in zip(skipped.index, skipped["_root"])}
+
+
+def union_find(n, edges):
+    parent = list(range(n))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, _, _ in edges:
+        parent[root(i)] = root(j)
+    return root
+
+
+# Nejsilnější hrana každého řádku → (druhý řádek, skóre, důvod)
+def best_edges(edges):
+    best = {}
+    for i, j, score, reason in edges:
+        for node, other in ((i, j), (j, i)):
+            if score > best.get(node, (None, -1.0))[1]:
+                best[node] = (other, score, reason)
+    return best
+
+
+def member_labels(rows):
+    return rows["Import_ID__c"].where(rows["Zdroj"] == "soubor", rows["Salesforce_ID"])
+
+
+# 🏅 Pořadí přežití ve skupině: org před souborem, v souboru nejnižší Import_ID__c (kratší = nižší číslo)
+def rank_survivors(plan, roots):
+    plan["_root"] = roots
+    plan["_rank"] = list(zip(plan["Zdroj"] != "org", plan["Import_ID__c"].fillna("").str.len(),
+                             plan["Import_ID__c"].fillna(""), plan["Salesforce_ID"].fillna("")))
+    plan = plan.sort_values(["_root", "_rank"])
+    plan["_survivor"] = ~plan["_root"].duplicated()
+    return plan
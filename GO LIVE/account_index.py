@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import pandas as pd
+from bulk_export import bulk_query_frames
+from metrics import timed
+
+# 🗂️ Lokální index (zdrojový systém, externí org ID) → Account Id, sdílený child loadery
+INDEX_DIR = os.getenv("DELTA_STATE_DIR", "state")
+# ACCOUNT_INDEX_REBUILD=1 zahodí index a načte všechny accounty znovu (např. po smazání accountů v SF)
+REBUILD = os.getenv("ACCOUNT_INDEX_REBUILD", "0") == "1"
+
+SOURCE_FIELDS = {
+    "partnerweb": "PartnerWeb_ORG_ID__c",
+    "helios": "Helios_ID__c",
+}
+
+INDEX_FIELDS = ["Id", "Import_ID__c", "Helios_ID__c", "PartnerWeb_ORG_ID__c", "LastModifiedDate"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    source TEXT NOT NULL,
+    org_id REAL NOT NULL,
+    account_id TEXT NOT NULL,
+    import_id TEXT,
+    PRIMARY KEY (source, org_id)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Při duplicitním org ID vyhrává account s nejnižším Import_ID__c (první řádek zdrojového exportu),
+# stejně jako dřívější drop_duplicates(keep="first") nad accounts_imported_out.csv
+UPSERT_SQL = """
+INSERT INTO accounts (source, org_id, account_id, import_id) VALUES (?, ?, ?, ?)
+ON CONFLICT (source, org_id) DO UPDATE SET account_id = excluded.account_id, import_id = excluded.import_id
+WHERE length(excluded.import_id) < length(accounts.import_id)
+   OR (length(excluded.import_id) = length(accounts.import_id) AND excluded.import_id <= accounts.import_id)
+"""
+
+
+class AccountIndex:
+    def __init__(self, sf):
+        org = getattr(sf, "sf_instance", "default").split(".")[0]
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        self.path = os.path.join(INDEX_DIR, f"account_index__{org}.sqlite")
+        if REBUILD and os.path.exists(self.path):
+            os.remove(self.path)
+        # Child loadery běží souběžně (run_pipeline) → delší čekání na zámek databáze
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        self.conn.executescript(SCHEMA)
+        self.maps = {}
+
+    # 🔄 Doplnění accountů změněných od poslední synchronizace (podle LastModifiedDate)
+    @timed("account_index", rows_arg=None)
+    def refresh(self, sf):
+        last_sync = self.conn.execute("SELECT value FROM meta WHERE key = 'last_modified'").fetchone()
+        where = "Import_ID__c != NULL"
+        if last_sync:
+            where += f" AND LastModifiedDate >= {last_sync[0]}"
+        # Bulk query po stránkách – první načtení celé org nedrží všechny accounty v paměti
+        received = 0
+        last_modified = None
+        for page in bulk_query_frames(sf, "Account", INDEX_FIELDS, where):
+            self.add_accounts(page)
+            received += len(page)
+            last_modified = max_timestamp(page["LastModifiedDate"], last_modified)
+        # Stránky nejsou seřazené – čas synchronizace se posune až po načtení všech
+        if last_modified is not None:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_modified', ?)",
+                                  (last_modified.strftime("%Y-%m-%dT%H:%M:%SZ"),))
+        print(f"🗂️ Index accountů: {received} nových/změněných, celkem {self.count()} klíčů ({self.path})")
+
+    # ➕ Vložení accountů z DataFrame (sloupce Id, Import_ID__c, Helios_ID__c, PartnerWeb_ORG_ID__c)
+    def add_accounts(self, accounts_df):
+        if accounts_df.empty:
+            return
+        with self.conn:
+            for source, field in SOURCE_FIELDS.items():
+                keys = pd.to_numeric(accounts_df[field], errors="coerce")
+                valid = keys.notna() & accounts_df["Id"].notna()
+                rows = zip([source] * int(valid.sum()), keys[valid].astype(float),
+                           accounts_df.loc[valid, "Id"], accounts_df.loc[valid, "Import_ID__c"].fillna(""))
+                self.conn.executemany(UPSERT_SQL, rows)
+        self.maps = {}
+
+    # 🔍 Vektorové vyhledání Account Id pro sérii org ID jednoho zdroje
+    def lookup(self, source, org_ids):
+        if source not in self.maps:
+            mapping = pd.read_sql_query("SELECT org_id, account_id FROM accounts WHERE source = ?",
+                                        self.conn, params=(source,))
+            self.maps[source] = mapping.set_index("org_id")["account_id"]
+        keys = pd.to_numeric(org_ids, errors="coerce").astype(float)
+        return keys.map(self.maps[source])
+
+    # 🔍 Vyhledání, kde se zdroj liší řádek od řádku (např. Source_Name__c u faktur)
+    def lookup_by_source(self, sources, org_ids):
+        result = pd.Series(None, index=org_ids.index, dtype=object)
+        for source in SOURCE_FIELDS:
+            mask = sources == source
+            if mask.any():
+                result[mask] = self.lookup(source, org_ids[mask])
+        return result
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+# 🕒 Nejnovější LastModifiedDate (Bulk query vrací epoch ms, REST text 2025-03-28T10:00:00.000+0000)
+def max_timestamp(values, current=None):
+    values = values.dropna()
+    if values.empty:
+        return current
+    unit = "ms" if pd.api.types.is_numeric_dtype(values) else None
+    latest = pd.to_datetime(values, unit=unit, utc=True).max()
+    return latest if current is None else max(latest, current)
+
+
+# 🗂️ Otevře index a doplní ho o změny ze Salesforce
+def open_account_index(sf):
+    index = AccountIndex(sf)
+    index.refresh(sf)
+    return index
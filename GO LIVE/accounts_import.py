@@ -1,86 +1,39 @@
 import pandas as pd
-from simple_salesforce import Salesforce
-from dotenv import load_dotenv
-import os
-import json
-import numpy as np
-
-# 🔐 Načtení přihlašovacích údajů
-load_dotenv("credentials.env")
-
-sf = Salesforce(
-    username=os.getenv("SF_USERNAME"),
-    password=os.getenv("SF_PASSWORD"),
-    security_token=os.getenv("SF_TOKEN"),
-    domain=os.getenv("SF_DOMAIN", "login")
-)
+from sf_session import connect
+from excel_stream import read_excel_chunks
+from debug_dump import open_debug_writer
+from delta_state import DeltaState
+from bulk2_upload import BULK2_ENABLED, bulk2_load
+from sobject_collections import use_collections, collections_load
+from payload import sanitize_frame, frame_records
+from preflight import Preflight
+from reconcile import ResultWriter, RESULT_COLUMNS
+from bulk_export import bulk_query_to_csv
+from metrics import stage, timed_iter, start_run
+from checkpoint import Checkpoint
+from bulk_upload import bulk_upsert
+from batch_sizing import AdaptiveBatcher
+from account_dedup import AccountDedup, MATCH_FIELDS
+from sdl_mapping import load_plan
+from compact_dtypes import text_frame
+from load_verify import LoadVerifier
+
+# ⏱️ Měření běhu (METRICS=0 vypne) – metriky se po skončení zapíší do logs/metrics/
+start_run()
+
+# 🔐 Přihlášení do Salesforce (sdílená session, viz sf_session.py)
+with stage("login"):
+    sf = connect()
 
 print("✅ Připojeno k Salesforce.")
 
-# 📥 Načtení Excelu
-df = pd.read_excel("accounts 28.3..xlsx")
-
-# ✅ Přejmenování sloupců (custom field mapping + billing adresa)
-df = df.rename(columns={
-    "E-mail": "E_mail__c",
-    "PartnerWeb Org ID": "PartnerWeb_ORG_ID__c",
-    "Helios ID": "Helios_ID__c",
-    "Name": "Name",
-    "Phone": "Phone",
-    "Blocked": "Blocked__c",
-    "Blocked at": "Blocked_on_date__c",
-    "Created at last invoice": "Last_jnvoice_date__c",
-    "Currency": "Currency__c",
-    "State": "State__c",
-    "Verified": "Verified__c",
-    "Street address": "BillingStreet",
-    "ZIP": "BillingPostalCode",
-    "City": "BillingCity",
-    "Country": "BillingCountry"
-})
-
-# ✅ Duplikace adresy pro Shipping
-df["ShippingStreet"] = df["BillingStreet"]
-df["ShippingPostalCode"] = df["BillingPostalCode"]
-df["ShippingCity"] = df["BillingCity"]
-df["ShippingCountry"] = df["BillingCountry"]
-
-# ✅ Odstranění NaN a převod na string
-df = df.fillna("").infer_objects(copy=False)
-for col in df.columns:
-    df[col] = df[col].astype(str)
-
-# ✅ Čištění adres – odstranění nebezpečných znaků
-for col in ["BillingStreet", "BillingCity", "ShippingStreet", "ShippingCity"]:
-    df[col] = df[col].str.replace(r'[\"\\]', '', regex=True)
-
-# ✅ Odstranění nových řádků z polí
-df["Name"] = df["Name"].str.replace(r'[\r\n\t]', ' ', regex=True)
-df["BillingStreet"] = df["BillingStreet"].str.replace(r'[\r\n\t]', ' ', regex=True)
-
-# ✅ Čištění telefonních čísel – odstranění mezer
-df["Phone"] = df["Phone"].str.replace(" ", "")
-
-# ✅ Převod Blocked__c a Verified__c na boolean
-df["Blocked__c"] = df["Blocked__c"].apply(lambda x: True if x in ["1", "true", "True"] else False)
-df["Verified__c"] = df["Verified__c"].apply(lambda x: True if x in ["1", "true", "True"] else False)
-
-# 🔢 Generování Import_ID__c
+# 📥 Vstupní soubor – čte se streamovaně po chuncích (EXCEL_CHUNK_SIZE řádků)
+ACCOUNTS_FILE = "accounts 28.3..xlsx"
+MAPPING_FILE = "AccountsMapping.sdl"
 IMPORT_ID_PREFIX = "ACC"
-df = df.reset_index(drop=True)
-df["Import_ID__c"] = df.index.map(lambda i: f"{IMPORT_ID_PREFIX}{str(i + 1).zfill(4)}")
 
-# ✅ Nahrazení NaN, inf, -inf, a 'nan' stringů hodnotou None
-df = df.replace([np.nan, float("inf"), float("-inf"), "nan", "NaN"], None)
-
-# ✅ Převod date polí na správný formát YYYY-MM-DD nebo None
-date_fields = ["Last_jnvoice_date__c", "Blocked_on_date__c"]
-for field in date_fields:
-    df[field] = pd.to_datetime(df[field], errors="coerce").dt.strftime("%Y-%m-%d")
-    df[field] = df[field].replace("NaT", None)
-
-# 📤 Příprava záznamů
-records = df[[
+# 📤 Pole odesílaná do Salesforce
+RECORD_FIELDS = [
     "Name",
     "Phone",
     "E_mail__c",
@@ -101,95 +54,173 @@ records = df[[
     "PartnerWeb_ORG_ID__c",
     "Helios_ID__c",
     "Import_ID__c"
-]].to_dict(orient="records")
-
-# ✅ Čištění NaN/inf/None hodnot po převodu z DataFrame
-def sanitize_record_values(rec):
-    for key, value in rec.items():
-        if isinstance(value, float):
-            if np.isnan(value) or np.isinf(value):
-                rec[key] = None
-    return rec
-
-records = [sanitize_record_values(rec) for rec in records]
-
-# 💾 Uložení všech záznamů do souboru pro analýzu
-with open("debug_records.json", "w", encoding="utf-8") as f:
-    json.dump(records, f, indent=2, ensure_ascii=False)
-print("💾 Uloženo do debug_records.json")
-
-print("\n🔍 Kontrola serializovatelnosti všech záznamů...")
-invalid_records = []
-
-for i, record in enumerate(records):
-    try:
-        json.dumps(record)
-    except Exception as e:
-        invalid_records.append((i, record, str(e)))
-
-if invalid_records:
-    print(f"\n❌ Nalezeno {len(invalid_records)} nenaserializovatelných záznamů!")
-    for i, (index, rec, err) in enumerate(invalid_records[:10]):
-        print(f"\n❌ Chybný záznam č. {index}")
-        print(json.dumps(rec, indent=2, ensure_ascii=False))
-        print("📛 Chyba:", err)
-else:
-    print("✅ Všechny záznamy jsou serializovatelné.")
-# 🔄 Upsert všech záznamů přes BULK API
-records = json.loads(json.dumps(records, default=str))
-response = sf.bulk.Account.upsert(records, external_id_field='Import_ID__c')
-
-# 📊 Vyhodnocení výsledků
-success_count = sum(1 for r in response if r.get("success"))
-update_count = sum(1 for r in response if r.get("success") and not r.get("created"))
-failures = [r for r in response if not r.get("success")]
-
-print(f"\n✅ Úspěšně nahráno: {success_count}")
-print(f"🔁 Z toho aktualizováno: {update_count}")
-print(f"❌ Selhalo: {len(failures)}")
-
-# 🧩 Zpětné mapování chyb na původní řádky v DataFrame
-for i, fail in enumerate(failures[:10]):
-    print(f"\n❌ Chyba č. {i+1}")
-    print("  ID:", fail.get('id'))
-    print("  Success:", fail.get('success'))
-    print("  Errors:", fail.get('errors'))
-    # Vyhledej původní záznam z DataFrame podle Import_ID__c
-    failed_import_id = fail.get('record', {}).get('Import_ID__c')
-    if failed_import_id:
-        original_row = df[df['Import_ID__c'] == failed_import_id]
-        if not original_row.empty:
-            print("🧾 Původní řádek v DataFrame:")
-            print(original_row.to_string(index=False))
-
-# 📝 Uložení chyb do CSV pro analýzu
-print("\n📝 Ukládám chyby do souboru accounts_import_errors.csv...")
-error_rows = []
-
-for i, fail in enumerate(failures):
-    failed_index = i  # spárování podle indexu v původním DataFrame
-    error_info = fail.get("errors", [{}])[0]
-    original_record = df.iloc[failed_index].to_dict()
-    original_record["Chyba_kód"] = error_info.get("statusCode")
-    original_record["Chyba_zpráva"] = error_info.get("message")
-    error_rows.append(original_record)
-
-if error_rows:
-    pd.DataFrame(error_rows).to_csv("accounts_import_errors.csv", index=False)
-    print("✅ Uloženo do accounts_import_errors.csv")
+]
+
+# 🗺️ Zkompilovaný plán přejmenování a transformací ze SDL
+plan = load_plan(MAPPING_FILE)
+
+# 🧹 Přejmenování, čištění a příprava záznamů pro jeden chunk
+def prepare_accounts(df):
+    df = clean_accounts(df)
+
+    # ✅ Převod Blocked__c a Verified__c na boolean, date polí na YYYY-MM-DD nebo None (transformace z SDL)
+    df = plan.transform(df)
+
+    # 🔢 Generování Import_ID__c (index pokračuje přes chunky)
+    df["Import_ID__c"] = import_ids(df.index)
+
+    # ✅ Nahrazení NaN, inf, -inf, a 'nan' stringů hodnotou None + příprava záznamů
+    df = sanitize_frame(df)
+    records = frame_records(df[RECORD_FIELDS])
+    return df, records
+
+
+# 👯 Vstup plánu duplicit – jen porovnávaná pole, vyčištěná stejně jako při uploadu (bez záznamů a transformací)
+def prepare_dedup(df):
+    df = clean_accounts(df)[MATCH_FIELDS]
+    df["Import_ID__c"] = import_ids(df.index)
+    return sanitize_frame(df)
+
+
+# 🧽 Přejmenování a čištění textu – čistí se jen sloupce, které chunk má (prepare_dedup čte jen část)
+def clean_accounts(df):
+    # ✅ Přejmenování sloupců podle SDL (billing adresa se kopíruje i do Shipping)
+    df = plan.rename(df)
+
+    # ✅ Odstranění NaN a převod na string (kategorie z LOW_MEMORY zůstávají kategoriemi)
+    df = text_frame(df)
+
+    # ✅ Čištění adres – odstranění nebezpečných znaků
+    for col in df.columns.intersection(["BillingStreet", "BillingCity", "ShippingStreet", "ShippingCity"]):
+        df[col] = df[col].str.replace(r'[\"\\]', '', regex=True)
+
+    # ✅ Odstranění nových řádků z polí
+    for col in df.columns.intersection(["Name", "BillingStreet"]):
+        df[col] = df[col].str.replace(r'[\r\n\t]', ' ', regex=True)
+
+    # ✅ Čištění telefonních čísel – odstranění mezer
+    if "Phone" in df:
+        df["Phone"] = df["Phone"].str.replace(" ", "")
+    return df
+
+
+def import_ids(index):
+    return index.map(lambda i: f"{IMPORT_ID_PREFIX}{str(i + 1).zfill(4)}")
+
+printed_failures = 0
+
+# 🧾 Výsledky se zapisují průběžně vedle původních řádků (chyby zvlášť)
+result_writer = ResultWriter("accounts_import_results.csv", "accounts_import_errors.csv")
+
+# 🐞 Debug výpis (DEBUG_DUMP) se zapisuje na pozadí po chuncích
+debug_writer = open_debug_writer("debug_records")
+
+# 🔁 Posílají se jen nové a změněné záznamy
+delta = DeltaState(sf, "Account")
+
+# 🛫 Kontrola proti metadatům Account – chybné řádky se neodesílají
+preflight = Preflight(sf, "Account")
+
+# ⏩ Hotové batche přerušeného běhu se s --resume neodesílají znovu
+checkpoint = Checkpoint(sf, "Account")
+
+# 📏 Velikost batchí se přizpůsobuje objemu dat a době zpracování napříč chunky
+batcher = AdaptiveBatcher("Account")
+
+# 👯 Duplicity v souboru i proti accountům v org – plán sloučení ještě před odesláním (ACCOUNT_DEDUP)
+dedup = AccountDedup(sf)
+
+# 🔎 Ověření nahraných accountů proti org po běhu (VERIFY_LOAD)
+verifier = LoadVerifier(sf, "Account", "accounts_verify.csv")
+if dedup.enabled:
+    # Před uploadem se čtou jen sloupce porovnávaných polí (po prvním čtení z cache Excelu)
+    dedup.build(prepare_dedup(chunk)
+                for chunk in read_excel_chunks(ACCOUNTS_FILE, usecols=plan.source_filter(MATCH_FIELDS)))
+
+# 📤 Sloupce výstupního CSV a Id vrácená upsertem (pro export bez dotazu)
+EXPORT_FIELDS = ["Id", "Name", "Import_ID__c", "Helios_ID__c", "PartnerWeb_ORG_ID__c"]
+exported_parts = []
+
+for chunk in timed_iter("excel_read", read_excel_chunks(ACCOUNTS_FILE)):
+    with stage("transform", len(chunk)):
+        df, records = prepare_accounts(chunk)
+    debug_writer.write(records)
+    print(f"\n📦 Chunk řádků {df.index[0] + 1}–{df.index[-1] + 1}")
+
+    df, records, rejected, rejected_response = preflight.validate(df, records)
+    if len(rejected):
+        result_writer.write(rejected, rejected_response)
+    df, records, duplicates, duplicate_response = dedup.filter(df, records)
+    if len(duplicates):
+        result_writer.write(duplicates, duplicate_response)
+
+    # 🔄 Upsert záznamů chunku přes BULK API
+    #    prepare_accounts vrací jen str/bool/None → záznamy jsou serializovatelné bez kontroly
+    changed = delta.changed_mask(records)
+    verifier.expect([rec for rec, c in zip(records, changed) if not c])
+    records = [rec for rec, c in zip(records, changed) if c]
+    df = df[changed]
+    if not records:
+        continue
+    progress = checkpoint.start(records, df.index)
+    pending = progress.pending(records)
+    sent = []
+    if pending:
+        with stage("upload", len(pending)):
+            if use_collections("Account", len(pending)):
+                sent = collections_load(sf, "Account", pending, external_id_field="Import_ID__c", checkpoint=progress)
+            elif BULK2_ENABLED:
+                sent = bulk2_load(sf, "Account", df.iloc[progress.todo][list(records[0])],
+                                  external_id_field="Import_ID__c", checkpoint=progress)
+            else:
+                sent = bulk_upsert(sf, "Account", pending, external_id_field="Import_ID__c", batcher=batcher,
+                                   checkpoint=progress)
+    response = progress.merge(sent)
+    delta.mark_uploaded(records, response)
+    verifier.expect(records, response)
+
+    # 📊 Vyhodnocení výsledků – spárování s původními řádky podle pozice
+    result = result_writer.write(df, response)
+    exported_parts.append(result.loc[result["Success"], ["Salesforce_ID"] + EXPORT_FIELDS[1:]]
+                          .rename(columns={"Salesforce_ID": "Id"}))
+
+    # 🧩 Ukázka chyb s původním řádkem v DataFrame
+    for _, row in result[~result["Success"]].head(max(0, 10 - printed_failures)).iterrows():
+        printed_failures += 1
+        print(f"\n❌ Chyba č. {printed_failures}")
+        print("  Import_ID__c:", row["Import_ID__c"])
+        print("  Chyba:", row["Chyba_kód"], "–", row["Chyba_zpráva"])
+        print("🧾 Původní řádek v DataFrame:")
+        print(row.drop(RESULT_COLUMNS).to_frame().T.to_string(index=False))
+
+debug_writer.close()
+delta.save()
+checkpoint.finish()
+
+print(f"\n✅ Úspěšně nahráno: {result_writer.success_count}")
+print(f"🔁 Z toho aktualizováno: {result_writer.updated_count}")
+print(f"⏭️ Beze změny (neodesláno): {delta.unchanged_count}")
+if dedup.skipped_count:
+    print(f"👯 Duplicity (neodesláno): {dedup.skipped_count}")
+print(f"❌ Selhalo: {result_writer.failure_count}")
+
+print("\n📝 Výsledky uloženy do accounts_import_results.csv")
+if result_writer.failure_count:
+    print("✅ Chyby uloženy do accounts_import_errors.csv")
 else:
     print("✅ Žádné chyby k uložení")
 
 # 📤 Výstupní CSV s importovanými záznamy (pro mapování např. kontaktů)
 print("\n📦 Generuji výstupní CSV se Salesforce ID...")
-query_fields = ["Id", "Name", "Import_ID__c", "Helios_ID__c", "PartnerWeb_ORG_ID__c"]
-query = f"SELECT {', '.join(query_fields)} FROM Account WHERE Import_ID__c != NULL"
-results = sf.query_all(query)["records"]
-
-# Vyčistíme záznamy (odstraníme Salesforce atributy)
-export_data = [{k: r.get(k) for k in query_fields} for r in results]
-
-# Uložíme do CSV
-export_df = pd.DataFrame(export_data)
-export_df.to_csv("accounts_imported_out.csv", index=False)
-print("✅ Uloženo do accounts_imported_out.csv")
\ No newline at end of file
+with stage("export"):
+    if exported_parts and delta.unchanged_count == 0 and result_writer.failure_count == 0:
+        # Všechny řádky prošly upsertem a Id máme z odpovědi → dotaz není potřeba
+        pd.concat(exported_parts).to_csv("accounts_imported_out.csv", index=False)
+        print("⚡ Id převzata z odpovědi upsertu, dotaz přeskočen")
+    else:
+        # Část accountů se neposílala nebo selhala → Id z org přes Bulk query, zápis po stránkách
+        bulk_query_to_csv(sf, "Account", EXPORT_FIELDS, "accounts_imported_out.csv", where="Import_ID__c != NULL")
+print("✅ Uloženo do accounts_imported_out.csv")
+
+# 🔎 Hodnoty v org proti odeslaným – chybějící, navíc a rozdílné záznamy (jen s VERIFY_LOAD=1)
+verifier.finish()
@@ -1,131 +1,164 @@
 import pandas as pd
 import os
-import json
-import numpy as np
-import datetime
 import warnings
-from simple_salesforce import Salesforce
-from dotenv import load_dotenv
+from sf_session import connect
+from bulk_upload import bulk_upsert, bulk_load_by_parent
+from excel_stream import read_excel_chunks
+from debug_dump import open_debug_writer
+from delta_state import DeltaState
+from bulk2_upload import BULK2_ENABLED, bulk2_load
+from sobject_collections import use_collections, collections_load
+from payload import sanitize_frame, frame_records
+from preflight import Preflight
+from reconcile import ResultWriter
+from account_index import open_account_index
+from metrics import stage, timed_iter, start_run
+from checkpoint import Checkpoint
+from batch_sizing import AdaptiveBatcher
+from sdl_mapping import load_plan
+from load_verify import LoadVerifier
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
 DEFAULT_ACCOUNT_ID = "001J900000CASu4IAH"
 DEFAULT_OUTPUT_DIR = "output"
 OBJECT_API_NAME = "Asset"
+# 🚀 Počet souběžně zpracovávaných batchí (1 = jeden bulk upsert jako dosud)
+MAX_PARALLEL_BATCHES = int(os.getenv("SF_MAX_PARALLEL_BATCHES", "1"))
+
+# ⏱️ Měření běhu (METRICS=0 vypne) – metriky se po skončení zapíší do logs/metrics/
+start_run()
 
 # 🔐 Připojení do Salesforce
-load_dotenv("credentials.env")
-sf = Salesforce(
-    username=os.getenv("SF_USERNAME"),
-    password=os.getenv("SF_PASSWORD"),
-    security_token=os.getenv("SF_TOKEN"),
-    domain=os.getenv("SF_DOMAIN", "login")
-)
+with stage("login"):
+    sf = connect()
 print("✅ Připojeno k Salesforce.")
 
-# 🧠 Funkce pro načtení SDL mappingu
-def normalize_column_name(name):
-    return name.strip().lower().replace(" ", "").replace("/", "").replace(".", "").replace("+", "")
-
-def load_sdl_mapping(path):
-    mapping = {}
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                src, tgt = line.split("=", 1)
-                mapping[normalize_column_name(src)] = tgt.strip()
-    return mapping
-
-# 🧼 Sanitizace hodnot pro Salesforce
-def sanitize_record_values(rec):
-    for key, value in rec.items():
-        if isinstance(value, float) and (np.isnan(value) or np.isinf(value)):
-            rec[key] = None
-        elif isinstance(value, (pd.Timestamp, datetime.datetime)):
-            rec[key] = value.strftime("%Y-%m-%d")
-    return rec
-
 # 📂 Načti vstupy
 assets_file = "assets 28.3.2025 - Terminals.xlsx"
 mapping_file = "AssetsMapping.sdl"
-accounts_file = "accounts_imported_out.csv"
+# 🔁 Výchozí transformace (SDL je může přepsat řádky "#@") – PartnerWeb ORG ID bývá v Excelu jako 508.0
+TRANSFORMS = ["PartnerWeb_ORG_ID__c = number integer"]
 os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
 
-# 🧭 Načti mapping a vstupní data
-mapping = load_sdl_mapping(mapping_file)
-df = pd.read_excel(assets_file)
-print("🧾 Sloupce v Excelu:", df.columns.tolist())
-df.columns = df.columns.str.strip()
-
-
-# 🏷️ Přejmenuj sloupce podle SDL
-original_columns = df.columns.tolist()
-normalized_columns = [normalize_column_name(col) for col in original_columns]
-rename_dict = {orig: mapping.get(norm, orig) for orig, norm in zip(original_columns, normalized_columns)}
-df.rename(columns=rename_dict, inplace=True)
-print("📄 Sloupce po přejmenování:", df.columns.tolist())
-
-# 🧹 PartnerWeb ORG ID
-if "PartnerWeb_ORG_ID__c" in df.columns:
-    df["PartnerWeb_ORG_ID__c"] = df["PartnerWeb_ORG_ID__c"].astype(str).str.replace(r"\.0$", "", regex=True)
-    df["PartnerWeb_ORG_ID__c"] = pd.to_numeric(df["PartnerWeb_ORG_ID__c"], errors="coerce")
-else:
-    raise KeyError("Sloupec 'PartnerWeb_ORG_ID__c' nebyl nalezen v datech.")
-
-# 🔗 Párování s accouny
-accounts_df = pd.read_csv(accounts_file)
-df = df.merge(accounts_df[["Id", "PartnerWeb_ORG_ID__c"]], on="PartnerWeb_ORG_ID__c", how="left")
-df["AccountId"] = df["Id"].fillna(DEFAULT_ACCOUNT_ID)
-df.drop(columns=["Id"], inplace=True, errors="ignore")
-
-# 🆔 Import ID
-df = df.reset_index(drop=True)
-df["Import_ID__c"] = df.index.map(lambda i: f"ASSET{str(i + 1).zfill(5)}")
-
-# 📛 Název assetu = SerialNumber (nebo fallback na Import_ID__c)
-if "SerialNumber" in df.columns:
-    df["SerialNumber"] = df["SerialNumber"].astype(str).str.strip()
-    df["Name"] = df["SerialNumber"].where(df["SerialNumber"].notna() & (df["SerialNumber"] != ""), df["Import_ID__c"])
-
-# 📅 Převod datových polí
-for col in df.select_dtypes(include=["datetime64[ns]"]).columns:
-    df[col] = df[col].dt.strftime("%Y-%m-%d")
-
-# 🧽 Finální vyčištění
-df = df.replace([np.nan, float("inf"), float("-inf"), "nan", "NaN"], None)
-records = [sanitize_record_values(r) for r in df.to_dict(orient="records")]
-
-# 💾 Debug JSON
-with open(f"{DEFAULT_OUTPUT_DIR}/assets_debug.json", "w", encoding="utf-8") as f:
-    json.dump(records, f, indent=2, ensure_ascii=False)
-print("📃 Debug uložen do assets_debug.json")
-
-# 🚀 Import do Salesforce (bez chunked)
-print("🚀 Nahrávám assety do Salesforce...")
-response = sf.bulk.__getattr__(OBJECT_API_NAME).upsert(records, external_id_field="Import_ID__c")
-
-# 📊 Výsledky
-success_count = sum(1 for r in response if r.get("success"))
-failures = [r for r in response if not r.get("success")]
-print(f"✅ Úspěšně nahráno: {success_count}")
-print(f"❌ Selhalo: {len(failures)}")
-
-# 🧾 Výpis chyb
-error_rows = []
-for i, fail in enumerate(failures):
-    original_record = df.iloc[i].copy()
-    error_info = fail.get("errors", [{}])[0]
-    original_record["Chyba_kód"] = error_info.get("statusCode")
-    original_record["Chyba_zpráva"] = error_info.get("message")
-    error_rows.append(original_record)
-
-if error_rows:
-    pd.DataFrame(error_rows).to_csv(f"{DEFAULT_OUTPUT_DIR}/assets_import_errors.csv", index=False)
+# 🧭 Zkompilovaný plán mappingu a index accountů
+plan = load_plan(mapping_file, TRANSFORMS)
+account_index = open_account_index(sf)
+
+# 🧹 Přejmenování, párování s accounty a příprava záznamů pro jeden chunk assetů
+#    row_offset = počet řádků z předchozích chunků (pro souvislé Import_ID__c)
+def prepare_assets(df, row_offset, verbose=False):
+    if verbose:
+        print("🧾 Sloupce v Excelu:", df.columns.tolist())
+    df.columns = df.columns.str.strip()
+
+    # 🏷️ Přejmenuj sloupce a převeď hodnoty podle SDL (PartnerWeb ORG ID → číslo)
+    df = plan.apply(df)
+    if verbose:
+        print("📄 Sloupce po přejmenování:", df.columns.tolist())
+
+    if "PartnerWeb_ORG_ID__c" not in df.columns:
+        raise KeyError("Sloupec 'PartnerWeb_ORG_ID__c' nebyl nalezen v datech.")
+
+    # 🔗 Párování s accouny
+    df["AccountId"] = account_index.lookup("partnerweb", df["PartnerWeb_ORG_ID__c"]).fillna(DEFAULT_ACCOUNT_ID)
+
+    # 🆔 Import ID (číslování pokračuje přes chunky)
+    df.index = pd.RangeIndex(row_offset, row_offset + len(df))
+    df["Import_ID__c"] = df.index.map(lambda i: f"ASSET{str(i + 1).zfill(5)}")
+
+    # 📛 Název assetu = SerialNumber (nebo fallback na Import_ID__c)
+    if "SerialNumber" in df.columns:
+        df["SerialNumber"] = df["SerialNumber"].astype(str).str.strip()
+        df["Name"] = df["SerialNumber"].where(df["SerialNumber"].notna() & (df["SerialNumber"] != ""), df["Import_ID__c"])
+
+    # 🧽 Finální vyčištění (NaN/inf → None, data → YYYY-MM-DD)
+    df = sanitize_frame(df)
+    records = frame_records(df)
+    return df, records
+
+row_offset = 0
+
+# 🧾 Výsledky se zapisují průběžně vedle původních řádků (chyby zvlášť)
+result_writer = ResultWriter(f"{DEFAULT_OUTPUT_DIR}/assets_import_results.csv", f"{DEFAULT_OUTPUT_DIR}/assets_import_errors.csv")
+
+# 🐞 Debug výpis (DEBUG_DUMP) se zapisuje na pozadí po chuncích
+debug_writer = open_debug_writer(f"{DEFAULT_OUTPUT_DIR}/assets_debug")
+
+# 🔁 Posílají se jen nové a změněné záznamy
+delta = DeltaState(sf, OBJECT_API_NAME)
+
+# 🛫 Kontrola proti metadatům objektu (např. sloupce, které SDL nepřejmenovalo)
+preflight = Preflight(sf, OBJECT_API_NAME)
+
+# ⏩ Hotové batche přerušeného běhu se s --resume neodesílají znovu
+checkpoint = Checkpoint(sf, OBJECT_API_NAME)
+
+# 📏 Velikost batchí se přizpůsobuje objemu dat a době zpracování napříč chunky
+batcher = AdaptiveBatcher(OBJECT_API_NAME)
+
+# 🔎 Ověření nahraných assetů proti org po běhu (VERIFY_LOAD)
+verifier = LoadVerifier(sf, OBJECT_API_NAME, f"{DEFAULT_OUTPUT_DIR}/assets_verify.csv")
+
+for chunk_number, chunk in enumerate(timed_iter("excel_read", read_excel_chunks(assets_file))):
+    with stage("transform", len(chunk)):
+        df, records = prepare_assets(chunk, row_offset, verbose=chunk_number == 0)
+    row_offset += len(df)
+    debug_writer.write(records)
+
+    # 📁 Průběžný export (hlavička jen u prvního chunku)
+    first = chunk_number == 0
+    df.to_csv(f"{DEFAULT_OUTPUT_DIR}/assets_mapped.csv", index=False, mode="w" if first else "a", header=first)
+
+    df, records, rejected, rejected_response = preflight.validate(df, records)
+    if len(rejected):
+        result_writer.write(rejected, rejected_response)
+
+    changed = delta.changed_mask(records)
+    verifier.expect([rec for rec, c in zip(records, changed) if not c])
+    records = [rec for rec, c in zip(records, changed) if c]
+    df = df[changed]
+    if not records:
+        continue
+
+    # 🚀 Import do Salesforce
+    print(f"🚀 Nahrávám assety do Salesforce (chunk {chunk_number + 1}, {len(records)} záznamů)...")
+    progress = checkpoint.start(records, df.index)
+    pending = progress.pending(records)
+    sent = []
+    if pending:
+        with stage("upload", len(pending)):
+            if use_collections(OBJECT_API_NAME, len(pending)):
+                sent = collections_load(sf, OBJECT_API_NAME, pending, external_id_field="Import_ID__c",
+                                        checkpoint=progress)
+            elif BULK2_ENABLED:
+                sent = bulk2_load(sf, OBJECT_API_NAME, df.iloc[progress.todo][list(records[0])],
+                                  external_id_field="Import_ID__c", checkpoint=progress)
+            elif MAX_PARALLEL_BATCHES > 1:
+                sent = bulk_load_by_parent(sf, OBJECT_API_NAME, pending, parent_field="AccountId",
+                                           external_id_field="Import_ID__c", max_parallel=MAX_PARALLEL_BATCHES,
+                                           batcher=batcher, checkpoint=progress)
+            else:
+                sent = bulk_upsert(sf, OBJECT_API_NAME, pending, external_id_field="Import_ID__c", batcher=batcher,
+                                   checkpoint=progress)
+    response = progress.merge(sent)
+    delta.mark_uploaded(records, response)
+    verifier.expect(records, response)
+
+    # 📊 Výsledky – spárování s původními řádky podle pozice
+    result_writer.write(df, response)
+
+debug_writer.close()
+delta.save()
+checkpoint.finish()
+print(f"✅ Úspěšně nahráno: {result_writer.success_count}")
+print(f"❌ Selhalo: {result_writer.failure_count}")
+print(f"⏭️ Beze změny (neodesláno): {delta.unchanged_count}")
+
+if result_writer.failure_count:
     print("❌ Chyby uloženy do assets_import_errors.csv")
 
-# 📁 Finální export
-df.to_csv(f"{DEFAULT_OUTPUT_DIR}/assets_mapped.csv", index=False)
-print("✅ Hotovo! Vše uloženo do složky output/")
\ No newline at end of file
+print("✅ Hotovo! Vše uloženo do složky output/")
+
+# 🔎 Hodnoty v org proti odeslaným – chybějící, navíc a rozdílné záznamy (jen s VERIFY_LOAD=1)
+verifier.finish()
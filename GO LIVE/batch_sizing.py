@@ -0,0 +1,88 @@
+import json
+import os
+import re
+
+# 📏 Adaptivní velikost batchí Bulk API v1 – batch se omezí odhadem velikosti JSON payloadu a počet záznamů
+#    se upravuje podle doby zpracování a podílu zámků/timeoutů v předchozích batchích
+#    ADAPTIVE_BATCHING=0 vypne přizpůsobování (batche jen podle limitu záznamů a bajtů)
+ADAPTIVE_BATCHING = os.getenv("ADAPTIVE_BATCHING", "1") != "0"
+MAX_BATCH_RECORDS = 10000  # limit Bulk API v1
+# Limit batche je 10 MB → rezerva na obálku a rozdíly v kódování
+BATCH_TARGET_BYTES = int(float(os.getenv("BATCH_TARGET_MB", "8")) * 1024 * 1024)
+# Salesforce zpracovává batch po 200 záznamech s 10min limitem → cílová doba batche s rezervou
+BATCH_TARGET_SECONDS = float(os.getenv("BATCH_TARGET_SECONDS", "120"))
+MIN_BATCH_RECORDS = int(os.getenv("BATCH_MIN_RECORDS", "200"))
+FAILURE_RATE_LIMIT = 0.05
+GROWTH_FACTOR = 1.5
+SHRINK_FACTOR = 0.5
+PRESSURE_ERROR_CODES = ("UNABLE_TO_LOCK_ROW",)
+TIMEOUT_PATTERN = re.compile(r"timed? ?out|CPU time", re.IGNORECASE)
+
+
+class AdaptiveBatcher:
+    def __init__(self, object_name, max_records=MAX_BATCH_RECORDS, max_bytes=BATCH_TARGET_BYTES,
+                 target_seconds=BATCH_TARGET_SECONDS, adaptive=ADAPTIVE_BATCHING):
+        self.object_name = object_name
+        self.max_records = min(max_records, MAX_BATCH_RECORDS)
+        self.min_records = min(MIN_BATCH_RECORDS, self.max_records)
+        self.max_bytes = max_bytes
+        self.target_seconds = target_seconds
+        self.adaptive = adaptive
+        # Začíná se na maximu – malé batche zbytečně platí režii jobu
+        self.limit = self.max_records
+
+    # ✂️ Postupné dělení záznamů – každý další batch už používá limit upravený voláním observe()
+    def batches(self, records):
+        start = 0
+        while start < len(records):
+            end, size = start, 0
+            while end < len(records) and end - start < self.limit:
+                record_size = record_bytes(records[end])
+                if end > start and size + record_size > self.max_bytes:
+                    break
+                size += record_size
+                end += 1
+            yield records[start:end], size
+            start = end
+
+    # 🧮 Velikost batche pro předem rozdělované batche (paralelní upload podle parentů)
+    def batch_size(self, records):
+        if not records:
+            return self.limit
+        sample = records[:: max(1, len(records) // 1000)]
+        average = sum(record_bytes(r) for r in sample) / len(sample)
+        return max(1, min(self.limit, int(self.max_bytes / max(average, 1))))
+
+    # 📈 Úprava limitu podle výsledku batche: doba zpracování (s) a chyby ze zámků/timeoutů
+    def observe(self, count, seconds, results):
+        if not self.adaptive or not count:
+            return
+        pressure = sum(1 for r in results if is_pressure_error(r)) / count
+        limit = self.limit
+        if pressure > FAILURE_RATE_LIMIT:
+            limit = int(min(limit, count) * SHRINK_FACTOR)
+            reason = f"zámky/timeouty {pressure:.0%}"
+        elif seconds > self.target_seconds:
+            limit = min(limit, int(self.target_seconds / seconds * count))
+            reason = f"zpracování {seconds:.0f} s"
+        elif count >= limit and seconds < self.target_seconds / 2:
+            limit = int(limit * GROWTH_FACTOR)
+            reason = f"zpracování {seconds:.0f} s"
+        else:
+            return
+        limit = max(self.min_records, min(self.max_records, limit))
+        if limit != self.limit:
+            print(f"📏 {self.object_name}: batch {self.limit} → {limit} záznamů ({reason})")
+            self.limit = limit
+
+
+# 📐 Odhad velikosti záznamu v JSON payloadu (Bulk API v1 posílá JSON pole záznamů)
+def record_bytes(record):
+    return len(json.dumps(record, ensure_ascii=False, default=str).encode("utf-8")) + 1
+
+
+def is_pressure_error(result):
+    if result.get("success"):
+        return False
+    return any(e.get("statusCode") in PRESSURE_ERROR_CODES or TIMEOUT_PATTERN.search(e.get("message") or "")
+               for e in result.get("errors") or [])
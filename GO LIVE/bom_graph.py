@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from metrics import timed
+
+# 🌳 Graf kusovníku nad celým katalogem – sousednost v polích (CSR) indexovaných podle kódu produktu
+#    Vstup: řádky (product, path, component, quantity, unit) – product = vrchol stromu, path = Strom ("1.2. 1."),
+#    component = kus na dané pozici; přímý rodič kusu je kus na pozici path bez posledního čísla
+TREE_PATTERN = r"(?:\d+\.\s*)+"
+ISSUE_MESSAGES = {
+    "BOM_TREE": "Nekonzistentní Strom",
+    "BOM_ORPHAN": "Sirotek ve Stromu",
+    "BOM_CYCLE": "Cyklus v kusovníku",
+}
+
+
+class BomGraph:
+    @timed("bom_graph", rows_arg=1)
+    def __init__(self, rows):
+        self.rows = rows
+        self.issue_codes = pd.Series(None, index=rows.index, dtype=object)
+        self.issue_messages = pd.Series(None, index=rows.index, dtype=object)
+        self.check_tree()
+        self.build_graph()
+        self.find_cycles()
+
+    # 🌲 Kontrola Stromu: formát čísla, duplicitní pozice, kořen = produkt, existence nadřazené pozice
+    def check_tree(self):
+        rows = self.rows
+        segments = rows["path"].str.findall(r"\d+")
+        self.depth = segments.str.len()
+        self.key = rows["product"] + "|" + segments.str.join(".")
+        self.parent_key = rows["product"] + "|" + segments.str[:-1].str.join(".")
+
+        self.flag(~rows["path"].str.fullmatch(TREE_PATTERN), "BOM_TREE", "neplatné číslo pozice ve Stromu")
+        self.flag(self.key.duplicated(), "BOM_TREE", "pozice ve Stromu je u produktu vícekrát")
+        self.flag((self.depth == 1) & (rows["component"] != rows["product"]), "BOM_TREE",
+                  "kořen stromu není samotný produkt")
+
+        # Sirotci po úrovních – chybný rodič dělá sirotky i ze všech jeho potomků
+        for depth in sorted(self.depth[self.depth > 1].unique()):
+            at_depth = self.depth == depth
+            healthy = self.issue_codes.isna()
+            healthy_keys = self.key[healthy & (self.depth == depth - 1)]
+            self.flag(at_depth & ~self.parent_key.isin(healthy_keys), "BOM_ORPHAN",
+                      "nadřazená pozice ve Stromu chybí nebo je chybná")
+
+    # 🔗 Přímé hrany rodič → kus (sloučené přes všechny stromy) jako CSR pole
+    def build_graph(self):
+        rows = self.rows
+        ok = self.issue_codes.isna()
+        component_at = pd.Series(rows["component"][ok].to_numpy(), index=self.key[ok].to_numpy())
+        edge_rows = ok & (self.depth > 1)
+        edges = pd.DataFrame({
+            "parent": self.parent_key[edge_rows].map(component_at),
+            "child": rows["component"][edge_rows],
+            "quantity": rows["quantity"][edge_rows].astype(float),
+        })
+
+        # Stejná hrana s různým množstvím v různých stromech → varování, platí první výskyt
+        quantities = edges.groupby(["parent", "child"])["quantity"].nunique()
+        self.quantity_conflicts = quantities[quantities > 1].index.tolist()
+        edges = edges.drop_duplicates(["parent", "child"])
+        self.edge_rows = edge_rows
+
+        self.codes = pd.Index(pd.unique(pd.concat([rows["product"], rows["component"]], ignore_index=True)))
+        self.units = rows.drop_duplicates("component").set_index("component")["unit"]
+        parents = self.codes.get_indexer(edges["parent"])
+        children = self.codes.get_indexer(edges["child"])
+        self.set_edges(parents, children, edges["quantity"].to_numpy())
+        self.row_parent = self.parent_key.map(component_at)
+
+    def set_edges(self, parents, children, quantities):
+        order = np.argsort(parents, kind="stable")
+        self.parents = parents[order]
+        self.children = children[order]
+        self.quantities = quantities[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.parents, minlength=len(self.codes)))])
+
+    # 🔁 Cykly: Kahn zepředu i zezadu – co zbude, leží na cyklu (nebo mezi cykly)
+    def find_cycles(self):
+        forward, self.levels = kahn(len(self.codes), self.parents, self.children)
+        backward, _ = kahn(len(self.codes), self.children, self.parents)
+        cyclic = ~forward & ~backward
+        self.cycle_codes = self.codes[cyclic].tolist()
+        if not cyclic.any():
+            self.order = np.argsort(self.levels, kind="stable")
+            return
+
+        parent_idx = self.codes.get_indexer(self.row_parent.fillna("").to_numpy())
+        child_idx = self.codes.get_indexer(self.rows["component"].to_numpy())
+        on_cycle = self.edge_rows.to_numpy() & (parent_idx >= 0) & cyclic[np.maximum(parent_idx, 0)] \
+            & (child_idx >= 0) & cyclic[np.maximum(child_idx, 0)]
+        self.flag(pd.Series(on_cycle, index=self.rows.index), "BOM_CYCLE", "kus je svým vlastním předkem")
+
+        # Graf pro rozpad a souhrny bez hran cyklu → DAG
+        keep = ~(cyclic[self.parents] & cyclic[self.children])
+        self.set_edges(self.parents[keep], self.children[keep], self.quantities[keep])
+        _, self.levels = kahn(len(self.codes), self.parents, self.children)
+        self.order = np.argsort(self.levels, kind="stable")
+
+    def flag(self, mask, code, message):
+        mask = mask & self.issue_codes.isna()
+        self.issue_codes[mask] = code
+        self.issue_messages[mask] = f"{ISSUE_MESSAGES[code]}: {message}"
+
+    # 📋 Topologické pořadí kódů – rodiče před kusy (úroveň = nejdelší cesta od vrcholu)
+    def topological_order(self):
+        return pd.DataFrame({"code": self.codes[self.order], "level": self.levels[self.order]})
+
+    # 💥 Vícestupňový rozpad pro vybrané produkty (výchozí = všechny vrcholy stromů) najednou
+    #    Vrací (product, component, level, quantity) – množství vynásobená přes všechny úrovně
+    @timed("bom_explode", rows_arg=None)
+    def explode(self, products=None):
+        products = self.rows["product"].unique() if products is None else products
+        roots = self.codes.get_indexer(pd.Index(products))
+        roots = roots[roots >= 0]
+        root, node, qty = roots, roots, np.ones(len(roots))
+        parts = []
+        for level in range(1, len(self.codes) + 1):
+            counts = self.indptr[node + 1] - self.indptr[node]
+            if not counts.any():
+                break
+            owner = np.repeat(np.arange(len(node)), counts)
+            edge = np.repeat(self.indptr[node], counts) + np.arange(counts.sum()) \
+                - np.repeat(np.cumsum(counts) - counts, counts)
+            root, node, qty = root[owner], self.children[edge], qty[owner] * self.quantities[edge]
+            parts.append(pd.DataFrame({"product": root, "component": node, "level": level, "quantity": qty}))
+        if not parts:
+            return pd.DataFrame(columns=["product", "component", "level", "quantity"])
+        exploded = pd.concat(parts, ignore_index=True)
+        exploded["product"] = self.codes[exploded["product"]]
+        exploded["component"] = self.codes[exploded["component"]]
+        return exploded
+
+    # 📦 Souhrn množství koncových kusů (bez vlastního kusovníku) na jeden kus produktu
+    def rollup(self, products=None):
+        exploded = self.explode(products)
+        leaf = self.indptr[1:] == self.indptr[:-1]
+        exploded = exploded[leaf[self.codes.get_indexer(exploded["component"])]]
+        totals = exploded.groupby(["product", "component"], sort=True)["quantity"].sum().reset_index()
+        totals["unit"] = totals["component"].map(self.units)
+        return totals
+
+    # 🛑 Řádky s chybou struktury se neodesílají – (df, records) + odmítnuté ve formátu výsledků Bulk API
+    #    source_rows = čísla řádků kusovníku odpovídající df
+    def validate(self, df, records, source_rows):
+        codes = self.issue_codes.reindex(source_rows).to_numpy()
+        invalid = pd.notna(codes)
+        if not invalid.any():
+            return df, records, df.iloc[:0], []
+        messages = self.issue_messages.reindex(source_rows).to_numpy()
+        rejected_response = [
+            {"success": False, "created": False, "id": None,
+             "errors": [{"statusCode": code, "message": message, "fields": ["Tree_Number__c"]}]}
+            for code, message in zip(codes[invalid], messages[invalid])
+        ]
+        records = [rec for rec, bad in zip(records, invalid) if not bad]
+        return df[~invalid], records, df[invalid], rejected_response
+
+    def report(self):
+        counts = self.issue_codes.value_counts()
+        print(f"🌳 Kusovník: {self.rows['product'].nunique()} produktů, {len(self.codes)} kódů, {len(self.parents)} "
+              f"přímých vazeb, {int(self.levels.max()) + 1 if len(self.levels) else 0} úrovní")
+        for code, count in counts.items():
+            print(f"⚠️ {ISSUE_MESSAGES[code]}: {count} řádků")
+        if self.cycle_codes:
+            print(f"🔁 Kódy v cyklu: {', '.join(self.cycle_codes[:20])}")
+        if self.quantity_conflicts:
+            print(f"⚠️ {len(self.quantity_conflicts)} vazeb má v různých stromech různé množství "
+                  f"(např. {' → '.join(self.quantity_conflicts[0])})")
+
+
+# 📐 Kahnův algoritmus po celých vlnách (vektorově) – vrací (zpracované uzly, úroveň uzlu)
+def kahn(n, sources, targets):
+    indegree = np.bincount(targets, minlength=n)
+    order = np.argsort(sources, kind="stable")
+    sources, targets = sources[order], targets[order]
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=n))])
+    done = np.zeros(n, dtype=bool)
+    levels = np.zeros(n, dtype=int)
+    frontier = np.flatnonzero(indegree == 0)
+    level = 0
+    while len(frontier):
+        done[frontier] = True
+        levels[frontier] = level
+        counts = indptr[frontier + 1] - indptr[frontier]
+        edge = np.repeat(indptr[frontier], counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        reached = targets[edge]
+        np.subtract.at(indegree, reached, 1)
+        frontier = np.unique(reached[indegree[reached] == 0])
+        level += 1
+    return done, levels
@@ -0,0 +1,124 @@
+import gzip
+import io
+import os
+import tempfile
+import pandas as pd
+from simple_salesforce.exceptions import SalesforceError, SalesforceOperationError
+from simple_salesforce.util import call_salesforce
+from payload import frame_payload, CSV_NULL
+from metrics import stage, timed
+from sf_session import session_retry
+
+# 🚚 Bulk API 2.0 – CSV komprimované gzipem, dávkování řeší Salesforce
+#    SF_BULK_API=2 přepne loadery na tento transport (výchozí je Bulk API 1.0 s JSON záznamy)
+BULK2_ENABLED = os.getenv("SF_BULK_API", "1") == "2"
+# Limit dat jednoho ingest jobu (150 MB po base64) → větší frame se rozdělí na více jobů
+MAX_JOB_BYTES = 100 * 1024 * 1024
+DEFAULT_POLL_WAIT = 5
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+KEY_SEPARATOR = "\x1f"
+
+
+# 📤 Nahrání DataFrame jedním ingest jobem
+#    df = přesně odesílané sloupce (výstup sanitize_frame); vrací výsledky ve formátu Bulk API 1.0
+#    ve stejném pořadí jako řádky df, takže na ně navazuje ResultWriter i DeltaState
+#    checkpoint = UploadProgress – každý dokončený job se hned zapíše; offset = pozice prvního řádku df v uploadu
+def bulk2_load(sf, object_name, df, operation="upsert", external_id_field="Import_ID__c", wait=DEFAULT_POLL_WAIT,
+               checkpoint=None, offset=0):
+    if len(df) == 0:
+        return []
+    payload = frame_payload(df)
+    if len(payload) > MAX_JOB_BYTES and len(df) > 1:
+        half = len(df) // 2
+        return (bulk2_load(sf, object_name, df.iloc[:half], operation, external_id_field, wait, checkpoint, offset)
+                + bulk2_load(sf, object_name, df.iloc[half:], operation, external_id_field, wait, checkpoint,
+                             offset + half))
+
+    key_field = external_id_field if operation == "upsert" else None
+    job_id = bulk2_call(sf, object_name, lambda client: client.create_job(operation, external_id_field=key_field))["id"]
+    error = None
+    try:
+        with stage("bulk_submit", len(df)):
+            bulk2_call(sf, object_name, lambda client: upload_csv(client, job_id, payload))
+            bulk2_call(sf, object_name, lambda client: client.close_job(job_id))
+        with stage("bulk_poll"):
+            bulk2_call(sf, object_name, lambda client: client.wait_for_job(job_id, is_query=False, wait=wait))
+    except (SalesforceError, SalesforceOperationError) as e:
+        # Job mohl část řádků zpracovat – výsledky se stáhnou i tak, zbytek dostane chybu jobu
+        error = f"Bulk 2.0 job {job_id}: {e}"
+        print(f"❌ {error}")
+        try:
+            bulk2_call(sf, object_name, lambda client: client.abort_job(job_id, is_query=False))
+        except (SalesforceError, SalesforceOperationError):
+            pass
+    results = job_results(sf, object_name, job_id, payload, key_field, error)
+    if checkpoint is not None:
+        checkpoint.batch_done(range(offset, offset + len(df)), results, job_id)
+    return results
+
+
+# 🧰 Volání klienta Bulk 2.0 sestaveného z aktuální session (po obnově session s novým tokenem)
+def bulk2_call(sf, object_name, action):
+    return session_retry(sf, lambda: action(getattr(sf.bulk2, object_name)._client))
+
+
+# 🗜️ Upload CSV komprimovaného gzipem (simple_salesforce posílá data jen nekomprimovaná)
+def upload_csv(client, job_id, payload):
+    headers = client._get_headers(client.CSV_CONTENT_TYPE, client.JSON_CONTENT_TYPE)
+    headers["Content-Encoding"] = "gzip"
+    call_salesforce(url=client._construct_request_url(job_id, False) + "/batches", method="PUT",
+                    session=client.session, headers=headers, data=gzip.compress(payload))
+
+
+# 📥 Výsledky jobu (úspěšné / chybné / nezpracované) stažené po blocích na disk → pořadí odeslaných řádků
+#    Bulk API 2.0 pořadí nezachovává: párování podle externího ID, u insertu podle obsahu řádku
+@timed("bulk_results", rows_arg=None)
+def job_results(sf, object_name, job_id, payload, key_field, error=None):
+    sent = read_results_csv(io.BytesIO(payload))
+    key_columns = [key_field] if key_field else list(sent.columns)
+    results = {}
+
+    for results_type in ("successfulResults", "failedResults"):
+        frame = download_results(sf, object_name, job_id, results_type)
+        if frame is None or frame.empty:
+            continue
+        for key, sf_id, created, sf_error in zip(row_keys(frame, key_columns), frame["sf__Id"],
+                                                 frame.get("sf__Created", pd.Series("", index=frame.index)),
+                                                 frame.get("sf__Error", pd.Series("", index=frame.index))):
+            if results_type == "successfulResults":
+                results[key] = {"success": True, "created": created.lower() == "true", "id": sf_id, "errors": []}
+            else:
+                code, _, message = sf_error.partition(":")
+                results[key] = {"success": False, "created": False, "id": sf_id or None,
+                                "errors": [{"statusCode": code, "message": message, "fields": []}]}
+
+    not_processed = {"success": False, "created": False, "id": None,
+                     "errors": [{"statusCode": "NOT_PROCESSED", "message": error or "Záznam nebyl zpracován",
+                                 "fields": []}]}
+    return [results.get(key, not_processed) for key in row_keys(sent, key_columns)]
+
+
+def download_results(sf, object_name, job_id, results_type):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        bulk2_call(sf, object_name, lambda client: client.download_ingest_results(path, job_id, results_type,
+                                                                                  chunk_size=DOWNLOAD_CHUNK_BYTES))
+        return read_results_csv(path)
+    except (SalesforceError, SalesforceOperationError, pd.errors.EmptyDataError):
+        return None
+    finally:
+        os.remove(path)
+
+
+def read_results_csv(source):
+    return pd.read_csv(source, dtype=str, keep_default_na=False)
+
+
+# 🔑 Klíč řádku z textových hodnot CSV + pořadí výskytu (shodné řádky u insertu)
+def row_keys(frame, columns):
+    values = frame[columns].replace(CSV_NULL, "")
+    joined = values[columns[0]].str.cat([values[c] for c in columns[1:]], sep=KEY_SEPARATOR) if len(columns) > 1 \
+        else values[columns[0]]
+    occurrence = joined.groupby(joined).cumcount().astype(str)
+    return (joined + KEY_SEPARATOR + occurrence).tolist()
@@ -0,0 +1,49 @@
+import time
+import pandas as pd
+from simple_salesforce.exceptions import SalesforceGeneralError
+from bulk_upload import bulk_call, bulk_get, FINISHED_BATCH_STATES, DEFAULT_POLL_WAIT
+from metrics import stage
+
+
+# 📥 Bulk API query job – výsledky po stránkách jako DataFrame (bez atributů a bez celé sady v paměti)
+#    Kroky jobu i stahování stránek jdou přes session_retry → query přežije vypršení session
+def bulk_query_frames(sf, object_name, fields, where=None, wait=DEFAULT_POLL_WAIT):
+    query = f"SELECT {', '.join(fields)} FROM {object_name}"
+    if where:
+        query += f" WHERE {where}"
+    with stage("bulk_query"):
+        job_id = bulk_call(sf, object_name, "_create_job", operation="query", use_serial=False,
+                           external_id_field=None)["id"]
+        batch_id = bulk_call(sf, object_name, "_add_batch", job_id=job_id, data=query, operation="query")["id"]
+        bulk_call(sf, object_name, "_close_job", job_id=job_id)
+        batch_info = bulk_call(sf, object_name, "_get_batch", job_id=job_id, batch_id=batch_id)
+        while batch_info["state"] not in FINISHED_BATCH_STATES:
+            time.sleep(wait)
+            batch_info = bulk_call(sf, object_name, "_get_batch", job_id=job_id, batch_id=batch_id)
+        if batch_info["state"] != "Completed":
+            raise SalesforceGeneralError("", batch_info["state"], job_id, batch_info.get("stateMessage"))
+        result_ids = bulk_get(sf, object_name, f"job/{job_id}/batch/{batch_id}/result")
+
+    for result_id in result_ids:
+        # Čas stažení stránky bez zpracování stránky volajícím
+        with stage("bulk_query") as current:
+            page = bulk_get(sf, object_name, f"job/{job_id}/batch/{batch_id}/result/{result_id}")
+            current["rows"] = len(page)
+        if page:
+            yield pd.DataFrame.from_records(page, columns=fields)
+
+
+# 💾 Průběžný zápis stránek do CSV; vrací počet zapsaných záznamů
+def frames_to_csv(frames, path, fields):
+    written = 0
+    for frame in frames:
+        frame.to_csv(path, index=False, mode="a" if written else "w", header=not written)
+        written += len(frame)
+    if not written:
+        pd.DataFrame(columns=fields).to_csv(path, index=False)
+    return written
+
+
+# 📤 Export objektu přes Bulk query rovnou do CSV
+def bulk_query_to_csv(sf, object_name, fields, path, where=None):
+    return frames_to_csv(bulk_query_frames(sf, object_name, fields, where), path, fields)
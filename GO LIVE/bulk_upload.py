@@ -0,0 +1,226 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from more_itertools import chunked
+from simple_salesforce.util import call_salesforce
+from metrics import stage
+from batch_sizing import AdaptiveBatcher
+from sf_session import session_retry
+
+# 📦 Limit Bulk API v1 je 10 000 záznamů na batch
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_EXTERNAL_ID_FIELD = "Import_ID__c"
+DEFAULT_MAX_PARALLEL = 4
+DEFAULT_POLL_WAIT = 5
+FINISHED_BATCH_STATES = ("Completed", "Failed", "NotProcessed")
+LOCK_ERROR_CODE = "UNABLE_TO_LOCK_ROW"
+DEFAULT_LOCK_RETRIES = 3
+DEFAULT_LOCK_BACKOFF = 10
+
+
+# 🔄 Bulk upsert (nebo insert) po batchích – výsledky vrací ve stejném pořadí jako vstup
+#    Velikost batchí řídí batcher (bajty payloadu + doba zpracování předchozích batchí)
+#    Každý batch = vlastní job; kroky jobu jdou jednotlivě přes session_retry, takže vypršelá session
+#    neopakuje celý batch (u insertu by vznikly duplicity)
+#    checkpoint = UploadProgress – každý dokončený batch se hned zapíše (--resume ho znovu neodešle)
+def bulk_upsert(sf, object_name, records, external_id_field=DEFAULT_EXTERNAL_ID_FIELD, batch_size=DEFAULT_BATCH_SIZE,
+                operation="upsert", batcher=None, wait=DEFAULT_POLL_WAIT, checkpoint=None):
+    batcher = batcher or AdaptiveBatcher(object_name, max_records=batch_size)
+    responses = []
+    for i, (chunk, size) in enumerate(batcher.batches(records)):
+        print(f"📦 Nahrávám batch {i+1} ({object_name}, {len(chunk)} záznamů, {size / (1024 * 1024):.1f} MB)...")
+        started = time.perf_counter()
+        job_id, batch_id, resp = run_batch_job(sf, object_name, chunk, operation, external_id_field, wait)
+        batcher.observe(len(chunk), time.perf_counter() - started, resp)
+        if checkpoint is not None:
+            checkpoint.batch_done(range(len(responses), len(responses) + len(chunk)), resp, job_id, batch_id)
+        responses.extend(resp)
+    return responses
+
+
+# 📨 Jeden batch v samostatném jobu: vytvoření, batch, uzavření, stav (hned a pak po wait s), výsledky
+#    Vrací (job_id, batch_id, výsledky)
+def run_batch_job(sf, object_name, chunk, operation, external_id_field, wait=DEFAULT_POLL_WAIT):
+    job_id = bulk_call(sf, object_name, "_create_job", operation=operation, use_serial=False,
+                       external_id_field=external_id_field if operation == "upsert" else None)["id"]
+    try:
+        batch_id = bulk_call(sf, object_name, "_add_batch", job_id=job_id, data=chunk, operation=operation)["id"]
+    finally:
+        bulk_call(sf, object_name, "_close_job", job_id=job_id)
+    batch_info = bulk_call(sf, object_name, "_get_batch", job_id=job_id, batch_id=batch_id)
+    while batch_info["state"] not in FINISHED_BATCH_STATES:
+        time.sleep(wait)
+        batch_info = bulk_call(sf, object_name, "_get_batch", job_id=job_id, batch_id=batch_id)
+    if batch_info["state"] != "Completed":
+        return job_id, batch_id, batch_failed_results(chunk, batch_info.get("stateMessage") or batch_info["state"])
+    return job_id, batch_id, bulk_get(sf, object_name, f"job/{job_id}/batch/{batch_id}/result")
+
+
+# 🧰 Metoda Bulk 1.0 objektu sestaveného z aktuální session (po obnově session s novým tokenem)
+def bulk_call(sf, object_name, method, **kwargs):
+    return session_retry(sf, lambda: getattr(getattr(sf.bulk, object_name), method)(**kwargs))
+
+
+# 🔗 GET na Bulk 1.0 URL (relativně k bulk_url) → JSON
+def bulk_get(sf, object_name, path):
+    def get():
+        bulk_object = getattr(sf.bulk, object_name)
+        return call_salesforce(url=f"{bulk_object.bulk_url}{path}", method="GET", session=bulk_object.session,
+                               headers=bulk_object.headers).json()
+    return session_retry(sf, get)
+
+
+# 📮 Odeslání hotových batchí – vrací seznam výsledků pro každý batch ve vstupním pořadí
+#    positions = pozice záznamů každého chunku v uploadu (pro checkpoint dokončených batchí)
+def submit_batches_parallel(sf, object_name, chunks, external_id_field=DEFAULT_EXTERNAL_ID_FIELD,
+                            max_parallel=DEFAULT_MAX_PARALLEL, wait=DEFAULT_POLL_WAIT, operation="upsert",
+                            batcher=None, positions=None, checkpoint=None):
+    job = bulk_call(sf, object_name, "_create_job", operation=operation, use_serial=False,
+                    external_id_field=external_id_field)
+    job_id = job["id"]
+    print(f"🚀 Bulk job {job_id}: {len(chunks)} batchí ({object_name}), paralelně max {max_parallel}")
+
+    results = [None] * len(chunks)
+    in_flight = {}  # batch_id -> index chunku
+    submitted_at = {}  # batch_id -> čas odeslání (záloha, když batchInfo nemá totalProcessingTime)
+    next_index = 0
+
+    def add_batch(index):
+        return index, bulk_call(sf, object_name, "_add_batch", job_id=job_id, data=chunks[index], operation=operation)
+
+    def fetch_results(index, batch_info):
+        if batch_info["state"] != "Completed":
+            message = batch_info.get("stateMessage") or batch_info["state"]
+            return index, batch_failed_results(chunks[index], message)
+        return index, bulk_get(sf, object_name, f"job/{job_id}/batch/{batch_info['id']}/result")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+            while next_index < len(chunks) or in_flight:
+                # 📤 Doplnění rozpracovaných batchí do limitu paralelismu
+                free_slots = max_parallel - len(in_flight)
+                to_submit = range(next_index, min(next_index + free_slots, len(chunks)))
+                with stage("bulk_submit", sum(len(chunks[i]) for i in to_submit)):
+                    for index, batch in pool.map(add_batch, to_submit):
+                        in_flight[batch["id"]] = index
+                        submitted_at[batch["id"]] = time.monotonic()
+                        print(f"📦 Odeslán batch {index+1}/{len(chunks)} ({len(chunks[index])} záznamů)")
+                next_index = to_submit.stop
+
+                # 🔍 Jeden dotaz na stav všech batchí jobu
+                with stage("bulk_poll"):
+                    time.sleep(wait)
+                    finished = [b for b in get_job_batches(sf, object_name, job_id)
+                                if b["id"] in in_flight and b["state"] in FINISHED_BATCH_STATES]
+                with stage("bulk_results", sum(len(chunks[in_flight[b["id"]]]) for b in finished)):
+                    for b, (index, batch_results) in zip(finished, pool.map(
+                            lambda b: fetch_results(in_flight[b["id"]], b), finished)):
+                        results[index] = batch_results
+                        if checkpoint is not None:
+                            checkpoint.batch_done(positions[index], batch_results, job_id, b["id"])
+                        print(f"✅ Dokončen batch {index+1}/{len(chunks)}")
+                if batcher is not None:
+                    for b in finished:
+                        seconds = float(b.get("totalProcessingTime") or 0) / 1000 \
+                            or time.monotonic() - submitted_at[b["id"]]
+                        batcher.observe(len(chunks[in_flight[b["id"]]]), seconds, results[in_flight[b["id"]]])
+                for b in finished:
+                    del in_flight[b["id"]]
+    finally:
+        bulk_call(sf, object_name, "_close_job", job_id=job_id)
+
+    return results
+
+
+# 🔒 Paralelní nahrání child objektů – batche rozdělené podle parent Accountu, aby se souběžné
+#    batche nezamykaly navzájem; záznamy s UNABLE_TO_LOCK_ROW se opakují s backoffem
+def bulk_load_by_parent(sf, object_name, records, parent_field, operation="upsert",
+                        external_id_field=DEFAULT_EXTERNAL_ID_FIELD, batch_size=DEFAULT_BATCH_SIZE,
+                        max_parallel=DEFAULT_MAX_PARALLEL, wait=DEFAULT_POLL_WAIT,
+                        max_lock_retries=DEFAULT_LOCK_RETRIES, lock_backoff=DEFAULT_LOCK_BACKOFF, batcher=None,
+                        checkpoint=None):
+    batcher = batcher or AdaptiveBatcher(object_name, max_records=batch_size)
+    results = [None] * len(records)
+    pending = list(range(len(records)))
+
+    for attempt in range(max_lock_retries + 1):
+        if attempt:
+            delay = lock_backoff * 2 ** (attempt - 1)
+            print(f"🔁 Opakuji {len(pending)} zamčených záznamů (pokus {attempt}/{max_lock_retries}) za {delay} s...")
+            time.sleep(delay)
+
+        size = batcher.batch_size([records[i] for i in pending])
+        parallel_batches, serial_batches = partition_by_parent(records, pending, parent_field, size)
+        print(f"🧩 {object_name}: {len(parallel_batches)} batchí bez sdílených parentů, {len(serial_batches)} sériových")
+
+        for batches, parallel in ((parallel_batches, max_parallel), (serial_batches, 1)):
+            if not batches:
+                continue
+            chunks = [[records[i] for i in batch] for batch in batches]
+            batch_results = submit_batches_parallel(sf, object_name, chunks, external_id_field,
+                                                    parallel, wait, operation=operation, batcher=batcher,
+                                                    positions=batches, checkpoint=checkpoint)
+            for batch, chunk_results in zip(batches, batch_results):
+                for i, res in zip(batch, chunk_results):
+                    results[i] = res
+
+        pending = [i for i in pending if is_lock_error(results[i])]
+        if not pending:
+            break
+
+    if pending:
+        print(f"⚠️ {len(pending)} záznamů zůstalo zamčených i po {max_lock_retries} opakováních")
+    return results
+
+
+# 🧩 Rozdělení záznamů do batchí tak, aby žádné dva batche nesdílely parent záznam
+#    Skupiny větší než batch_size se rozpadnou na více batchí a musí běžet sériově
+def partition_by_parent(records, indices, parent_field, batch_size=DEFAULT_BATCH_SIZE):
+    groups = {}
+    orphans = []
+    for i in indices:
+        parent = records[i].get(parent_field)
+        if parent:
+            groups.setdefault(parent, []).append(i)
+        else:
+            orphans.append([i])
+
+    parallel_batches = []
+    serial_batches = []
+    current = []
+    for group in sorted(groups.values(), key=len, reverse=True) + orphans:
+        if len(group) > batch_size:
+            serial_batches.extend(list(c) for c in chunked(group, batch_size))
+            continue
+        if len(current) + len(group) > batch_size:
+            parallel_batches.append(current)
+            current = []
+        current.extend(group)
+    if current:
+        parallel_batches.append(current)
+
+    # Záznamy uvnitř batche ponecháme ve vstupním pořadí
+    return [sorted(b) for b in parallel_batches], serial_batches
+
+
+def is_lock_error(result):
+    return not result.get("success") and any(
+        e.get("statusCode") == LOCK_ERROR_CODE for e in result.get("errors") or [])
+
+
+# 🔍 Stav všech batchí jobu jedním voláním
+def get_job_batches(sf, object_name, job_id):
+    return bulk_get(sf, object_name, f"job/{job_id}/batch").get("batchInfo", [])
+
+
+# ❌ Výsledky pro batch, který Salesforce celý odmítl
+def batch_failed_results(chunk, message):
+    return [{"success": False, "created": False, "id": None,
+             "errors": [{"statusCode": "BATCH_FAILED", "message": message, "fields": []}]} for _ in chunk]
+
+
+# 📊 Souhrn výsledků bulk operace
+def summarize_results(response):
+    success_count = sum(1 for r in response if r.get("success"))
+    created_count = sum(1 for r in response if r.get("success") and r.get("created"))
+    failures = [r for r in response if not r.get("success")]
+    return success_count, created_count, failures
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+
+# ⏩ Checkpoint nahraných batchí – přerušený běh (výpadek sítě, vypršená session, Ctrl+C) pokračuje
+#    spuštěním s --resume: hotové batche se neodesílají znovu, jejich výsledky se převezmou z checkpointu
+#    Bez --resume se nedokončený checkpoint zahodí a běh začne od začátku
+CHECKPOINT_DIR = os.path.join(os.getenv("DELTA_STATE_DIR", "state"), "checkpoints")
+RESUME = "--resume" in sys.argv
+
+# Výsledky, které se do checkpointu nezapisují – záznam se po --resume pošle znovu
+#    (zámek parentu je přechodný, nezpracované řádky selhaného jobu Salesforce vůbec neviděl)
+RETRY_ERROR_CODES = ("UNABLE_TO_LOCK_ROW", "NOT_PROCESSED")
+
+
+class Checkpoint:
+    def __init__(self, sf, object_name, resume=RESUME):
+        # Checkpoint je zvlášť pro každou org (sandbox vs. produkce)
+        org = getattr(sf, "sf_instance", "default").split(".")[0]
+        self.path = os.path.join(CHECKPOINT_DIR, f"{object_name}__{org}.jsonl")
+        self.done = {}
+        self.skipped_count = 0
+        self.lock = threading.Lock()
+        if not os.path.exists(self.path):
+            return
+        if resume:
+            self.done = load_entries(self.path)
+            batches = sum(len(upload["batches"]) for upload in self.done.values())
+            print(f"⏩ Pokračuji v přerušeném běhu: {batches} hotových batchí v {self.path}")
+        else:
+            print(f"⚠️ Checkpoint nedokončeného běhu {self.path} zahozen – pro pokračování spusťte s --resume")
+            os.remove(self.path)
+
+    # ▶️ Jeden upload (záznamy chunku) – záznamy z batchí hotových v přerušeném běhu se neodešlou
+    #    index = řádky odesílaného DataFrame (do checkpointu jako čísla řádků souboru)
+    def start(self, records, index):
+        return UploadProgress(self, records, index)
+
+    def write(self, entry):
+        with self.lock:
+            os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    # ✅ Běh doběhl → checkpoint už není potřeba (stav nese DeltaState)
+    def finish(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if self.skipped_count:
+            print(f"⏩ Z checkpointu převzato {self.skipped_count} záznamů")
+
+
+# 📦 Průběh jednoho uploadu – transporty (bulk_upsert, submit_batches_parallel, bulk2_load, collections_load)
+#    hlásí každý dokončený batch přes batch_done(); pozice = pořadí v pending() záznamech
+class UploadProgress:
+    def __init__(self, checkpoint, records, index):
+        self.checkpoint = checkpoint
+        self.key = batch_key(records)
+        self.index = index
+        upload = checkpoint.done.get(self.key, {"results": {}, "batches": set()})
+        self.cached = upload["results"]
+        self.todo = [p for p in range(len(records)) if p not in self.cached]
+        if self.cached:
+            checkpoint.skipped_count += len(self.cached)
+            rows = [int(index[p]) + 1 for p in self.cached]
+            print(f"⏩ {len(self.cached)} záznamů (řádky {min(rows)}–{max(rows)}) už nahráno v "
+                  f"{len(upload['batches'])} batchích přerušeného běhu – přeskočeno")
+
+    # 📤 Záznamy k odeslání (bez hotových)
+    def pending(self, records):
+        return [records[p] for p in self.todo]
+
+    # 💾 Dokončený batch se hned zapíše na disk (append + fsync) – pozice, job/batch a výsledky
+    def batch_done(self, positions, results, job_id=None, batch_id=None):
+        saved = [(self.todo[p], r) for p, r in zip(positions, results) if not is_retryable(r)]
+        if not saved:
+            return
+        rows = [int(self.index[position]) + 1 for position, _ in saved]
+        self.checkpoint.write({
+            "key": self.key,
+            "positions": [position for position, _ in saved],
+            "rows": [min(rows), max(rows)],
+            "job_id": job_id,
+            "batch_id": batch_id,
+            "completed": datetime.now().isoformat(timespec="seconds"),
+            "results": [r for _, r in saved],
+        })
+
+    # 🔗 Výsledky celého uploadu ve vstupním pořadí – z checkpointu + odeslané (sent = výsledky pending())
+    def merge(self, sent):
+        response = [self.cached.get(p) for p in range(len(self.todo) + len(self.cached))]
+        for p, res in zip(self.todo, sent):
+            response[p] = res
+        return response
+
+
+def is_retryable(result):
+    return not result.get("success") and any(e.get("statusCode") in RETRY_ERROR_CODES
+                                             for e in result.get("errors") or [])
+
+
+# 📖 Načtení checkpointu – poslední řádek může být useknutý pádem uprostřed zápisu
+def load_entries(path):
+    uploads = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if "positions" not in entry:
+                continue  # checkpoint starší verze (celé volání bez pozic) – upload se pošle znovu
+            upload = uploads.setdefault(entry["key"], {"results": {}, "batches": set()})
+            upload["results"].update(zip(entry["positions"], entry["results"]))
+            upload["batches"].add(entry.get("batch_id") or entry.get("job_id") or len(upload["batches"]))
+    return uploads
+
+
+# 🔑 Otisk obsahu uploadu – změněná vstupní data se z checkpointu nepřevezmou
+def batch_key(records):
+    payload = json.dumps(records, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
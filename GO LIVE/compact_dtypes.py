@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pandas as pd
+from metrics import record_memory
+
+# 🗜️ Úsporný režim paměti (LOW_MEMORY=1) – kompaktní typy sloupců hned po načtení chunku a znovu po čištění
+#    text s malým počtem různých hodnot → category, ostatní text → Arrow string, celá čísla → nejmenší nullable Int,
+#    True/False s prázdnými hodnotami → boolean; floaty zůstávají (1.0 → 1 by změnilo payload i delta hashe)
+LOW_MEMORY = os.getenv("LOW_MEMORY", "0") == "1"
+# Podíl různých hodnot, pod kterým se text uloží jako category (země, měna, stav, zdroj, jednotka…)
+CATEGORY_MAX_RATIO = 0.5
+TEXT_DTYPE = pd.StringDtype("pyarrow", na_value=np.nan)
+INTEGER_DTYPES = ["Int8", "Int16", "Int32", "Int64"]
+
+
+# 📉 Kompaktní typy všech sloupců + záznam ušetřené paměti k fázi (label)
+def compact_frame(df, label):
+    if not LOW_MEMORY or df.empty:
+        return df
+    before = int(df.memory_usage(deep=True).sum())
+    df = pd.DataFrame({col: compact_column(s) for col, s in df.items()}, index=df.index)
+    after = int(df.memory_usage(deep=True).sum())
+    record_memory(label, before, after)
+    print(f"🗜️ {label}: {before / 1048576:.1f} → {after / 1048576:.1f} MB ({len(df)} řádků)")
+    return df
+
+
+def compact_column(s):
+    if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(s):
+        return s
+    if pd.api.types.is_integer_dtype(s):
+        return smallest_integer(s)
+    if s.dtype == object:
+        # Sloupce s čísly i texty (ZIP, telefon…) zůstávají – převod by změnil odesílané hodnoty
+        kind = pd.api.types.infer_dtype(s, skipna=True)
+        if kind == "boolean":
+            return s.astype("boolean")
+        if kind == "integer":
+            return smallest_integer(s.astype("Int64"))
+        if kind != "string":
+            return s
+    if pd.api.types.is_string_dtype(s):
+        if s.nunique() <= CATEGORY_MAX_RATIO * s.notna().sum():
+            return s.astype("category")
+        return s.astype(TEXT_DTYPE)
+    return s
+
+
+def smallest_integer(s):
+    values = s.dropna()
+    if values.empty:
+        return s.astype(INTEGER_DTYPES[0])
+    low, high = values.min(), values.max()
+    for dtype in INTEGER_DTYPES:
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return s.astype(dtype)
+    return s
+
+
+# 🔤 Všechny sloupce jako text s "" místo prázdných hodnot – kategorie zůstávají kategoriemi
+def text_frame(df):
+    return pd.DataFrame({col: text_column(s) for col, s in df.items()}, index=df.index)
+
+
+def text_column(s):
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        if s.hasnans and "" not in s.cat.categories:
+            s = s.cat.add_categories([""])
+        return s.fillna("")
+    if pd.api.types.is_extension_array_dtype(s):
+        s = s.astype(object)
+    return s.fillna("").infer_objects().astype(str)
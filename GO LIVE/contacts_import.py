@@ -1,131 +1,141 @@
-import pandas as pd
 import os
-import json
-import numpy as np
-from simple_salesforce import Salesforce
-from dotenv import load_dotenv
+from sf_session import connect
+from bulk_upload import bulk_upsert, bulk_load_by_parent
+from excel_stream import read_excel_chunks
+from debug_dump import open_debug_writer
+from bulk2_upload import BULK2_ENABLED, bulk2_load
+from sobject_collections import use_collections, collections_load
+from payload import sanitize_frame, frame_records
+from preflight import Preflight
+from reconcile import ResultWriter
+from account_index import open_account_index
+from metrics import stage, timed_iter, start_run
+from checkpoint import Checkpoint
+from batch_sizing import AdaptiveBatcher
+from sdl_mapping import load_plan
+from load_verify import LoadVerifier
 import warnings
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
 DEFAULT_ACCOUNT_ID = "001J900000CASp3IAH"
+# 🚀 Počet souběžně zpracovávaných batchí (1 = jeden bulk insert jako dosud)
+MAX_PARALLEL_BATCHES = int(os.getenv("SF_MAX_PARALLEL_BATCHES", "1"))
 
-# 🔍 Načtení mappingu ze SDL
-def load_sdl_mapping(path):
-    mapping = {}
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                source, target = line.split("=", 1)
-                mapping[source.strip()] = target.strip()
-    return mapping
-
-# 🧼 Sanitizace záznamu pro JSON a Salesforce
-import datetime
-
-def sanitize_record_values(rec):
-    for key, value in rec.items():
-        if isinstance(value, float) and (np.isnan(value) or np.isinf(value)):
-            rec[key] = None
-        elif isinstance(value, (pd.Timestamp, datetime.datetime)):
-            rec[key] = value.strftime("%Y-%m-%d")
-    return rec
+# ⏱️ Měření běhu (METRICS=0 vypne) – metriky se po skončení zapíší do logs/metrics/
+start_run()
 
 # 🔐 Přihlášení do Salesforce
-load_dotenv("credentials.env")
-sf = Salesforce(
-    username=os.getenv("SF_USERNAME"),
-    password=os.getenv("SF_PASSWORD"),
-    security_token=os.getenv("SF_TOKEN"),
-    domain=os.getenv("SF_DOMAIN", "login")
-)
+with stage("login"):
+    sf = connect()
 print("✅ Připojeno k Salesforce.")
 
 # 📂 Cesty
-accounts_file = "accounts_imported_out.csv"
 contacts_file = "contacts 28.3..xlsx"
 mapping_file = "ContactsMapping.sdl"
 output_dir = "output"
 os.makedirs(output_dir, exist_ok=True)
 
-# 🧠 Načti mapping
-mapping = load_sdl_mapping(mapping_file)
+# 🧠 Zkompilovaný plán mappingu a transformací ze SDL
+plan = load_plan(mapping_file)
 
-# 📥 Načti accouny
-accounts_df = pd.read_csv(accounts_file)
-accounts_df = accounts_df.drop(columns=['Unnamed: 15', 'Organization ID.1', 'Country code'], errors='ignore')
-print(f"✅ Načteno {len(accounts_df)} accountů ze souboru '{accounts_file}'")
+# 🗂️ Index accountů (PartnerWeb/Helios org ID → Account Id)
+account_index = open_account_index(sf)
 
-# Deduplicate podle PartnerWeb_ORG_ID__c
-accounts_df = accounts_df.drop_duplicates(subset=["PartnerWeb_ORG_ID__c"])
-
-# 📥 Načti kontakty a přejmenuj sloupce
-contacts_df = pd.read_excel(contacts_file)
-contacts_df.columns = contacts_df.columns.str.strip()
-contacts_df.rename(columns=mapping, inplace=True)
-print(f"✅ Načteno {len(contacts_df)} kontaktů ze souboru '{contacts_file}'")
 columns_to_ignore = ["Unnamed: 15", "Organization ID", "Organization ID.1", "Country code", "ID"]
-contacts_df = contacts_df.drop(columns=[col for col in columns_to_ignore if col in contacts_df.columns])
-
-# 🔗 Merge přes Org_ID__c vs PartnerWeb_ORG_ID__c
-contacts_df["Org_ID__c"] = pd.to_numeric(contacts_df["Org_ID__c"], errors="coerce")
-accounts_df["PartnerWeb_ORG_ID__c"] = pd.to_numeric(accounts_df["PartnerWeb_ORG_ID__c"], errors="coerce")
-
-merged_df = contacts_df.merge(
-    accounts_df[["Id", "PartnerWeb_ORG_ID__c"]],
-    how="left",
-    left_on="Org_ID__c",
-    right_on="PartnerWeb_ORG_ID__c"
-)
-
-print(f"🔄 Spojeno: {len(merged_df)} kontaktů, z toho {merged_df['Id'].notna().sum()} namatchováno a {merged_df['Id'].isna().sum()} bez AccountId")
-
-# 🏷️ AccountId + výstup
-merged_df["AccountId"] = merged_df["Id"].fillna(DEFAULT_ACCOUNT_ID)
-errors_df = merged_df[merged_df["Id"].isna()]
-export_df = merged_df.drop(columns=["Id", "PartnerWeb_ORG_ID__c"])
-
-# 📅 Převod datetime sloupců na string
-for col in export_df.select_dtypes(include=["datetime64[ns]"]).columns:
-    export_df[col] = export_df[col].dt.strftime("%Y-%m-%d")
-
-# 🧽 Vyčištění a převod na záznamy
-export_df = export_df.replace([np.nan, float("inf"), float("-inf"), "nan", "NaN"], None)
-records = export_df.to_dict(orient="records")
-records = [sanitize_record_values(r) for r in records]
-
-# 💾 Debug JSON
-with open(f"{output_dir}/contacts_debug.json", "w", encoding="utf-8") as f:
-    json.dump(records, f, indent=2, ensure_ascii=False)
-print("💾 Debug uložen do contacts_debug.json")
-
-# 📤 Upsert do SF
-print("📤 Nahrávám kontakty do Salesforce...")
-response = sf.bulk.Contact.insert(records)
-
-# 📊 Výsledky
-success_count = sum(1 for r in response if r.get("success"))
-failures = [r for r in response if not r.get("success")]
-print(f"✅ Úspěšně nahráno: {success_count}")
-print(f"❌ Selhalo: {len(failures)}")
-
-# 🧾 Zápis chyb
-error_rows = []
-for i, fail in enumerate(failures):
-    error_info = fail.get("errors", [{}])[0]
-    failed_row = export_df.iloc[i].copy()
-    failed_row["Chyba_kód"] = error_info.get("statusCode")
-    failed_row["Chyba_zpráva"] = error_info.get("message")
-    error_rows.append(failed_row)
-
-if error_rows:
-    pd.DataFrame(error_rows).to_csv(f"{output_dir}/contacts_import_errors.csv", index=False)
+
+# 🧹 Přejmenování, párování s accounty a příprava záznamů pro jeden chunk kontaktů
+def prepare_contacts(contacts_df):
+    contacts_df.columns = contacts_df.columns.str.strip()
+    contacts_df = plan.apply(contacts_df)
+    contacts_df = contacts_df.drop(columns=[col for col in columns_to_ignore if col in contacts_df.columns])
+
+    # 🔗 Párování Org_ID__c (číslo podle SDL) na PartnerWeb org ID accountu
+    account_ids = account_index.lookup("partnerweb", contacts_df["Org_ID__c"])
+
+    # 🏷️ AccountId + výstup
+    contacts_df["AccountId"] = account_ids.fillna(DEFAULT_ACCOUNT_ID)
+    errors_df = contacts_df[account_ids.isna()]
+    export_df = contacts_df
+
+    # 🧽 Vyčištění (NaN/inf → None, data → YYYY-MM-DD) a převod na záznamy
+    export_df = sanitize_frame(export_df)
+    records = frame_records(export_df)
+    return export_df, errors_df, records
+
+total_count = 0
+matched_count = 0
+
+# 🧾 Výsledky se zapisují průběžně vedle původních řádků (chyby zvlášť)
+result_writer = ResultWriter(f"{output_dir}/contacts_import_results.csv", f"{output_dir}/contacts_import_errors.csv")
+
+# 🐞 Debug výpis (DEBUG_DUMP) se zapisuje na pozadí po chuncích
+debug_writer = open_debug_writer(f"{output_dir}/contacts_debug")
+
+# 🛫 Kontrola proti metadatům Contact – chybné řádky se neodesílají
+preflight = Preflight(sf, "Contact", operation="insert")
+
+# ⏩ Hotové batche přerušeného běhu se s --resume neodesílají znovu (insert by vytvořil duplicity)
+checkpoint = Checkpoint(sf, "Contact")
+
+# 📏 Velikost batchí se přizpůsobuje objemu dat a době zpracování napříč chunky
+batcher = AdaptiveBatcher("Contact")
+
+# 🔎 Ověření vložených kontaktů proti org po běhu (VERIFY_LOAD) – Contact nemá Import_ID__c → podle Id z odpovědi
+verifier = LoadVerifier(sf, "Contact", f"{output_dir}/contacts_verify.csv", key_field="Id")
+
+# 📥 Načti kontakty po chuncích, přejmenuj sloupce a nahraj do SF
+for chunk_number, chunk in enumerate(timed_iter("excel_read", read_excel_chunks(contacts_file))):
+    with stage("transform", len(chunk)):
+        export_df, errors_df, records = prepare_contacts(chunk)
+    debug_writer.write(records)
+    total_count += len(export_df)
+    matched_count += len(export_df) - len(errors_df)
+    print(f"🔄 Chunk {chunk_number + 1}: {len(export_df)} kontaktů, z toho {len(export_df) - len(errors_df)} namatchováno a {len(errors_df)} bez AccountId")
+
+    upload_df, records, rejected, rejected_response = preflight.validate(export_df, records)
+    if len(rejected):
+        result_writer.write(rejected, rejected_response)
+
+    # 📤 Upsert do SF
+    print("📤 Nahrávám kontakty do Salesforce...")
+    progress = checkpoint.start(records, upload_df.index)
+    pending = progress.pending(records)
+    sent = []
+    if pending:
+        with stage("upload", len(pending)):
+            if use_collections("Contact", len(pending)):
+                sent = collections_load(sf, "Contact", pending, operation="insert", checkpoint=progress)
+            elif BULK2_ENABLED:
+                sent = bulk2_load(sf, "Contact", upload_df.iloc[progress.todo][list(records[0])], operation="insert",
+                                  checkpoint=progress)
+            elif MAX_PARALLEL_BATCHES > 1:
+                sent = bulk_load_by_parent(sf, "Contact", pending, parent_field="AccountId", operation="insert",
+                                           external_id_field=None, max_parallel=MAX_PARALLEL_BATCHES,
+                                           batcher=batcher, checkpoint=progress)
+            else:
+                sent = bulk_upsert(sf, "Contact", pending, operation="insert", batcher=batcher, checkpoint=progress)
+    response = progress.merge(sent)
+    verifier.expect(records, response)
+
+    # 📊 Výsledky – spárování s původními řádky podle pozice
+    result_writer.write(upload_df, response)
+
+    # 📄 Průběžné výstupy (hlavička jen u prvního chunku)
+    first = chunk_number == 0
+    export_df.to_csv(f"{output_dir}/contacts_mapped.csv", index=False, mode="w" if first else "a", header=first)
+    errors_df.to_csv(f"{output_dir}/contacts_errors.csv", index=False, mode="w" if first else "a", header=first)
+
+debug_writer.close()
+checkpoint.finish()
+print(f"✅ Načteno {total_count} kontaktů ze souboru '{contacts_file}', z toho {matched_count} namatchováno a {total_count - matched_count} bez AccountId")
+print(f"✅ Úspěšně nahráno: {result_writer.success_count}")
+print(f"❌ Selhalo: {result_writer.failure_count}")
+
+if result_writer.failure_count:
     print("🛑 Chyby uloženy do contacts_import_errors.csv")
 
-# 📄 Finální výstupy
-export_df.to_csv(f"{output_dir}/contacts_mapped.csv", index=False)
-errors_df.to_csv(f"{output_dir}/contacts_errors.csv", index=False)
-print("✅ Hotovo! Vše uložené do složky output/")
\ No newline at end of file
+print("✅ Hotovo! Vše uložené do složky output/")
+
+# 🔎 Hodnoty v org proti odeslaným – chybějící, navíc a rozdílné záznamy (jen s VERIFY_LOAD=1)
+verifier.finish()
@@ -0,0 +1,79 @@
+import gzip
+import json
+import os
+import queue
+import threading
+
+# 🐞 Debug výpis odesílaných záznamů – ve výchozím stavu vypnutý
+#    DEBUG_DUMP=1 → NDJSON (jeden záznam na řádek), DEBUG_DUMP=gz → NDJSON komprimovaný gzipem
+DEBUG_DUMP = os.getenv("DEBUG_DUMP", "0").lower()
+QUEUE_CHUNKS = 4
+
+
+# 💾 Zápis NDJSON ve vlákně na pozadí – serializace neblokuje upload
+#    Předané záznamy se po write() už nesmí měnit
+class NdjsonWriter:
+    def __init__(self, path, compress=False):
+        self.path = path
+        self.count = 0
+        self.error = None
+        self.f = gzip.open(path, "wt", encoding="utf-8") if compress else open(path, "w", encoding="utf-8")
+        # Omezená fronta – při pomalém disku se hlavní vlákno zdrží místo hromadění chunků v paměti
+        self.queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            records = self.queue.get()
+            if records is None:
+                break
+            if self.error:
+                continue
+            try:
+                self.f.writelines(json.dumps(rec, ensure_ascii=False, default=str) + "\n" for rec in records)
+            except Exception as e:
+                self.error = e
+
+    def write(self, records):
+        self.count += len(records)
+        self.queue.put(records)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.f.close()
+        if self.error:
+            print(f"⚠️ Debug výpis {self.path} je neúplný: {self.error}")
+        else:
+            print(f"🐞 Debug uložen do {self.path} ({self.count} záznamů)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 🚫 Náhrada writeru při vypnutém debug výpisu
+class NullWriter:
+    def write(self, records):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 🐞 Writer podle DEBUG_DUMP; path bez přípony (doplní se .ndjson / .ndjson.gz)
+def open_debug_writer(path):
+    if DEBUG_DUMP in ("0", "", "false", "off"):
+        return NullWriter()
+    if DEBUG_DUMP == "gz":
+        return NdjsonWriter(path + ".ndjson.gz", compress=True)
+    return NdjsonWriter(path + ".ndjson")
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import os
+from metrics import timed
+
+# 🔁 Stav posledního úspěšného nahrání – Import_ID__c → hash odeslaného záznamu
+STATE_DIR = os.getenv("DELTA_STATE_DIR", "state")
+# FULL_UPLOAD=1 pošle všechny záznamy bez ohledu na stav (stav se i tak aktualizuje)
+FULL_UPLOAD = os.getenv("FULL_UPLOAD", "0") == "1"
+
+
+class DeltaState:
+    def __init__(self, sf, object_name, key_field="Import_ID__c"):
+        self.key_field = key_field
+        # Stav je zvlášť pro každou org (sandbox vs. produkce)
+        org = getattr(sf, "sf_instance", "default").split(".")[0]
+        self.path = os.path.join(STATE_DIR, f"{object_name}__{org}.json")
+        self.hashes = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.hashes = json.load(f)
+        self.pending = {}
+        self.unchanged_count = 0
+
+    # 🔍 Maska záznamů, které jsou nové nebo se od posledního běhu změnily
+    @timed("delta", rows_arg=1)
+    def changed_mask(self, records):
+        mask = []
+        for rec in records:
+            key = rec.get(self.key_field)
+            digest = record_hash(rec)
+            changed = FULL_UPLOAD or not key or self.hashes.get(key) != digest
+            if changed and key:
+                self.pending[key] = digest
+            mask.append(changed)
+        unchanged = mask.count(False)
+        self.unchanged_count += unchanged
+        if unchanged:
+            print(f"⏭️ Beze změny od posledního běhu: {unchanged} z {len(records)} záznamů")
+        return mask
+
+    # ✅ Zapamatování úspěšně nahraných záznamů (response ve stejném pořadí jako records)
+    def mark_uploaded(self, records, response):
+        for rec, res in zip(records, response):
+            key = rec.get(self.key_field)
+            if res.get("success") and key in self.pending:
+                self.hashes[key] = self.pending.pop(key)
+
+    def save(self):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.hashes, f)
+        os.replace(tmp, self.path)
+        print(f"💾 Stav delta uploadu uložen do {self.path} ({len(self.hashes)} záznamů)")
+
+
+def record_hash(rec):
+    payload = json.dumps(rec, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+import time
+
+# 📚 Lokální cache describe() metadat objektů – platnost DESCRIBE_TTL_HOURS (výchozí 24 h)
+CACHE_DIR = os.path.join(os.getenv("DELTA_STATE_DIR", "state"), "describe")
+TTL_SECONDS = float(os.getenv("DESCRIBE_TTL_HOURS", "24")) * 3600
+
+# Z describe() se ukládá jen to, co potřebuje pre-flight validace
+FIELD_KEYS = ["name", "type", "length", "scale", "nillable", "createable", "updateable", "defaultedOnCreate",
+              "restrictedPicklist", "externalId"]
+
+
+# 📖 Metadata polí objektu {api_name: {...}}, z cache nebo čerstvě ze Salesforce
+def describe_fields(sf, object_name):
+    org = getattr(sf, "sf_instance", "default").split(".")[0]
+    path = os.path.join(CACHE_DIR, f"{object_name}__{org}.json")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < TTL_SECONDS:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    describe = getattr(sf, object_name).describe()
+    fields = {}
+    for field in describe["fields"]:
+        meta = {key: field.get(key) for key in FIELD_KEYS}
+        meta["picklistValues"] = [p["value"] for p in field.get("picklistValues") or [] if p.get("active")]
+        fields[field["name"]] = meta
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(fields, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    print(f"📚 Metadata {object_name} načtena ze Salesforce ({len(fields)} polí)")
+    return fields
+
+
+# ❌ Invalidace cache (např. po nasazení nových polí)
+def clear_cache():
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            os.remove(os.path.join(CACHE_DIR, name))
+    print(f"🧹 Cache metadat '{CACHE_DIR}' smazána")
+
+
+if __name__ == "__main__":
+    if "--clear" in sys.argv:
+        clear_cache()
+    else:
+        print("Použití: python describe_cache.py --clear")
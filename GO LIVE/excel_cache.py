@@ -0,0 +1,173 @@
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ⚡ Cache načtených Excelů – klíč = hash obsahu souboru + list + volby čtení
+CACHE_DIR = os.getenv("EXCEL_CACHE_DIR", ".excel_cache")
+CACHE_ENABLED = os.getenv("EXCEL_CACHE", "1") != "0"
+CACHE_MAX_BYTES = int(os.getenv("EXCEL_CACHE_MAX_MB", "500")) * 1024 * 1024
+CACHE_VERSION = 1
+DONE_MARKER = "complete"
+META_KEY = b"excel_cache"
+
+# 🏷️ Typové značky pro object sloupce (čísla + texty + NaN v jednom sloupci)
+MIXED_TAGS = {type(None): 0, str: 1, int: 2, float: 3, bool: 4, datetime.datetime: 5, pd.Timestamp: 6}
+
+
+# 📥 Celý list přes pd.read_excel s cache
+def read_excel_cached(path, sheet_name=0, **options):
+    frames = cached_frames(path, sheet_name, options, lambda: iter([pd.read_excel(path, sheet_name=sheet_name, **options)]))
+    return list(frames)[0]
+
+
+# 🔁 Vrací DataFrame(y) z cache, nebo je načte přes parse() a uloží do cache
+#    usecols(sloupec) → jen vybrané sloupce; cache se ukládá vždy celá (sdílí ji čtení s jiným výběrem)
+def cached_frames(path, sheet_name, options, parse, usecols=None):
+    if not CACHE_ENABLED:
+        for frame in parse():
+            yield select_columns(frame, usecols)
+        return
+
+    entry = os.path.join(CACHE_DIR, cache_key(path, sheet_name, options))
+    if os.path.exists(os.path.join(entry, DONE_MARKER)):
+        os.utime(entry)
+        print(f"⚡ '{path}' načten z cache")
+        for name in sorted(os.listdir(entry)):
+            if name != DONE_MARKER:
+                yield load_frame(os.path.join(entry, name), usecols)
+        return
+
+    tmp = f"{entry}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        for i, frame in enumerate(parse()):
+            save_frame(frame, os.path.join(tmp, f"{i:05d}"))
+            yield select_columns(frame, usecols)
+        open(os.path.join(tmp, DONE_MARKER), "w").close()
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        evict_cache(keep=entry)
+    finally:
+        # Nedočtený soubor (přerušený běh) se do cache neuloží
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# 🔑 Klíč cache
+def cache_key(path, sheet_name, options):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(json.dumps({"sheet": sheet_name, "options": options, "version": CACHE_VERSION,
+                         "pandas": pd.__version__}, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:32]
+
+
+# 💾 Uložení DataFrame jako Parquet; object sloupce jako text + typová značka
+def save_frame(frame, path):
+    try:
+        encoded, mixed = encode_mixed_columns(frame)
+        table = pa.Table.from_pandas(encoded)
+        table = table.replace_schema_metadata({**table.schema.metadata, META_KEY: json.dumps(mixed).encode()})
+        pq.write_table(table, path + ".parquet")
+    except (pa.ArrowException, TypeError, ValueError):
+        # Hodnoty, které Parquet neumí přesně uložit – záloha přes pickle
+        if os.path.exists(path + ".parquet"):
+            os.remove(path + ".parquet")
+        frame.to_pickle(path + ".pkl")
+
+
+def load_frame(path, usecols=None):
+    if path.endswith(".pkl"):
+        return select_columns(pd.read_pickle(path), usecols)
+    schema = pq.read_schema(path)
+    mixed = json.loads(schema.metadata[META_KEY])
+    columns = None
+    if usecols is not None:
+        # Z Parquetu se čtou jen vybrané sloupce (a jejich typové značky)
+        tags = set(mixed.values())
+        columns = [col for col in schema.names if col not in tags and not col.startswith("__index") and usecols(col)]
+        mixed = {col: tag_col for col, tag_col in mixed.items() if col in columns}
+        columns += list(mixed.values())
+    table = pq.read_table(path, columns=columns)
+    frame = table.to_pandas()
+    for col, tag_col in mixed.items():
+        frame[col] = decode_mixed_column(frame[col], frame.pop(tag_col).to_numpy())
+    return frame
+
+
+def select_columns(frame, usecols):
+    if usecols is None:
+        return frame
+    return frame[[col for col in frame.columns if usecols(col)]]
+
+
+def encode_mixed_columns(frame):
+    encoded = frame.copy(deep=False)
+    mixed = {}
+    for i, col in enumerate(frame.columns):
+        if frame[col].dtype != object:
+            continue
+        types = set(map(type, frame[col]))
+        if types == {str}:
+            continue
+        if not types <= set(MIXED_TAGS):
+            raise TypeError(f"Nepodporované typy ve sloupci {col}: {types}")
+        tag_col = f"__tag_{i}"
+        encoded[tag_col] = np.array([MIXED_TAGS[type(v)] for v in frame[col]], dtype="int8")
+        encoded[col] = [None if v is None else str(v) for v in frame[col]]
+        mixed[col] = tag_col
+    return encoded, mixed
+
+
+def decode_mixed_column(series, tags):
+    out = np.empty(len(series), dtype=object)
+    values = series.to_numpy(dtype=object)
+    for tag, convert in ((1, str), (2, int), (3, float), (4, lambda v: v == "True"),
+                         (5, lambda v: pd.Timestamp(v).to_pydatetime()), (6, pd.Timestamp)):
+        mask = tags == tag
+        if mask.any():
+            out[mask] = [convert(v) for v in values[mask]]
+    return pd.Series(out, index=series.index, dtype=object)
+
+
+# 🧹 Vyhození nejdéle nepoužitých záznamů nad limit velikosti
+def evict_cache(keep=None):
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        entry = os.path.join(CACHE_DIR, name)
+        if ".tmp" in name or not os.path.isdir(entry):
+            continue
+        size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+        entries.append((os.path.getmtime(entry), size, entry))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= CACHE_MAX_BYTES:
+            break
+        if entry == keep:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        print(f"🧹 Cache: odstraněn {os.path.basename(entry)}")
+
+
+# ❌ Invalidace celé cache
+def clear_cache():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    print(f"🧹 Cache '{CACHE_DIR}' smazána")
+
+
+if __name__ == "__main__":
+    if "--clear" in sys.argv:
+        clear_cache()
+    else:
+        print("Použití: python excel_cache.py --clear")
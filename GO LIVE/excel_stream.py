@@ -0,0 +1,80 @@
+import os
+import openpyxl
+import pandas as pd
+from pandas.io.parsers import TextParser
+from excel_cache import cached_frames
+from compact_dtypes import compact_frame
+
+# 📏 Počet řádků v jednom chunku – určuje špičku paměti, ne velikost souboru
+DEFAULT_CHUNK_SIZE = int(os.getenv("EXCEL_CHUNK_SIZE", "10000"))
+
+
+# 📥 Streamované čtení Excelu – vrací DataFrame po chunk_size řádcích
+#    Typy sloupců se odvozují stejně jako v pd.read_excel, index pokračuje přes chunky
+#    Opakované čtení stejného souboru jde z cache (excel_cache), s LOW_MEMORY=1 v kompaktních typech
+#    usecols(sloupec) jako v pd.read_excel – z cache se pak čtou jen vybrané sloupce
+def read_excel_chunks(path, sheet_name=0, chunk_size=DEFAULT_CHUNK_SIZE, usecols=None):
+    frames = cached_frames(path, sheet_name, {"reader": "stream", "chunk_size": chunk_size},
+                           lambda: parse_excel_chunks(path, sheet_name, chunk_size), usecols)
+    return (compact_frame(frame, "excel_read") for frame in frames)
+
+
+def parse_excel_chunks(path, sheet_name=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        ws.reset_dimensions()
+        rows = iter_sheet_rows(ws)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        start = 0
+        block = []
+        for row in rows:
+            block.append(row)
+            if len(block) == chunk_size:
+                yield build_chunk(header, block, start)
+                start += len(block)
+                block = []
+        if block:
+            yield build_chunk(header, block, start)
+    finally:
+        wb.close()
+
+
+# 📄 Řádky listu oříznuté na šířku hlavičky; prázdné řádky na konci listu se vynechají
+def iter_sheet_rows(ws):
+    width = None
+    blank_rows = 0
+    for row in ws.iter_rows(values_only=True):
+        values = [convert_cell(v) for v in row]
+        if width is None:
+            while values and values[-1] == "":
+                values.pop()
+            width = len(values)
+            yield values
+            continue
+        values = (values + [""] * width)[:width]
+        if all(v == "" for v in values):
+            blank_rows += 1
+            continue
+        for _ in range(blank_rows):
+            yield [""] * width
+        blank_rows = 0
+        yield values
+
+
+def build_chunk(header, block, start):
+    chunk = TextParser([header] + block, header=0).read()
+    chunk.index = pd.RangeIndex(start, start + len(chunk))
+    return chunk
+
+
+# 🔢 Převod hodnoty buňky jako v pandas – prázdné buňky na "", celá čísla z floatů na int
+def convert_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
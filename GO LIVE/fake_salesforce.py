@@ -0,0 +1,849 @@
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import operator
+import os
+import random
+import re
+import runpy
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse, urlunparse
+
+# 🧪 Lokální náhrada Salesforce pro offline testy a měření propustnosti loaderů
+#    python fake_salesforce.py serve --port 8765 --latency-ms 50 --lock-rate 0.01
+#    FAKE_SF_URL=http://127.0.0.1:8765 python fake_salesforce.py run accounts_import.py
+#    python run_pipeline.py --fake-sf   (server běží po dobu pipeline, data sdílí všechny stage)
+#    Skripty zapisují výstupní CSV do aktuální složky → spouštějte v kopii složky GO LIVE
+DEFAULT_PORT = 8765
+# Každý start serveru = nová prázdná "org" → vlastní delta stav, index accountů i cache metadat
+INSTANCE = f"fake{secrets.token_hex(3)}.my.salesforce.com"
+FAKE_STATE_DIR = os.path.join("state", "fake")
+BULK_QUERY_PAGE_SIZE = 10000
+REST_QUERY_PAGE_SIZE = 2000
+COLLECTION_LIMIT = 200
+CSV_NULL = "#N/A"
+# Stavy ingest jobu, ve kterých jsou výsledky zpracovaných řádků ke stažení
+INGEST_DONE_STATES = ("JobComplete", "Failed")
+
+TEXT_TYPES = {"string", "textarea", "email", "phone", "url", "picklist", "multipicklist", "combobox"}
+NUMBER_TYPES = {"double", "currency", "percent", "int"}
+DATETIME_FIELDS = {"CreatedDate", "LastModifiedDate"}
+ID_PATTERN = re.compile(r"^[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?$")
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+DATETIME_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})$")
+
+
+# 📐 Pole objektů, které GO LIVE loadery zapisují (describe + validace zápisů jako v org)
+def field(name, field_type="string", length=255, required=False, external_id=False, writable=True):
+    return {"name": name, "type": field_type, "length": length if field_type in TEXT_TYPES else 0,
+            "nillable": not required, "createable": writable, "updateable": writable,
+            "defaultedOnCreate": not writable, "restrictedPicklist": False, "externalId": external_id,
+            "unique": external_id, "picklistValues": []}
+
+
+def system_fields():
+    return [field("Id", "id", writable=False), field("CreatedDate", "datetime", writable=False),
+            field("LastModifiedDate", "datetime", writable=False),
+            field("Import_ID__c", external_id=True)]
+
+
+def address_fields(prefix):
+    return [field(f"{prefix}Street", "textarea"), field(f"{prefix}City", length=40),
+            field(f"{prefix}PostalCode", length=20), field(f"{prefix}State", length=80),
+            field(f"{prefix}Country", length=80)]
+
+
+SCHEMA = {
+    "Account": system_fields() + address_fields("Billing") + address_fields("Shipping") + [
+        field("Name", required=True), field("Phone", "phone", 40), field("E_mail__c", "email", 80),
+        field("Currency__c"), field("State__c"), field("Blocked__c", "boolean"), field("Verified__c", "boolean"),
+        field("Blocked_on_date__c", "date"), field("Last_jnvoice_date__c", "date"),
+        field("Helios_ID__c"), field("PartnerWeb_ORG_ID__c", "double"),
+    ],
+    "Contact": system_fields() + address_fields("Mailing") + [
+        field("LastName", length=80, required=True), field("FirstName", length=40), field("Email", "email", 80),
+        field("Phone", "phone", 40), field("AccountId", "reference", 18), field("Telegram_User_ID__c"),
+        field("Org_ID__c"), field("Creation_Date__c"), field("Source__c"),
+    ],
+    "Asset": system_fields() + [
+        field("Name", required=True), field("AccountId", "reference", 18), field("SerialNumber", length=80),
+        field("InstallDate", "date"), field("Model__c"), field("PartnerWeb_ORG_ID__c", "double"),
+    ],
+    "Invoice__c": system_fields() + [
+        field("Name", length=80), field("Billing_Account__c", "reference", 18), field("Org_Id__c", "double"),
+        field("Source_Name__c"), field("Status__c", "picklist"), field("Total_Amount__c", "currency"),
+        field("HM_Celkem_bez_z_lohy__c", "currency"), field("Max_no_of_Terminals_in_Month__c", "double"),
+        field("Helios_invoice__c", "boolean"), field("Invoice_Date__c", "date"),
+    ],
+    "Product2": system_fields() + [
+        field("Name", required=True), field("ProductCode"), field("IsActive", "boolean"),
+        field("Description", "textarea", 4000), field("Name_EN__c"), field("Model__c"), field("Sk__c"),
+        field("Purchase_currency__c"), field("Sales_currency__c"), field("Purchase_price__c", "currency"),
+        field("Sales_price__c", "currency"),
+    ],
+    "Product_Structure__c": system_fields() + [
+        field("Name", length=80), field("Product__c", "reference", 18), field("Parent_Product__c", "reference", 18),
+        field("Product_Code__c"), field("Parent_Product_Code__c"), field("Measure_of_Quantity__c"),
+        field("Quantity__c", "double"), field("Tree_Number__c"),
+    ],
+}
+KEY_PREFIXES = {"Account": "001", "Contact": "003", "Asset": "02i", "Product2": "01t"}
+
+COMPARATORS = {"=": operator.eq, "!=": operator.ne, "<>": operator.ne, ">": operator.gt, ">=": operator.ge,
+               "<": operator.lt, "<=": operator.le}
+SOQL_PATTERN = re.compile(r"^\s*SELECT\s+(?P<fields>.+?)\s+FROM\s+(?P<object>\w+)"
+                          r"(?:\s+WHERE\s+(?P<where>.+?))?(?:\s+LIMIT\s+(?P<limit>\d+))?\s*$", re.I | re.S)
+CONDITION_PATTERN = re.compile(r"^\s*(\w+)\s*(!=|<>|>=|<=|=|>|<)\s*(.+?)\s*$")
+
+
+class FakeError(Exception):
+    def __init__(self, code, message, status=400):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def iso_datetime(ms):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "+0000"
+
+
+def failure(code, message, fields=()):
+    return {"success": False, "created": False, "id": None,
+            "errors": [{"statusCode": code, "message": message, "fields": list(fields)}]}
+
+
+# 🔣 SOQL literál → Python hodnota (datetime jako epoch ms, stejně jako uložené záznamy)
+def parse_literal(text):
+    if text.upper() == "NULL":
+        return None
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    if len(text) >= 2 and text[0] == text[-1] == "'":
+        return text[1:-1].replace("\\'", "'")
+    if DATETIME_PATTERN.match(text):
+        return int(datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp() * 1000)
+    if DATE_PATTERN.match(text):
+        return text
+    try:
+        return float(text)
+    except ValueError:
+        raise FakeError("MALFORMED_QUERY", f"unexpected token: '{text}'")
+
+
+def matches(value, op, literal):
+    if literal is None or value is None:
+        if op not in ("=", "!=", "<>"):
+            return False
+        return (value is None) == (literal is None) if op == "=" else (value is None) != (literal is None)
+    if isinstance(literal, float) and not isinstance(value, bool):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+    elif isinstance(literal, str):
+        value = str(value)
+    return COMPARATORS[op](value, literal)
+
+
+# 🏢 Data "org" v paměti + Bulk joby; veškerý stav chrání jeden zámek
+class FakeOrg:
+    def __init__(self, options):
+        self.options = options
+        self.lock = threading.Lock()
+        self.random = random.Random(options.seed)
+        self.schema = {name: {f["name"].lower(): f for f in fields} for name, fields in SCHEMA.items()}
+        self.records = {}     # objekt → {Id: záznam}
+        self.external = {}    # (objekt, pole, hodnota) → Id
+        self.ids = {}         # Id → objekt
+        self.jobs = {}
+        self.batches = {}
+        self.cursors = {}
+        self.counter = itertools.count(1)
+        self.recent_requests = deque()
+        self.api_usage = 0
+        self.sessions = set()  # session id vydané loginem tohoto serveru
+
+    def new_id(self, prefix):
+        return f"{prefix}FAKE{next(self.counter):011d}"
+
+    # 🚦 Limity API: počet požadavků za sekundu a celkový (denní) limit → 403 REQUEST_LIMIT_EXCEEDED
+    def count_request(self):
+        with self.lock:
+            self.api_usage += 1
+            if self.options.api_limit and self.api_usage > self.options.api_limit:
+                raise FakeError("REQUEST_LIMIT_EXCEEDED", "TotalRequests Limit exceeded.", 403)
+            if self.options.rate_limit:
+                now = time.monotonic()
+                while self.recent_requests and now - self.recent_requests[0] >= 1:
+                    self.recent_requests.popleft()
+                if len(self.recent_requests) >= self.options.rate_limit:
+                    raise FakeError("REQUEST_LIMIT_EXCEEDED", "ConcurrentPerOrgLongTxn Limit exceeded.", 403)
+                self.recent_requests.append(now)
+
+    def limit_info(self):
+        return f"api-usage={self.api_usage}/{self.options.api_limit or 15000000}"
+
+    def describe(self, object_name):
+        if object_name not in SCHEMA:
+            raise FakeError("NOT_FOUND", f"The requested resource does not exist: {object_name}", 404)
+        return {"name": object_name, "fields": SCHEMA[object_name]}
+
+    def canonical(self, object_name, name):
+        meta = self.schema.get(object_name, {}).get(name.lower())
+        return meta["name"] if meta else name
+
+    # ✍️ Zápis dávky záznamů → výsledky ve formátu Bulk API 1.0
+    def write(self, object_name, operation, rows, external_id_field=None):
+        schema = self.schema.get(object_name)
+        if operation not in ("insert", "upsert", "update"):
+            raise FakeError("InvalidJob", f"Unsupported operation: {operation}")
+        if schema is not None:
+            names = {name for row in rows for name in row} | ({external_id_field} if operation == "upsert" else set())
+            unknown = sorted(name for name in names if name.lower() not in schema)
+            if unknown:
+                raise FakeError("InvalidBatch", f"Field name not found : {unknown[0]}")
+        with self.lock:
+            return [self.write_record(object_name, schema, operation, row, external_id_field) for row in rows]
+
+    def write_record(self, object_name, schema, operation, row, external_id_field):
+        values = {self.canonical(object_name, name): value for name, value in row.items()}
+        existing = None
+        if operation == "upsert":
+            key_field = self.canonical(object_name, external_id_field)
+            key = values.get(key_field)
+            if key in (None, ""):
+                return failure("MISSING_ARGUMENT", f"{key_field} not specified", [key_field])
+            existing = self.external.get((object_name, key_field, str(key)))
+        elif operation == "update":
+            existing = values.pop("Id", None)
+            if existing not in self.records.get(object_name, {}):
+                return failure("ENTITY_IS_DELETED", "entity is deleted", ["Id"])
+
+        # Simulované chyby org: zámky při paralelním zápisu, duplicitní pravidla při vytvoření
+        if self.random.random() < self.options.lock_rate:
+            return failure("UNABLE_TO_LOCK_ROW", "unable to obtain exclusive access to this record")
+        if existing is None and self.random.random() < self.options.duplicate_rate:
+            return failure("DUPLICATES_DETECTED", "Use one of these records?")
+
+        error = self.validate(object_name, schema, values, creating=existing is None) if schema else None
+        if error:
+            return failure(*error)
+
+        timestamp = now_ms()
+        if existing is None:
+            record_id = self.new_id(KEY_PREFIXES.get(object_name, "a0X"))
+            record = self.records.setdefault(object_name, {})[record_id] = {"Id": record_id, "CreatedDate": timestamp}
+            self.ids[record_id] = object_name
+        else:
+            record_id = existing
+            record = self.records[object_name][record_id]
+        record.update(values)
+        record["LastModifiedDate"] = timestamp
+        for meta in (schema or {}).values():
+            if meta["externalId"] and record.get(meta["name"]) not in (None, ""):
+                self.external[(object_name, meta["name"], str(record[meta["name"]]))] = record_id
+        return {"success": True, "created": existing is None, "id": record_id, "errors": []}
+
+    # 🧪 Typy, délky, reference a povinná pole – hodnoty se převedou na uložené typy
+    def validate(self, object_name, schema, values, creating):
+        for name, value in values.items():
+            meta = schema[name.lower()]
+            if not meta["createable"]:
+                return "INVALID_FIELD_FOR_INSERT_UPDATE", f"Unable to create/update fields: {name}", [name]
+            if value == "":
+                # Prázdný text = null (stejně jako Bulk API)
+                value = values[name] = None
+            if value is None:
+                if not meta["nillable"]:
+                    return "REQUIRED_FIELD_MISSING", f"Required fields are missing: [{name}]", [name]
+                continue
+            field_type = meta["type"]
+            text = str(value)
+            if field_type == "boolean":
+                if isinstance(value, bool) or text.lower() in ("true", "false", "1", "0"):
+                    values[name] = value if isinstance(value, bool) else text.lower() in ("true", "1")
+                    continue
+            elif field_type in NUMBER_TYPES:
+                try:
+                    values[name] = float(value)
+                    continue
+                except (TypeError, ValueError):
+                    pass
+            elif field_type == "date":
+                if DATE_PATTERN.match(text):
+                    continue
+            elif field_type == "reference":
+                if not ID_PATTERN.match(text):
+                    return "MALFORMED_ID", f"{name}: id value of incorrect type: {text}", [name]
+                # Loadery obsahují Id z produkční org (výchozí account) → existence jen na vyžádání
+                if self.options.strict_references and text not in self.ids:
+                    return "INVALID_CROSS_REFERENCE_KEY", f"invalid cross reference id: {text}", [name]
+                continue
+            else:
+                if meta["length"] and len(text) > meta["length"]:
+                    return "STRING_TOO_LONG", f"{name}: data value too large: {text[:40]}", [name]
+                values[name] = text
+                continue
+            return "INVALID_TYPE_ON_FIELD_IN_RECORD", f"{name}: value not of required type: {text}", [name]
+
+        if creating:
+            missing = [meta["name"] for meta in schema.values()
+                       if not meta["nillable"] and not meta["defaultedOnCreate"] and values.get(meta["name"]) is None]
+            if missing:
+                return "REQUIRED_FIELD_MISSING", f"Required fields are missing: {missing}", missing
+        return None
+
+    # 🔎 Podmnožina SOQL, kterou loadery používají: SELECT pole FROM objekt [WHERE a AND b] [LIMIT n]
+    def query(self, soql):
+        match = SOQL_PATTERN.match(soql)
+        if not match:
+            raise FakeError("MALFORMED_QUERY", f"unsupported query: {soql}")
+        object_name = match["object"]
+        fields = [self.canonical(object_name, f.strip()) for f in match["fields"].split(",")]
+        schema = self.schema.get(object_name)
+        if schema is not None:
+            unknown = [f for f in fields if f.lower() not in schema]
+            if unknown:
+                raise FakeError("INVALID_FIELD", f"No such column '{unknown[0]}' on entity '{object_name}'")
+        conditions = []
+        for part in re.split(r"\s+AND\s+", match["where"] or "", flags=re.I) if match["where"] else []:
+            condition = CONDITION_PATTERN.match(part)
+            if not condition:
+                raise FakeError("MALFORMED_QUERY", f"unsupported condition: {part}")
+            name, op, literal = condition.groups()
+            conditions.append((self.canonical(object_name, name), op, parse_literal(literal)))
+
+        with self.lock:
+            rows = [{"attributes": {"type": object_name, "url": f"/services/data/v59.0/sobjects/{object_name}/{rec['Id']}"},
+                     **{f: rec.get(f) for f in fields}}
+                    for rec in self.records.get(object_name, {}).values()
+                    if all(matches(rec.get(name), op, literal) for name, op, literal in conditions)]
+        return rows[:int(match["limit"])] if match["limit"] else rows
+
+    # 📦 Bulk API 1.0 – batch se zpracuje hned, ale "InProgress" zůstává podle --record-ms
+    def create_job(self, payload):
+        job_id = self.new_id("750")
+        job = {"id": job_id, "operation": payload.get("operation"), "object": payload.get("object"),
+               "externalIdFieldName": payload.get("externalIdFieldName"), "contentType": payload.get("contentType"),
+               "concurrencyMode": "Serial" if payload.get("concurrencyMode") == 1 else "Parallel", "state": "Open",
+               "batches": []}
+        with self.lock:
+            self.jobs[job_id] = job
+        return self.job_info(job_id)
+
+    def get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise FakeError("InvalidJob", f"Invalid job id: {job_id}", 404)
+        return job
+
+    def job_info(self, job_id):
+        job = self.get_job(job_id)
+        batches = [self.batch_info(batch_id) for batch_id in job["batches"]]
+        info = {key: value for key, value in job.items() if key not in ("batches", "upload", "results", "ready_at")}
+        info.update(numberBatchesTotal=len(batches), apiVersion=59.0,
+                    numberBatchesCompleted=sum(b["state"] == "Completed" for b in batches),
+                    numberRecordsProcessed=sum(b["numberRecordsProcessed"] for b in batches),
+                    numberRecordsFailed=sum(b["numberRecordsFailed"] for b in batches))
+        return info
+
+    def set_job_state(self, job_id, state):
+        self.get_job(job_id)["state"] = state
+        return self.job_info(job_id)
+
+    def add_batch(self, job_id, body):
+        job = self.get_job(job_id)
+        if job["state"] != "Open":
+            raise FakeError("InvalidJob", f"Job {job_id} is not open")
+        batch = {"id": self.new_id("751"), "jobId": job_id, "state": "Completed", "stateMessage": None,
+                 "results": [], "request": body, "records": 0}
+        try:
+            if job["operation"] in ("query", "queryAll"):
+                rows = self.query(body.decode("utf-8"))
+                batch["results"] = [rows[i:i + BULK_QUERY_PAGE_SIZE] for i in range(0, len(rows), BULK_QUERY_PAGE_SIZE)]
+                batch["result_ids"] = [self.new_id("752") for _ in batch["results"]]
+                batch["records"] = len(rows)
+            else:
+                records = json.loads(body)
+                batch["results"] = self.write(job["object"], job["operation"], records, job["externalIdFieldName"])
+                batch["records"] = len(records)
+        except FakeError as e:
+            batch.update(state="Failed", stateMessage=f"{e.code} : {e.message}")
+        except ValueError as e:
+            batch.update(state="Failed", stateMessage=f"InvalidBatch : {e}")
+        batch["ready_at"] = time.monotonic() + batch["records"] * self.options.record_ms / 1000
+        with self.lock:
+            self.batches[batch["id"]] = batch
+            job["batches"].append(batch["id"])
+        return self.batch_info(batch["id"])
+
+    def get_batch(self, batch_id):
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            raise FakeError("InvalidBatch", f"Invalid batch id: {batch_id}", 404)
+        return batch
+
+    def batch_info(self, batch_id):
+        batch = self.get_batch(batch_id)
+        done = time.monotonic() >= batch["ready_at"]
+        is_dml = "result_ids" not in batch
+        failed = sum(not r["success"] for r in batch["results"]) if done and is_dml else 0
+        return {"id": batch_id, "jobId": batch["jobId"], "state": batch["state"] if done else "InProgress",
+                "stateMessage": batch["stateMessage"],
+                "numberRecordsProcessed": batch["records"] if done and batch["state"] == "Completed" else 0,
+                "numberRecordsFailed": failed,
+                "totalProcessingTime": int(batch["records"] * self.options.record_ms) if done else 0}
+
+    def batch_result(self, batch_id):
+        batch = self.get_batch(batch_id)
+        if time.monotonic() < batch["ready_at"] or batch["state"] != "Completed":
+            raise FakeError("InvalidBatch", f"Batch {batch_id} not completed")
+        return batch.get("result_ids", batch["results"])
+
+    def query_result(self, batch_id, result_id):
+        batch = self.get_batch(batch_id)
+        if result_id not in batch.get("result_ids", []):
+            raise FakeError("InvalidBatch", f"Invalid result id: {result_id}", 404)
+        return batch["results"][batch["result_ids"].index(result_id)]
+
+    # 🚚 Bulk API 2.0 ingest – CSV (i gzip), výsledky jako CSV se sloupci sf__Id/sf__Created/sf__Error
+    def create_ingest_job(self, payload):
+        info = self.create_job(payload)
+        self.jobs[info["id"]].update(upload=b"", results=None, contentType="CSV")
+        return self.ingest_info(info["id"])
+
+    def ingest_info(self, job_id):
+        job = self.get_job(job_id)
+        results = job.get("results")
+        state = job["state"]
+        if state == "UploadComplete" and results is not None:
+            state = "JobComplete" if time.monotonic() >= job["ready_at"] else "InProgress"
+            if state == "JobComplete" and job.get("fails"):
+                # Job spadne po zpracování části řádků – výsledky zpracovaných řádků jsou ke stažení
+                job.update(state="Failed", errorMessage="InternalServerError : fake job failure")
+                state = "Failed"
+        info = {key: value for key, value in job.items() if key not in ("batches", "upload", "results", "ready_at")}
+        info.update(state=state, apiVersion=59.0,
+                    numberRecordsProcessed=len(results[0]) if results and state in INGEST_DONE_STATES else 0,
+                    numberRecordsFailed=sum(1 for r in results[0] if not r["success"])
+                    if results and state in INGEST_DONE_STATES else 0)
+        return info
+
+    def upload_ingest_data(self, job_id, body):
+        job = self.get_job(job_id)
+        if job["state"] != "Open":
+            raise FakeError("INVALIDJOBSTATE", f"Job {job_id} is not open")
+        job["upload"] += body
+
+    def set_ingest_state(self, job_id, state):
+        job = self.get_job(job_id)
+        if state == "Aborted" and self.ingest_info(job_id)["state"] in INGEST_DONE_STATES:
+            raise FakeError("INVALIDJOBSTATE", f"Job {job_id} is already finished")
+        job["state"] = state
+        if state != "UploadComplete":
+            return self.ingest_info(job_id)
+        reader = csv.DictReader(io.StringIO(job["upload"].decode("utf-8")))
+        sent = list(reader)
+        # Prázdná hodnota = pole neměnit, #N/A = vymazat
+        rows = [{k: (None if v == CSV_NULL else v) for k, v in row.items() if v != ""} for row in sent]
+        if self.random.random() < self.options.job_failure_rate:
+            # Selhaný job: zpracuje se jen první polovina řádků (zbytek zůstane nezpracovaný)
+            job["fails"] = True
+            rows = rows[:len(rows) // 2]
+        try:
+            results = self.write(job["object"], job["operation"], rows, job["externalIdFieldName"])
+        except FakeError as e:
+            job.update(state="Failed", errorMessage=e.message)
+            return self.ingest_info(job_id)
+        job["results"] = (results, sent, reader.fieldnames or [])
+        job["ready_at"] = time.monotonic() + len(rows) * self.options.record_ms / 1000
+        return self.ingest_info(job_id)
+
+    def ingest_results(self, job_id, results_type):
+        job = self.get_job(job_id)
+        if self.ingest_info(job_id)["state"] not in INGEST_DONE_STATES or job.get("results") is None:
+            raise FakeError("INVALIDJOBSTATE", f"Job {job_id} is not complete")
+        results, sent, columns = job["results"]
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        if results_type == "successfulResults":
+            writer.writerow(["sf__Id", "sf__Created", *columns])
+            writer.writerows([r["id"], str(r["created"]).lower(), *row.values()]
+                             for r, row in zip(results, sent) if r["success"])
+        elif results_type == "failedResults":
+            writer.writerow(["sf__Id", "sf__Error", *columns])
+            writer.writerows(["", ":".join([e["statusCode"], e["message"], ",".join(e["fields"])]), *row.values()]
+                             for r, row in zip(results, sent) if not r["success"] for e in r["errors"][:1])
+        else:
+            writer.writerow(columns)
+        return out.getvalue().encode("utf-8")
+
+    # 🔁 REST query po stránkách s nextRecordsUrl
+    def rest_query(self, soql, version):
+        rows = self.query(soql)
+        locator = self.new_id("01g")
+        with self.lock:
+            self.cursors[locator] = rows
+        return self.rest_query_page(locator, 0, version)
+
+    def rest_query_page(self, locator, offset, version):
+        rows = self.cursors.get(locator)
+        if rows is None:
+            raise FakeError("INVALID_QUERY_LOCATOR", "invalid query locator")
+        page = [{k: iso_datetime(v) if k in DATETIME_FIELDS and v is not None else v for k, v in row.items()}
+                for row in rows[offset:offset + REST_QUERY_PAGE_SIZE]]
+        result = {"totalSize": len(rows), "done": offset + REST_QUERY_PAGE_SIZE >= len(rows), "records": page}
+        if not result["done"]:
+            result["nextRecordsUrl"] = f"/services/data/v{version}/query/{locator}-{offset + REST_QUERY_PAGE_SIZE}"
+        return result
+
+
+ROUTES = [
+    ("POST", r"/services/Soap/u/[\d.]+", "login"),
+    ("POST", r"/services/async/[\d.]+/job", "bulk_create_job"),
+    ("GET", r"/services/async/[\d.]+/job/(\w+)", "bulk_job"),
+    ("POST", r"/services/async/[\d.]+/job/(\w+)", "bulk_job_state"),
+    ("POST", r"/services/async/[\d.]+/job/(\w+)/batch", "bulk_add_batch"),
+    ("GET", r"/services/async/[\d.]+/job/(\w+)/batch", "bulk_batches"),
+    ("GET", r"/services/async/[\d.]+/job/\w+/batch/(\w+)", "bulk_batch"),
+    ("GET", r"/services/async/[\d.]+/job/\w+/batch/(\w+)/request", "bulk_batch_request"),
+    ("GET", r"/services/async/[\d.]+/job/\w+/batch/(\w+)/result", "bulk_batch_result"),
+    ("GET", r"/services/async/[\d.]+/job/\w+/batch/(\w+)/result/(\w+)", "bulk_query_result"),
+    ("POST", r"/services/data/v[\d.]+/jobs/ingest/?", "ingest_create"),
+    ("GET", r"/services/data/v[\d.]+/jobs/ingest/(\w+)/?", "ingest_job"),
+    ("PATCH", r"/services/data/v[\d.]+/jobs/ingest/(\w+)/?", "ingest_state"),
+    ("DELETE", r"/services/data/v[\d.]+/jobs/ingest/(\w+)/?", "ingest_delete"),
+    ("PUT", r"/services/data/v[\d.]+/jobs/ingest/(\w+)/batches/?", "ingest_upload"),
+    ("GET", r"/services/data/v[\d.]+/jobs/ingest/(\w+)/(successfulResults|failedResults|unprocessedrecords)/?",
+     "ingest_results"),
+    ("GET", r"/services/data/v([\d.]+)/(?:query|queryAll)/?", "rest_query"),
+    ("GET", r"/services/data/v([\d.]+)/(?:query|queryAll)/(\w+)-(\d+)/?", "rest_query_more"),
+    ("GET", r"/services/data/v[\d.]+/limits/?", "rest_limits"),
+    ("GET", r"/services/data/v[\d.]+/sobjects/(\w+)/describe/?", "rest_describe"),
+    ("POST", r"/services/data/v[\d.]+/sobjects/(\w+)/?", "rest_create"),
+    ("PATCH", r"/services/data/v[\d.]+/sobjects/(\w+)/(\w+)/?", "rest_update"),
+    ("PATCH", r"/services/data/v[\d.]+/sobjects/(\w+)/(\w+)/([^/]+)/?", "rest_upsert"),
+    ("POST", r"/services/data/v[\d.]+/composite/sobjects/?", "collections_create"),
+    ("PATCH", r"/services/data/v[\d.]+/composite/sobjects/?", "collections_update"),
+    ("PATCH", r"/services/data/v[\d.]+/composite/sobjects/(\w+)/(\w+)/?", "collections_upsert"),
+]
+ROUTES = [(method, re.compile(pattern + "$"), name) for method, pattern, name in ROUTES]
+
+LOGIN_RESPONSE = """<?xml version="1.0" encoding="UTF-8"?>
+<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns="urn:partner.soap.sforce.com">
+<soapenv:Body><loginResponse><result>
+<serverUrl>https://{instance}/services/Soap/u/59.0/00DFAKE</serverUrl>
+<sessionId>{session_id}</sessionId><userId>005FAKE00000000001</userId>
+</result></loginResponse></soapenv:Body></soapenv:Envelope>"""
+
+
+# 🌐 HTTP vrstva – směrování na metody FakeOrg, chyby ve formátu daného API
+class FakeSalesforceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_PATCH(self):
+        self.dispatch("PATCH")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    @property
+    def org(self):
+        return self.server.org
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if self.org.options.latency_ms:
+            time.sleep(self.org.options.latency_ms / 1000)
+        try:
+            for route_method, pattern, name in ROUTES:
+                match = pattern.match(url.path)
+                if match and route_method == method:
+                    if name != "login":
+                        self.check_session(url.path)
+                        self.org.count_request()
+                    status, payload, content_type = getattr(self, name)(*match.groups(), body=body,
+                                                                        params=parse_qs(url.query))
+                    break
+            else:
+                raise FakeError("NOT_FOUND", f"{method} {url.path}", 404)
+        except FakeError as e:
+            status, content_type = e.status, "application/json"
+            if url.path.startswith("/services/async/"):
+                payload = {"exceptionCode": e.code, "exceptionMessage": e.message}
+            else:
+                payload = [{"errorCode": e.code, "message": e.message}]
+        self.respond(status, payload, content_type)
+
+    def respond(self, status, payload, content_type="application/json"):
+        if payload is None:
+            data = b""
+        elif isinstance(payload, bytes):
+            data = payload
+        elif isinstance(payload, str):
+            data = payload.encode("utf-8")
+        else:
+            data = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Sforce-Limit-Info", self.org.limit_info())
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.org.options.verbose:
+            super().log_message(format, *args)
+
+    @staticmethod
+    def json_body(body):
+        try:
+            return json.loads(body or b"{}")
+        except ValueError as e:
+            raise FakeError("JSON_PARSER_ERROR", str(e))
+
+    def login(self, body, params):
+        session_id = f"00DFAKE!{secrets.token_hex(16)}"
+        with self.org.lock:
+            self.org.sessions.add(session_id)
+        return 200, LOGIN_RESPONSE.format(instance=INSTANCE, session_id=session_id), "text/xml"
+
+    # 🔑 Token z Authorization: Bearer (REST, Bulk 2.0) nebo X-SFDC-Session (Bulk 1.0) musí být z loginu
+    #    tohoto serveru – session z jiného běhu je "vypršelá" (401 INVALID_SESSION_ID, v Bulk 1.0 400)
+    def check_session(self, path):
+        authorization = self.headers.get("Authorization") or ""
+        session_id = self.headers.get("X-SFDC-Session") or authorization.removeprefix("Bearer ").strip()
+        if session_id not in self.org.sessions:
+            if path.startswith("/services/async/"):
+                raise FakeError("InvalidSessionId", "Invalid session id", 400)
+            raise FakeError("INVALID_SESSION_ID", "Session expired or invalid", 401)
+
+    def bulk_create_job(self, body, params):
+        return 201, self.org.create_job(self.json_body(body)), "application/json"
+
+    def bulk_job(self, job_id, body, params):
+        return 200, self.org.job_info(job_id), "application/json"
+
+    def bulk_job_state(self, job_id, body, params):
+        return 200, self.org.set_job_state(job_id, self.json_body(body).get("state")), "application/json"
+
+    def bulk_add_batch(self, job_id, body, params):
+        return 201, self.org.add_batch(job_id, body), "application/json"
+
+    def bulk_batches(self, job_id, body, params):
+        return 200, {"batchInfo": [self.org.batch_info(b) for b in self.org.get_job(job_id)["batches"]]}, \
+            "application/json"
+
+    def bulk_batch(self, batch_id, body, params):
+        return 200, self.org.batch_info(batch_id), "application/json"
+
+    def bulk_batch_request(self, batch_id, body, params):
+        return 200, self.org.get_batch(batch_id)["request"], "application/json"
+
+    def bulk_batch_result(self, batch_id, body, params):
+        return 200, self.org.batch_result(batch_id), "application/json"
+
+    def bulk_query_result(self, batch_id, result_id, body, params):
+        return 200, self.org.query_result(batch_id, result_id), "application/json"
+
+    def ingest_create(self, body, params):
+        return 200, self.org.create_ingest_job(self.json_body(body)), "application/json"
+
+    def ingest_job(self, job_id, body, params):
+        return 200, self.org.ingest_info(job_id), "application/json"
+
+    def ingest_state(self, job_id, body, params):
+        return 200, self.org.set_ingest_state(job_id, self.json_body(body).get("state")), "application/json"
+
+    def ingest_delete(self, job_id, body, params):
+        self.org.get_job(job_id)
+        self.org.jobs.pop(job_id, None)
+        return 204, None, "application/json"
+
+    def ingest_upload(self, job_id, body, params):
+        self.org.upload_ingest_data(job_id, body)
+        return 201, None, "application/json"
+
+    def ingest_results(self, job_id, results_type, body, params):
+        return 200, self.org.ingest_results(job_id, results_type), "text/csv"
+
+    def rest_query(self, version, body, params):
+        return 200, self.org.rest_query(params.get("q", [""])[0], version), "application/json"
+
+    def rest_query_more(self, version, locator, offset, body, params):
+        return 200, self.org.rest_query_page(locator, int(offset), version), "application/json"
+
+    def rest_limits(self, body, params):
+        limit = self.org.options.api_limit or 15000000
+        return 200, {"DailyApiRequests": {"Max": limit, "Remaining": max(limit - self.org.api_usage, 0)}}, \
+            "application/json"
+
+    def rest_describe(self, object_name, body, params):
+        return 200, self.org.describe(object_name), "application/json"
+
+    def rest_create(self, object_name, body, params):
+        return self.rest_result(self.org.write(object_name, "insert", [self.json_body(body)])[0])
+
+    def rest_update(self, object_name, record_id, body, params):
+        result = self.org.write(object_name, "update", [{**self.json_body(body), "Id": record_id}])[0]
+        return self.rest_result(result) if not result["success"] else (204, None, "application/json")
+
+    def rest_upsert(self, object_name, key_field, key, body, params):
+        result = self.org.write(object_name, "upsert", [{**self.json_body(body), key_field: key}], key_field)[0]
+        if result["success"] and not result["created"]:
+            return 204, None, "application/json"
+        return self.rest_result(result)
+
+    # 📨 sObject Collections – max 200 záznamů jednoho typu (attributes.type), výsledky v pořadí záznamů
+    def collections_create(self, body, params):
+        results = self.collections_write("insert", body)
+        return 200, [{key: r[key] for key in ("id", "success", "errors")} for r in results], "application/json"
+
+    def collections_update(self, body, params):
+        results = self.collections_write("update", body)
+        return 200, [{key: r[key] for key in ("id", "success", "errors")} for r in results], "application/json"
+
+    def collections_upsert(self, object_name, key_field, body, params):
+        return 200, self.collections_write("upsert", body, object_name, key_field), "application/json"
+
+    def collections_write(self, operation, body, object_name=None, key_field=None):
+        records = self.json_body(body).get("records") or []
+        if len(records) > COLLECTION_LIMIT:
+            raise FakeError("EXCEEDED_ID_LIMIT",
+                            f"record limit reached. cannot submit more than {COLLECTION_LIMIT} records into this call")
+        if not records:
+            return []
+        object_name = object_name or (records[0].get("attributes") or {}).get("type")
+        rows = [{key: value for key, value in rec.items() if key != "attributes"} for rec in records]
+        return self.org.write(object_name, operation, rows, key_field)
+
+    @staticmethod
+    def rest_result(result):
+        if result["success"]:
+            return 201, {"id": result["id"], "success": True, "errors": []}, "application/json"
+        error = result["errors"][0]
+        return 400, [{"errorCode": error["statusCode"], "message": error["message"], "fields": error["fields"]}], \
+            "application/json"
+
+
+# ⚙️ Volby serveru – výchozí hodnoty z proměnných prostředí FAKE_SF_*
+def option_parser():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("FAKE_SF_LATENCY_MS", "0")),
+                        help="zpoždění každého požadavku")
+    parser.add_argument("--record-ms", type=float, default=float(os.getenv("FAKE_SF_RECORD_MS", "0")),
+                        help="doba zpracování jednoho záznamu v Bulk jobu")
+    parser.add_argument("--lock-rate", type=float, default=float(os.getenv("FAKE_SF_LOCK_RATE", "0")),
+                        help="podíl záznamů s chybou UNABLE_TO_LOCK_ROW")
+    parser.add_argument("--duplicate-rate", type=float, default=float(os.getenv("FAKE_SF_DUPLICATE_RATE", "0")),
+                        help="podíl nových záznamů s chybou DUPLICATES_DETECTED")
+    parser.add_argument("--job-failure-rate", type=float, default=float(os.getenv("FAKE_SF_JOB_FAILURE_RATE", "0")),
+                        help="podíl Bulk 2.0 jobů, které selžou po zpracování poloviny řádků")
+    parser.add_argument("--rate-limit", type=int, default=int(os.getenv("FAKE_SF_RATE_LIMIT", "0")),
+                        help="max. požadavků za sekundu (0 = bez limitu)")
+    parser.add_argument("--api-limit", type=int, default=int(os.getenv("FAKE_SF_API_LIMIT", "0")),
+                        help="max. požadavků celkem (0 = bez limitu)")
+    parser.add_argument("--strict-references", action="store_true",
+                        default=os.getenv("FAKE_SF_STRICT_REFERENCES", "0") == "1",
+                        help="lookup musí odkazovat na záznam nahraný do fake org")
+    parser.add_argument("--seed", type=int, default=int(os.getenv("FAKE_SF_SEED", "0")),
+                        help="seed pro opakovatelné chyby")
+    parser.add_argument("--verbose", action="store_true", help="vypisovat každý požadavek")
+    return parser
+
+
+def default_options():
+    return option_parser().parse_args([])
+
+
+# ▶️ Server ve vlákně na pozadí (port 0 = volný port); vrací (server, URL)
+def start_server(options, port=0, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), FakeSalesforceHandler)
+    server.daemon_threads = True
+    server.org = FakeOrg(options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# 🔀 Všechny HTTPS požadavky procesu (simple_salesforce jiné URL nesestaví) → lokální server
+def redirect_requests(base_url):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    target = urlparse(base_url)
+
+    class RedirectAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            request.url = urlunparse(urlparse(request.url)._replace(scheme=target.scheme, netloc=target.netloc))
+            return super().send(request, **kwargs)
+
+    original_init = requests.Session.__init__
+
+    def init(session, *args, **kwargs):
+        original_init(session, *args, **kwargs)
+        session.mount("https://", RedirectAdapter())
+
+    requests.Session.__init__ = init
+
+
+# 🏃 Spuštění loaderu proti fake serveru (bez FAKE_SF_URL se spustí vlastní server v procesu)
+def run_script(script, args, options, url=None):
+    if url is None:
+        _, url = start_server(options)
+    redirect_requests(url)
+    # Falešné přihlašovací údaje mají přednost před credentials.env (load_dotenv nepřepisuje)
+    os.environ.update(SF_USERNAME="fake@example.com", SF_PASSWORD="fake", SF_TOKEN="fake", SF_DOMAIN="login")
+    os.environ.setdefault("DELTA_STATE_DIR", FAKE_STATE_DIR)
+    print(f"🧪 {script} proti fake Salesforce {url}")
+    sys.argv = [script, *args]
+    runpy.run_path(script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokální náhrada Salesforce pro GO LIVE skripty")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", parents=[option_parser()], help="spustit server")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--host", default="127.0.0.1")
+    run = commands.add_parser("run", parents=[option_parser()], help="spustit skript proti fake serveru")
+    run.add_argument("--url", default=os.getenv("FAKE_SF_URL"), help="běžící server (jinak se spustí vlastní)")
+    run.add_argument("script")
+    run.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server, url = start_server(args, args.port, args.host)
+        print(f"🧪 Fake Salesforce na {url} (instance {INSTANCE}) – ukončení Ctrl+C")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        run_script(args.script, args.args, args, args.url)
@@ -1,93 +1,212 @@
 import pandas as pd
-from simple_salesforce import Salesforce
-from dotenv import load_dotenv
-import os
+from sf_session import connect
+from excel_stream import read_excel_chunks
+from delta_state import DeltaState
+from bulk2_upload import BULK2_ENABLED, bulk2_load
+from sobject_collections import use_collections, collections_load
+from payload import sanitize_frame, frame_records
+from preflight import Preflight
+from reconcile import ResultWriter
+from metrics import stage, timed_iter, start_run
+from checkpoint import Checkpoint
+from bulk_upload import bulk_upsert
+from batch_sizing import AdaptiveBatcher
+from bom_graph import BomGraph
+from compact_dtypes import compact_frame
+from sdl_mapping import load_plan
+from load_verify import LoadVerifier
+
+# ⏱️ Měření běhu (METRICS=0 vypne) – metriky se po skončení zapíší do logs/metrics/
+start_run()
 
 # 🔐 Načtení přihlašovacích údajů
-load_dotenv("credentials.env")
-
-sf = Salesforce(
-    username=os.getenv("SF_USERNAME"),
-    password=os.getenv("SF_PASSWORD"),
-    security_token=os.getenv("SF_TOKEN"),
-    domain=os.getenv("SF_DOMAIN", "login")
-)
+with stage("login"):
+    sf = connect()
 
 print("✅ Připojeno k Salesforce.")
 
-# 📥 Načtení dat
-kusovnik = pd.read_excel("kusovníky 28.3..xlsx")
+# 📥 Načtení dat (kusovník se čte streamovaně po chuncích)
+KUSOVNIK_FILE = "kusovníky 28.3..xlsx"
+ROLLUP_FILE = "kusovnik_rollup.csv"
+ORDER_FILE = "kusovnik_order.csv"
+MAPPING_FILE = "KusovnikMapping.sdl"
 produkty = pd.read_csv("produkty_28.3_OUT.csv")
 
 # 🧼 Čištění textů
-kusovnik["Reg.č. Produktu"] = kusovnik["Reg.č. Produktu"].astype(str).str.strip().str.replace('"', '')
-kusovnik["Reg. č. kusu"] = kusovnik["Reg. č. kusu"].astype(str).str.strip().str.replace('"', '')
-kusovnik["Strom"] = kusovnik["Strom"].astype(str).str.strip()
 produkty["ProductCode"] = produkty["ProductCode"].astype(str).str.strip().str.replace('"', '')
 
 # 🔁 Mapování kódů na ID a názvy
 product_map_id = produkty.set_index("ProductCode")["Salesforce_ID"].to_dict()
 product_map_name = produkty.set_index("ProductCode")["Name"].to_dict()
 
-# 🧱 Vytvoření hlavního DataFrame
-df = pd.DataFrame({
-    "Parent_Product_Code__c": kusovnik["Reg.č. Produktu"],
-    "Product_Code__c": kusovnik["Reg. č. kusu"],
-    "Quantity__c": kusovnik["Množství (MNF)"],
-    "Measure_of_Quantity__c": kusovnik["MJ evidence"],
-    "Tree_Number__c": kusovnik["Strom"]
-})
-
-# 🔗 Mapování na Salesforce ID a název
-df["Parent_Product__c"] = df["Parent_Product_Code__c"].map(product_map_id)
-df["Product__c"] = df["Product_Code__c"].map(product_map_id)
-df["Name"] = df["Product_Code__c"].map(product_map_name)
-
-# ❌ Odstranění záznamů, kde produkt obsahuje sám sebe
-df = df[df["Parent_Product__c"] != df["Product__c"]]
-
-# ✅ Filtrování validních záznamů (bez Tree kontrol)
-df_valid = df[
-    df["Parent_Product__c"].notnull() &
-    df["Product__c"].notnull() &
-    df["Name"].notnull()
-].copy()
-
 # 🔢 Generování Import_ID__c (PS0001, PS0002, ...)
 IMPORT_ID_PREFIX = "PS"
 
 def generate_import_id(index):
     return f"{IMPORT_ID_PREFIX}{str(index + 1).zfill(4)}"
 
-df_valid = df_valid.reset_index(drop=True)
-df_valid["Import_ID__c"] = df_valid.index.map(generate_import_id)
-
-print(f"\n📦 Připraveno k upsertu: {len(df_valid)} záznamů\n")
-
-# 📤 Záznamy pro Salesforce
-records = df_valid[[
-    "Name",
-    "Parent_Product__c",
-    "Product__c",
-    "Parent_Product_Code__c",
-    "Product_Code__c",
-    "Quantity__c",
-    "Measure_of_Quantity__c",
-    "Tree_Number__c",
-    "Import_ID__c"
-]].to_dict(orient="records")
-
-# 🔄 Bulk upsert podle Import_ID__c
-response = sf.bulk.Product_Structure__c.upsert(records, external_id_field='Import_ID__c')
-
-# 📊 Výsledek
-success = sum(1 for r in response if r.get("success"))
-failures = [r for r in response if not r.get("success")]
-
-print(f"\n✅ Úspěšně upsertováno: {success}")
-print(f"❌ Selhalo: {len(failures)}")
+# 🧼 Čištění textů kusovníku
+def clean_kusovnik(kusovnik):
+    kusovnik["Reg.č. Produktu"] = kusovnik["Reg.č. Produktu"].astype(str).str.strip().str.replace('"', '')
+    kusovnik["Reg. č. kusu"] = kusovnik["Reg. č. kusu"].astype(str).str.strip().str.replace('"', '')
+    kusovnik["Strom"] = kusovnik["Strom"].astype(str).str.strip()
+    return kusovnik
+
+# 🌳 Řádky kusovníku pro graf (index = číslo řádku v souboru)
+def bom_rows(kusovnik):
+    kusovnik = clean_kusovnik(kusovnik)
+    return pd.DataFrame({
+        "product": kusovnik["Reg.č. Produktu"],
+        "path": kusovnik["Strom"],
+        "component": kusovnik["Reg. č. kusu"],
+        "quantity": kusovnik["Množství (MNF)"],
+        "unit": kusovnik["MJ evidence"]
+    })
+
+# 🗺️ Sloupce kusovníku → pole Product_Structure__c
+#    KusovnikMapping.sdl je mapping Data Loaderu pro jiný CSV (ProductId, ProductCode, Reg.č. Produktu → Name),
+#    přejmenování z něj na Excel kusovníku nesedí → sloupce jsou zde, ze SDL se použijí "#@" transformace polí
+STRUCTURE_COLUMNS = {
+    "Reg.č. Produktu": "Parent_Product_Code__c",
+    "Reg. č. kusu": "Product_Code__c",
+    "Množství (MNF)": "Quantity__c",
+    "MJ evidence": "Measure_of_Quantity__c",
+    "Strom": "Tree_Number__c"
+}
+plan = load_plan(MAPPING_FILE)
+
+# 🧱 Příprava validních záznamů z jednoho chunku kusovníku
+#    valid_offset = počet validních záznamů z předchozích chunků
+def prepare_structure(kusovnik, valid_offset):
+    kusovnik = clean_kusovnik(kusovnik)
+
+    # 🧱 Vytvoření hlavního DataFrame + transformace polí z SDL
+    df = plan.transform(kusovnik[list(STRUCTURE_COLUMNS)].rename(columns=STRUCTURE_COLUMNS))
+
+    # 🔗 Mapování na Salesforce ID a název
+    df["Parent_Product__c"] = df["Parent_Product_Code__c"].map(product_map_id)
+    df["Product__c"] = df["Product_Code__c"].map(product_map_id)
+    df["Name"] = df["Product_Code__c"].map(product_map_name)
+
+    # ❌ Odstranění záznamů, kde produkt obsahuje sám sebe
+    df = df[df["Parent_Product__c"] != df["Product__c"]]
+
+    # ✅ Filtrování validních záznamů (bez Tree kontrol)
+    df_valid = df[
+        df["Parent_Product__c"].notnull() &
+        df["Product__c"].notnull() &
+        df["Name"].notnull()
+    ].copy()
+
+    # Číslo řádku v souboru – vazba na kontroly grafu kusovníku
+    df_valid["Source_Row"] = df_valid.index
+    df_valid.index = pd.RangeIndex(valid_offset, valid_offset + len(df_valid))
+    df_valid["Import_ID__c"] = df_valid.index.map(generate_import_id)
+    return df_valid
+
+# 🌳 Graf celého kusovníku – cykly, sirotci a nekonzistentní Strom se zjistí ještě před uploadem
+bom = BomGraph(pd.concat(bom_rows(k) for k in read_excel_chunks(KUSOVNIK_FILE)))
+bom.report()
+with stage("bom_rollup"):
+    bom.rollup().to_csv(ROLLUP_FILE, index=False, encoding="utf-8-sig")
+print(f"📦 Souhrn koncových kusů na produkt uložen do {ROLLUP_FILE}")
+# 📋 Pořadí kódů rodiče před kusy (úroveň v kusovníku) – pro nahrávání/kontrolu po úrovních
+bom.topological_order().to_csv(ORDER_FILE, index=False, encoding="utf-8-sig")
+print(f"📋 Topologické pořadí produktů uloženo do {ORDER_FILE}")
+
+valid_count = 0
+sample_errors = []
+
+# 🔁 Posílají se jen nové a změněné záznamy
+delta = DeltaState(sf, "Product_Structure__c")
+
+# 🧾 Výsledky se zapisují průběžně vedle původních řádků (chyby zvlášť)
+result_writer = ResultWriter("product_structure_import_results.csv", "product_structure_import_errors.csv")
+
+# 🛫 Kontrola proti metadatům Product_Structure__c – chybné řádky se neodesílají
+preflight = Preflight(sf, "Product_Structure__c")
+
+# ⏩ Hotové batche přerušeného běhu se s --resume neodesílají znovu
+checkpoint = Checkpoint(sf, "Product_Structure__c")
+
+# 📏 Velikost batchí se přizpůsobuje objemu dat a době zpracování napříč chunky
+batcher = AdaptiveBatcher("Product_Structure__c")
+
+# 🔎 Ověření nahrané struktury proti org po běhu (VERIFY_LOAD)
+verifier = LoadVerifier(sf, "Product_Structure__c", "product_structure_verify.csv")
+
+for kusovnik in timed_iter("excel_read", read_excel_chunks(KUSOVNIK_FILE)):
+    with stage("transform", len(kusovnik)):
+        df_valid = compact_frame(prepare_structure(kusovnik, valid_count), "transform")
+    valid_count += len(df_valid)
+
+    print(f"\n📦 Připraveno k upsertu: {len(df_valid)} záznamů\n")
+    if df_valid.empty:
+        continue
+
+    # 📤 Záznamy pro Salesforce – vyčištěné (NaN/inf → None, numpy typy → Python hodnoty)
+    upload_df = sanitize_frame(df_valid[[
+        "Name",
+        "Parent_Product__c",
+        "Product__c",
+        "Parent_Product_Code__c",
+        "Product_Code__c",
+        "Quantity__c",
+        "Measure_of_Quantity__c",
+        "Tree_Number__c",
+        "Import_ID__c"
+    ]])
+    records = frame_records(upload_df)
+    upload_df, records, rejected, rejected_response = bom.validate(upload_df, records, df_valid["Source_Row"])
+    if len(rejected):
+        failed = result_writer.write(rejected, rejected_response)
+        sample_errors.extend(failed.head(10 - len(sample_errors)).to_dict(orient="records"))
+    upload_df, records, rejected, rejected_response = preflight.validate(upload_df, records)
+    if len(rejected):
+        failed = result_writer.write(rejected, rejected_response)
+        sample_errors.extend(failed.head(10 - len(sample_errors)).to_dict(orient="records"))
+    changed = delta.changed_mask(records)
+    verifier.expect([rec for rec, c in zip(records, changed) if not c])
+    records = [rec for rec, c in zip(records, changed) if c]
+    upload_df = upload_df[changed]
+    if not records:
+        continue
+
+    # 🔄 Bulk upsert podle Import_ID__c
+    progress = checkpoint.start(records, upload_df.index)
+    pending = progress.pending(records)
+    sent = []
+    if pending:
+        with stage("upload", len(pending)):
+            if use_collections("Product_Structure__c", len(pending)):
+                sent = collections_load(sf, "Product_Structure__c", pending, external_id_field="Import_ID__c",
+                                        checkpoint=progress)
+            elif BULK2_ENABLED:
+                sent = bulk2_load(sf, "Product_Structure__c", upload_df.iloc[progress.todo][list(records[0])],
+                                  external_id_field="Import_ID__c", checkpoint=progress)
+            else:
+                sent = bulk_upsert(sf, "Product_Structure__c", pending, external_id_field="Import_ID__c",
+                                   batcher=batcher, checkpoint=progress)
+    response = progress.merge(sent)
+    delta.mark_uploaded(records, response)
+    verifier.expect(records, response)
+
+    # 📊 Výsledek – spárování s původními řádky podle pozice
+    result = result_writer.write(upload_df, response)
+    failed = result[~result["Success"]]
+    sample_errors.extend(failed.head(10 - len(sample_errors)).to_dict(orient="records"))
+
+delta.save()
+checkpoint.finish()
+
+print(f"\n✅ Úspěšně upsertováno: {result_writer.success_count} z {valid_count}")
+print(f"❌ Selhalo: {result_writer.failure_count}")
+print(f"⏭️ Beze změny (neodesláno): {delta.unchanged_count}")
 
 # 🧾 Ukázka chyb
-for i, fail in enumerate(failures[:10]):
-    print(f"\n❌ Chyba č. {i+1}")
-    print("  Errors:", fail.get('errors'))
\ No newline at end of file
+for i, fail in enumerate(sample_errors):
+    print(f"\n❌ Chyba č. {i+1} ({fail['Import_ID__c']}: {fail['Parent_Product_Code__c']} → {fail['Product_Code__c']})")
+    print("  Errors:", fail["Chyba_kód"], "–", fail["Chyba_zpráva"])
+
+# 🔎 Hodnoty v org proti odeslaným – chybějící, navíc a rozdílné záznamy (jen s VERIFY_LOAD=1)
+verifier.finish()
@@ -1,174 +1,183 @@
 import pandas as pd
 import os
-import json
-import numpy as np
-import datetime
 import warnings  # ← sem s tím
-from simple_salesforce import Salesforce
-from dotenv import load_dotenv
-from more_itertools import chunked
+from sf_session import connect
+from bulk_upload import bulk_upsert, bulk_load_by_parent
+from excel_stream import read_excel_chunks
+from debug_dump import open_debug_writer
+from delta_state import DeltaState
+from bulk2_upload import BULK2_ENABLED, bulk2_load
+from sobject_collections import use_collections, collections_load
+from payload import sanitize_frame, frame_records
+from preflight import Preflight
+from reconcile import ResultWriter
+from account_index import open_account_index
+from metrics import stage, timed_iter, start_run
+from checkpoint import Checkpoint
+from batch_sizing import AdaptiveBatcher
+from sdl_mapping import load_plan
+from load_verify import LoadVerifier
 warnings.filterwarnings("ignore", category=UserWarning)
 
 
 DEFAULT_OUTPUT_DIR = "output"
 OBJECT_API_NAME = "Invoice__c"
+BATCH_SIZE = 10000
+# 🚀 Počet souběžně zpracovávaných batchí (1 = sériově, batch po batchi)
+#    Paralelní batche jsou rozdělené podle Billing_Account__c, aby se nezamykaly na stejném Accountu
+MAX_PARALLEL_BATCHES = int(os.getenv("SF_MAX_PARALLEL_BATCHES", "1"))
+
+# ⏱️ Měření běhu (METRICS=0 vypne) – metriky se po skončení zapíší do logs/metrics/
+start_run()
 
 # 🔐 Načtení přihlašovacích údajů
-load_dotenv("credentials.env")
-sf = Salesforce(
-    username=os.getenv("SF_USERNAME"),
-    password=os.getenv("SF_PASSWORD"),
-    security_token=os.getenv("SF_TOKEN"),
-    domain=os.getenv("SF_DOMAIN", "login")
-)
+with stage("login"):
+    sf = connect()
 print("✅ Připojeno k Salesforce.")
 
-# 🔁 Načtení mapování ze SDL
-def normalize_column_name(name):
-    return name.strip().lower().replace(" ", "").replace("/", "").replace(".", "").replace("+", "").replace("č", "c").replace("ř", "r")
-
-def load_sdl_mapping(path):
-    mapping = {}
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            if "=" in line:
-                src, tgt = line.split("=", 1)
-                mapping[normalize_column_name(src)] = tgt.strip()
-    return mapping
-
-# 🧼 Sanitizace záznamu
-def sanitize_record_values(rec):
-    for key, value in rec.items():
-        if isinstance(value, float) and (np.isnan(value) or np.isinf(value)):
-            rec[key] = None
-        elif isinstance(value, (pd.Timestamp, datetime.datetime)):
-            rec[key] = value.strftime("%Y-%m-%d")
-    return rec
-
 # 📥 Vstupní soubory
 invoices_file = "invoices  28.3..xlsx"
 mapping_file = "InvoicesMapping.sdl"
 output_dir = DEFAULT_OUTPUT_DIR
 os.makedirs(output_dir, exist_ok=True)
 
-# 📑 Načti mapping a soubor
-mapping = load_sdl_mapping(mapping_file)
-df = pd.read_excel(invoices_file)
-print("🧾 Sloupce v Excelu:")
-for col in df.columns:
-    print(f"- '{col}'")
-original_columns = df.columns.tolist()
-normalized_columns = [normalize_column_name(col) for col in original_columns]
-rename_dict = {orig: mapping.get(norm, orig) for orig, norm in zip(original_columns, normalized_columns)}
-df.rename(columns=rename_dict, inplace=True)
-
-# 🔄 Párování Accountů podle zdroje (Source)
-accounts_df = pd.read_csv("accounts_imported_out.csv")
-accounts_df["Helios_ID__c"] = pd.to_numeric(accounts_df["Helios_ID__c"], errors="coerce")
-accounts_df["PartnerWeb_ORG_ID__c"] = pd.to_numeric(accounts_df["PartnerWeb_ORG_ID__c"], errors="coerce")
-df["Org_Id__c"] = pd.to_numeric(df["Org_Id__c"], errors="coerce")
-
-merged = []
-if "Source_Name__c" in df.columns:
-    helios_df = df[df["Source_Name__c"].str.lower() == "helios"].copy()
-    partnerweb_df = df[df["Source_Name__c"].str.lower() == "partnerweb"].copy()
-
-    helios_df = helios_df.merge(accounts_df[["Id", "Helios_ID__c"]], left_on="Org_Id__c", right_on="Helios_ID__c", how="left")
-    partnerweb_df = partnerweb_df.merge(accounts_df[["Id", "PartnerWeb_ORG_ID__c"]], left_on="Org_Id__c", right_on="PartnerWeb_ORG_ID__c", how="left")
-
-    merged = pd.concat([helios_df, partnerweb_df], ignore_index=True)
-else:
-    merged = df.copy()
-    merged["Id"] = None
-
-# nastavení fallback AccountId
-merged["Billing_Account__c"] = merged["Id"]
-df = merged.drop(columns=["Id", "Helios_ID__c", "PartnerWeb_ORG_ID__c"], errors="ignore")
-
-# 🧪 Prázdné Helios_invoice__c → True
-if "Helios_invoice__c" in df.columns:
-    df["Helios_invoice__c"] = df["Helios_invoice__c"].astype(str).str.strip() == "1.0"
-# 🧾 Formátování částek a číselných polí
-numeric_fields = [
-    "HM_Celkem_bez_z_lohy__c",
-    "Total_Amount__c",
-    "Max_no_of_Terminals_in_Month__c"
+# 🔁 Výchozí transformace (SDL je může přepsat řádky "#@"):
+#    statusy z čísel na API hodnoty picklistu, částky s desetinnou čárkou, Helios_invoice__c z 1/0
+TRANSFORMS = [
+    "Org_Id__c = number",
+    "Helios_invoice__c = bool 1",
+    "Status__c = map 0:STATE_FOR_REVIEW 1:STATE_APPROVED 2:STATE_PAID 3:STATE_FAILED",
+    "HM_Celkem_bez_z_lohy__c = number decimal-comma",
+    "Total_Amount__c = number decimal-comma",
+    "Max_no_of_Terminals_in_Month__c = number decimal-comma",
 ]
-for col in numeric_fields:
-    if col in df.columns:
-        df[col] = (
-            df[col].astype(str)
-            .str.replace(",", ".", regex=False)
-            .str.replace(" ", "", regex=False)
-        )
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-# 🔁 Přemapování statusů ze čísel na API hodnoty picklistu
-status_map = {
-    0: "STATE_FOR_REVIEW",
-    1: "STATE_APPROVED",
-    2: "STATE_PAID",
-    3: "STATE_FAILED"
-}
-if "Status__c" in df.columns:
-    df["Status__c"] = df["Status__c"].map(status_map)
-
-# 🆔 Generuj Import_ID__c
-if "Name" in df.columns:
-    df["Import_ID__c"] = df["Name"].astype(str).str.strip()
-else:
-    df = df.reset_index(drop=True)
-    df["Import_ID__c"] = df.index.map(lambda i: f"INV{str(i + 1).zfill(4)}")
-
-df = df.drop_duplicates(subset=["Import_ID__c"])
-
-# 🗓️ Převod datetime
-for col in df.select_dtypes(include=["datetime64[ns]"]).columns:
-    df[col] = df[col].dt.strftime("%Y-%m-%d")
-
-# 🧽 Náhrada NaN a sanitizace
-df = df.replace([np.nan, float("inf"), float("-inf"), "nan", "NaN"], None)
-
-records = df.to_dict(orient="records")
-records = [sanitize_record_values(r) for r in records]
-
-# 💾 Debug JSON
-with open(f"{output_dir}/invoices_debug.json", "w", encoding="utf-8") as f:
-    json.dump(records, f, indent=2, ensure_ascii=False)
-print("💾 Debug uložen do invoices_debug.json")
-
-# 📤 Upsert do Salesforce
-print("📤 Nahrávám faktury do Salesforce...")
-responses = []
-chunks = list(chunked(records, 10000))
-for i, chunk in enumerate(chunks):
-    print(f"📦 Nahrávám batch {i+1}/{len(chunks)}...")
-    resp = sf.bulk.__getattr__(OBJECT_API_NAME).upsert(chunk, external_id_field='Import_ID__c')
-    responses.extend(resp)
-response = responses
-
-# 📊 Výsledky
-success_count = sum(1 for r in response if r.get("success"))
-failures = [r for r in response if not r.get("success")]
-print(f"✅ Úspěšně nahráno: {success_count}")
-print(f"❌ Selhalo: {len(failures)}")
-
-# 🧾 Zápis chyb
-error_rows = []
-for i, fail in enumerate(failures):
-    original_record = df.iloc[i].copy()
-    error_info = fail.get("errors", [{}])[0]
-    original_record["Chyba_kód"] = error_info.get("statusCode")
-    original_record["Chyba_zpráva"] = error_info.get("message")
-    error_rows.append(original_record)
-
-if error_rows:
-    pd.DataFrame(error_rows).to_csv(f"{output_dir}/invoices_import_errors.csv", index=False)
+
+# 📑 Zkompilovaný plán mappingu a transformací
+plan = load_plan(mapping_file, TRANSFORMS)
+
+# 🗂️ Index accountů pro párování podle zdroje (Source)
+account_index = open_account_index(sf)
+
+# 🧹 Přejmenování, párování s accounty a příprava záznamů pro jeden chunk faktur
+#    row_offset = počet řádků z předchozích chunků, seen_ids = Import_ID__c z předchozích chunků
+def prepare_invoices(df, row_offset, seen_ids, verbose=False):
+    if verbose:
+        print("🧾 Sloupce v Excelu:")
+        for col in df.columns:
+            print(f"- '{col}'")
+    df = plan.apply(df)
+
+    if "Source_Name__c" in df.columns:
+        # Nejdřív Helios, pak PartnerWeb – pořadí určuje číslování Import_ID__c
+        sources = df["Source_Name__c"].str.lower()
+        merged = pd.concat([df[sources == "helios"], df[sources == "partnerweb"]])
+        merged["Billing_Account__c"] = account_index.lookup_by_source(sources[merged.index], merged["Org_Id__c"])
+        merged = merged.reset_index(drop=True)
+    else:
+        merged = df.copy()
+        merged["Billing_Account__c"] = None
+
+    df = merged
+
+    # 🆔 Generuj Import_ID__c (číslování pokračuje přes chunky)
+    df.index = pd.RangeIndex(row_offset, row_offset + len(df))
+    if "Name" in df.columns:
+        df["Import_ID__c"] = df["Name"].astype(str).str.strip()
+    else:
+        df["Import_ID__c"] = df.index.map(lambda i: f"INV{str(i + 1).zfill(4)}")
+
+    df = df.drop_duplicates(subset=["Import_ID__c"])
+    df = df[~df["Import_ID__c"].isin(seen_ids)]
+    seen_ids.update(df["Import_ID__c"])
+
+    # 🧽 Náhrada NaN a sanitizace (data → YYYY-MM-DD)
+    df = sanitize_frame(df)
+    records = frame_records(df)
+    return df, records, len(merged)
+
+row_offset = 0
+seen_ids = set()
+
+# 🧾 Výsledky se zapisují průběžně vedle původních řádků (chyby zvlášť)
+result_writer = ResultWriter(f"{output_dir}/invoices_import_results.csv", f"{output_dir}/invoices_import_errors.csv")
+
+# 🐞 Debug výpis (DEBUG_DUMP) se zapisuje na pozadí po chuncích
+debug_writer = open_debug_writer(f"{output_dir}/invoices_debug")
+
+# 🔁 Posílají se jen nové a změněné záznamy
+delta = DeltaState(sf, OBJECT_API_NAME)
+
+# 🛫 Kontrola proti metadatům objektu (picklist Status__c, délky textů, neznámá pole)
+preflight = Preflight(sf, OBJECT_API_NAME)
+
+# ⏩ Hotové batche přerušeného běhu se s --resume neodesílají znovu
+checkpoint = Checkpoint(sf, OBJECT_API_NAME)
+
+# 📏 Velikost batchí se přizpůsobuje objemu dat a době zpracování napříč chunky
+batcher = AdaptiveBatcher(OBJECT_API_NAME, max_records=BATCH_SIZE)
+
+# 🔎 Ověření nahraných faktur proti org po běhu (VERIFY_LOAD)
+verifier = LoadVerifier(sf, OBJECT_API_NAME, f"{output_dir}/invoices_verify.csv")
+
+for chunk_number, chunk in enumerate(timed_iter("excel_read", read_excel_chunks(invoices_file))):
+    with stage("transform", len(chunk)):
+        df, records, merged_count = prepare_invoices(chunk, row_offset, seen_ids, verbose=chunk_number == 0)
+    row_offset += merged_count
+    debug_writer.write(records)
+
+    # 📦 Průběžný výstup se záznamy (hlavička jen u prvního chunku)
+    first = chunk_number == 0
+    df.to_csv(f"{output_dir}/invoices_mapped.csv", index=False, mode="w" if first else "a", header=first)
+
+    df, records, rejected, rejected_response = preflight.validate(df, records)
+    if len(rejected):
+        result_writer.write(rejected, rejected_response)
+
+    changed = delta.changed_mask(records)
+    verifier.expect([rec for rec, c in zip(records, changed) if not c])
+    records = [rec for rec, c in zip(records, changed) if c]
+    df = df[changed]
+
+    # 📤 Upsert do Salesforce
+    print(f"📤 Nahrávám faktury do Salesforce (chunk {chunk_number + 1}, {len(records)} záznamů)...")
+    if not records:
+        continue
+    progress = checkpoint.start(records, df.index)
+    pending = progress.pending(records)
+    sent = []
+    if pending:
+        with stage("upload", len(pending)):
+            if use_collections(OBJECT_API_NAME, len(pending)):
+                sent = collections_load(sf, OBJECT_API_NAME, pending, external_id_field="Import_ID__c",
+                                        checkpoint=progress)
+            elif BULK2_ENABLED:
+                sent = bulk2_load(sf, OBJECT_API_NAME, df.iloc[progress.todo][list(records[0])],
+                                  external_id_field="Import_ID__c", checkpoint=progress)
+            elif MAX_PARALLEL_BATCHES > 1:
+                sent = bulk_load_by_parent(sf, OBJECT_API_NAME, pending, parent_field="Billing_Account__c",
+                                           external_id_field="Import_ID__c", max_parallel=MAX_PARALLEL_BATCHES,
+                                           batcher=batcher, checkpoint=progress)
+            else:
+                sent = bulk_upsert(sf, OBJECT_API_NAME, pending, external_id_field="Import_ID__c",
+                                   batcher=batcher, checkpoint=progress)
+    response = progress.merge(sent)
+    delta.mark_uploaded(records, response)
+    verifier.expect(records, response)
+
+    # 📊 Výsledky – spárování s původními řádky podle pozice
+    result_writer.write(df, response)
+
+debug_writer.close()
+delta.save()
+checkpoint.finish()
+print(f"✅ Úspěšně nahráno: {result_writer.success_count}")
+print(f"❌ Selhalo: {result_writer.failure_count}")
+print(f"⏭️ Beze změny (neodesláno): {delta.unchanged_count}")
+
+if result_writer.failure_count:
     print("🛑 Chyby uloženy do invoices_import_errors.csv")
 
-# 📦 Výstupní soubor se záznamy
-df.to_csv(f"{output_dir}/invoices_mapped.csv", index=False)
 print("✅ Hotovo! Vše uložené do složky output/")
+
+# 🔎 Hodnoty v org proti odeslaným – chybějící, navíc a rozdílné záznamy (jen s VERIFY_LOAD=1)
+verifier.finish()
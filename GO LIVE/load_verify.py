@@ -0,0 +1,171 @@
+import os
+import numpy as np
+import pandas as pd
+from bulk_export import bulk_query_frames
+from describe_cache import describe_fields
+from metrics import stage
+
+# 🔎 Ověření po nahrání (VERIFY_LOAD=1) – co v org skutečně je vs. co loader odeslal (po sanitizaci)
+#    Záznamy se stáhnou jedním Bulk query podle Import_ID__c a porovnávají se po stránkách: nejdřív hash
+#    celého řádku, rozdíly po polích jen u řádků s jiným hashem → i statisíce faktur v řádu minut
+#    MISSING = v org chybí, EXTRA = Import_ID__c v org, který běh nečekal, DRIFT = jiná hodnota pole
+#    Hodnoty se porovnávají v kanonickém tvaru podle typu pole z describe (boolean, čísla zaokrouhlená na scale,
+#    data i z epoch ms Bulk API, Id na 15 znaků) – bez metadat jen jako text
+VERIFY_ENABLED = os.getenv("VERIFY_LOAD", "0") == "1"
+REPORT_COLUMNS = ["Klíč", "Stav", "Pole", "Očekáváno", "V_org"]
+TRUE_VALUES = ["true", "1", "1.0"]
+NUMBER_TYPES = {"double", "currency", "percent", "int", "long"}
+ID_TYPES = {"id", "reference"}
+
+
+class LoadVerifier:
+    def __init__(self, sf, object_name, report_path, key_field="Import_ID__c"):
+        self.sf = sf
+        self.object_name = object_name
+        self.report_path = report_path
+        # key_field="Id" = objekt bez external Id (insert) → klíč z odpovědi, bez hledání záznamů navíc
+        self.key_field = key_field
+        self.enabled = VERIFY_ENABLED
+        self.fields = None
+        self.parts = []
+        self.failed = set()
+        self.report_written = False
+        if self.enabled and os.path.exists(report_path):
+            os.remove(report_path)
+
+    # ➕ Záznamy, které má org po běhu obsahovat – response = výsledky uploadu (bez něj = beze změny z dřívějška)
+    #    Neúspěšné záznamy se neověřují a v org se nehlásí jako navíc (chybu už má výsledkový CSV)
+    def expect(self, records, response=None):
+        if not self.enabled or not records:
+            return
+        frame = pd.DataFrame.from_records(records)
+        frame = frame[[col for col in frame.columns if "." not in col and col != "Id"]]
+        if response is not None:
+            success = np.array([bool(r.get("success")) for r in response])
+            if self.key_field == "Id":
+                frame["Id"] = [r.get("id") for r in response]
+            self.failed.update(frame.loc[~success, self.key_field].dropna().astype(str))
+            frame = frame[success]
+        frame = frame.set_index(frame[self.key_field].astype(str)).drop(columns=self.key_field)
+        meta = self.metadata()
+        frame = frame.rename(columns=lambda col: meta.get(col.lower(), {}).get("name") or col)
+        self.parts.append(canonical_frame(frame, meta))
+
+    def metadata(self):
+        if self.fields is None:
+            try:
+                self.fields = {name.lower(): meta for name, meta in describe_fields(self.sf, self.object_name).items()}
+            except Exception as e:
+                print(f"⚠️ Ověření {self.object_name} bez metadat (porovnání jako text) – describe selhal: {e}")
+                self.fields = {}
+        return self.fields
+
+    # 🔍 Stažení záznamů z org a porovnání; vrací počty (expected, matched, missing, extra, drifted)
+    def finish(self):
+        if not self.enabled:
+            return None
+        expected = pd.concat(self.parts) if self.parts else pd.DataFrame()
+        expected = expected[~expected.index.duplicated(keep="last")].fillna("")
+        fields = list(expected.columns)
+        expected_hashes = row_hashes(expected)
+        seen = np.zeros(len(expected), dtype=bool)
+        counts = {"expected": len(expected), "matched": 0, "missing": 0, "extra": 0, "drifted": 0}
+        where = f"{self.key_field} != NULL" if self.key_field != "Id" else None
+        print(f"🔎 Ověřuji {self.object_name} v org: {len(expected)} záznamů, {len(fields)} polí")
+
+        with stage("verify", len(expected)):
+            for page in bulk_query_frames(self.sf, self.object_name, [self.key_field, *fields], where):
+                page = page.set_index(page[self.key_field].astype(str)).drop(columns=self.key_field)
+                actual = canonical_frame(page, self.metadata())
+                positions = expected.index.get_indexer(actual.index)
+                known = positions >= 0
+
+                if self.key_field != "Id":
+                    extra = actual.index[~known]
+                    extra = extra[~extra.isin(self.failed)]
+                    counts["extra"] += len(extra)
+                    self.write_report(pd.DataFrame({"Klíč": extra, "Stav": "EXTRA"}))
+
+                positions, actual = positions[known], actual[known]
+                seen[positions] = True
+                changed = expected_hashes[positions] != row_hashes(actual)
+                counts["matched"] += int((~changed).sum())
+                counts["drifted"] += int(changed.sum())
+                if changed.any():
+                    self.write_report(field_diffs(expected.iloc[positions[changed]], actual[changed]))
+
+        missing = expected.index[~seen]
+        counts["missing"] = len(missing)
+        self.write_report(pd.DataFrame({"Klíč": missing, "Stav": "MISSING"}))
+
+        ok = not (counts["missing"] or counts["extra"] or counts["drifted"])
+        print(f"{'✅' if ok else '⚠️'} Ověření {self.object_name}: {counts['matched']} shodných, "
+              f"{counts['missing']} chybí, {counts['extra']} navíc, {counts['drifted']} s rozdílem"
+              + ("" if ok else f" → {self.report_path}"))
+        return counts
+
+    def write_report(self, frame):
+        if frame.empty:
+            return
+        frame.reindex(columns=REPORT_COLUMNS).to_csv(self.report_path, index=False, encoding="utf-8-sig",
+                                                     mode="a" if self.report_written else "w",
+                                                     header=not self.report_written)
+        self.report_written = True
+
+
+# 🧮 Hash řádku přes všechny sloupce (pořadí sloupců musí být na obou stranách stejné)
+def row_hashes(frame):
+    if frame.empty:
+        return np.zeros(len(frame), dtype=np.uint64)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+# ↔️ Rozdíly po polích u řádků s jiným hashem – (klíč, pole, očekáváno, v org)
+def field_diffs(expected, actual):
+    parts = []
+    for col in expected.columns:
+        differs = expected[col].to_numpy() != actual[col].to_numpy()
+        if differs.any():
+            parts.append(pd.DataFrame({"Klíč": expected.index[differs], "Stav": "DRIFT", "Pole": col,
+                                       "Očekáváno": expected[col].to_numpy()[differs],
+                                       "V_org": actual[col].to_numpy()[differs]}))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=REPORT_COLUMNS)
+
+
+def canonical_frame(frame, fields):
+    return pd.DataFrame({col: canonical_column(s, fields.get(col.lower()) or {}) for col, s in frame.items()},
+                        index=frame.index)
+
+
+# 🔤 Kanonický text hodnoty podle typu pole – chybějící hodnota = "" (Bulk API vrací null i pro prázdný text)
+def canonical_column(series, meta):
+    kind = meta.get("type")
+    values = series.astype(object).where(series.notna(), None)
+    text = values.where(values.notna(), "").astype(str).str.strip()
+    if kind == "boolean":
+        return text.str.lower().isin(TRUE_VALUES).map({True: "true", False: "false"}).astype(str)
+    if kind in NUMBER_TYPES or kind is None:
+        # Bez metadat: True/False jako boolean, čísla bez rozdílu 1 / 1.0 / "1", ostatní text beze změny
+        flags = values.map(lambda v: isinstance(v, (bool, np.bool_)))
+        numbers = pd.to_numeric(values.where(~flags), errors="coerce")
+        if meta.get("scale") is not None:
+            numbers = numbers.round(int(meta["scale"]))
+        text = numbers.map(lambda x: f"{x:.15g}", na_action="ignore").where(numbers.notna(), text)
+        return text.where(~flags, values.map(str).str.lower()).astype(str)
+    if kind == "date":
+        return temporal_text(values, text, "%Y-%m-%d")
+    if kind == "datetime":
+        return temporal_text(values, text, "%Y-%m-%dT%H:%M:%S")
+    if kind in ID_TYPES:
+        return text.str[:15]
+    return text
+
+
+# 📅 Data/časy jako text – Bulk API (JSON) vrací epoch ms, loadery posílají ISO text
+def temporal_text(values, text, fmt):
+    millis = pd.to_numeric(values.where(values.map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))),
+                           errors="coerce")
+    parsed = pd.to_datetime(millis, unit="ms", utc=True)
+    parsed = parsed.where(millis.notna(), pd.to_datetime(text.where(text != ""), utc=True, errors="coerce",
+                                                         format="ISO8601"))
+    return parsed.dt.strftime(fmt).where(parsed.notna(), text).astype(str)
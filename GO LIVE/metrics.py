@@ -0,0 +1,230 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ⏱️ Měření fází importu – čas, řádky/s, špička RSS a volání API; po skončení běhu JSON do logs/metrics/
+#    METRICS=0 vypne zápis, PROFILE_STAGE=<fáze> zapne cProfile, TRACEMALLOC_STAGE=<fáze> tracemalloc
+#    Fáze se vnořují (upload/bulk_poll) – čas nadřazené fáze zahrnuje i vnořené
+#    Import modulu nic nezapíná – měření API a zápis metrik spouští vstupní skript voláním start_run()
+METRICS_ENABLED = os.getenv("METRICS", "1") != "0"
+METRICS_DIR = os.path.join("logs", "metrics")
+PROFILE_STAGE = os.getenv("PROFILE_STAGE")
+TRACEMALLOC_STAGE = os.getenv("TRACEMALLOC_STAGE")
+PROFILE_TOP = 25
+TRACEMALLOC_TOP = 10
+# Nastavení, která ovlivňují výkon → ukládají se k metrikám pro porovnání běhů
+METRICS_ENV = ["SF_BULK_API", "SF_MAX_PARALLEL_BATCHES", "EXCEL_CHUNK_SIZE", "PRODUCT_BATCH_SIZE", "FULL_UPLOAD",
+               "PREFLIGHT", "DEBUG_DUMP", "FAKE_SF_URL", "LOW_MEMORY", "SF_TRANSPORT",
+               "SF_COLLECTIONS_MAX_RECORDS", "SF_COLLECTIONS_PARALLEL", "SF_SESSION_CACHE", "SF_HTTP_POOL_SIZE",
+               "VERIFY_LOAD"]
+# Id záznamů/jobů a verze API v URL → jeden klíč pro stejný typ volání
+URL_ID_PATTERN = re.compile(r"/(?=[a-zA-Z0-9]*\d)[a-zA-Z0-9]{15,18}(?=/|$)")
+URL_VERSION_PATTERN = re.compile(r"/v?\d+\.\d+(?=/|$)")
+
+
+class RunMetrics:
+    def __init__(self):
+        self.script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+        self.started = time.time()
+        self.stages = {}
+        self.api = {}
+        self.memory = {}
+        self.stack = []
+        self.lock = threading.Lock()
+        self.profiler = None
+        self.profiling = False
+        self.running = False
+
+    # 🌐 Volání API se připíše aktuální fázi (i z worker vláken – hlavní vlákno na ně čeká ve fázi)
+    def record_api_call(self, method, url, seconds):
+        path = URL_VERSION_PATTERN.sub("/{v}", URL_ID_PATTERN.sub("/{id}", url.split("?")[0].split("//", 1)[-1]))
+        endpoint = f"{method.upper()} {path[path.find('/'):]}"
+        with self.lock:
+            targets = [self.api] + ([self.stages[self.stack[-1]]["api"]] if self.stack else [])
+            for target in targets:
+                call = target.setdefault(endpoint, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+                call["count"] += 1
+                call["seconds"] += seconds
+                call["max_seconds"] = max(call["max_seconds"], seconds)
+
+    def summary(self):
+        total = time.time() - self.started
+        stages = {}
+        for name, stats in self.stages.items():
+            stages[name] = {**stats, "rows_per_second": round(stats["rows"] / stats["seconds"], 1)
+                            if stats["rows"] and stats["seconds"] else None}
+            stages[name]["api_calls"] = sum(c["count"] for c in stats["api"].values())
+            stages[name]["api_seconds"] = round(sum(c["seconds"] for c in stats["api"].values()), 3)
+        return {"script": self.script, "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "seconds": round(total, 3), "peak_rss_mb": peak_rss_mb(),
+                "api_calls": sum(c["count"] for c in self.api.values()),
+                "api_seconds": round(sum(c["seconds"] for c in self.api.values()), 3),
+                "env": {key: os.getenv(key) for key in METRICS_ENV if os.getenv(key) is not None},
+                "stages": stages, "api": self.api, "frame_memory": self.memory}
+
+    # 💾 Zápis metrik běhu + krátký přehled fází na konec výstupu
+    def save(self):
+        if self.profiler is not None:
+            save_profile(self.profiler)
+        summary = self.summary()
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f"{self.script}__{datetime.fromtimestamp(self.started):%Y%m%d-%H%M%S}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+        print(f"\n⏱️ Metriky běhu ({summary['seconds']:.1f} s, {summary['api_calls']} volání API, "
+              f"špička RSS {summary['peak_rss_mb']} MB) uloženy do {path}")
+        for name, stats in summary["stages"].items():
+            rate = f", {stats['rows_per_second']:.0f} řádků/s" if stats["rows_per_second"] else ""
+            print(f"   {name}: {stats['seconds']:.2f} s{rate}, API {stats['api_calls']}× / {stats['api_seconds']:.2f} s")
+        for name, memory in self.memory.items():
+            print(f"   🗜️ {name}: DataFrame {memory['before_mb']} → {memory['after_mb']} MB "
+                  f"(ušetřeno {memory['saved_mb']} MB)")
+
+
+run_metrics = RunMetrics()
+
+
+# 🧠 Nejvyšší RSS procesu v MB (Linux vrací kB, macOS bajty)
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# ⏱️ Fáze běhu; rows lze doplnit až uvnitř bloku (with stage("excel_read") as s: ... s["rows"] = n)
+#    Fáze se otevírají jen z hlavního vlákna, opakované vstupy (chunky) se sčítají
+@contextmanager
+def stage(name, rows=None):
+    path = "/".join(run_metrics.stack[-1:] + [name])
+    with run_metrics.lock:
+        stats = run_metrics.stages.setdefault(path, {"calls": 0, "seconds": 0.0, "rows": 0, "peak_rss_mb": None,
+                                                     "rss_growth_mb": 0.0, "api": {}})
+        run_metrics.stack.append(path)
+    current = {"rows": rows}
+    # cProfile/tracemalloc jen pro jednu vybranou fázi – ostatní fáze měří bez zpomalení
+    profiled = PROFILE_STAGE in (name, path) and not run_metrics.profiling
+    traced = TRACEMALLOC_STAGE in (name, path) and not tracemalloc.is_tracing()
+    if profiled:
+        run_metrics.profiler = run_metrics.profiler or cProfile.Profile()
+        run_metrics.profiling = True
+        run_metrics.profiler.enable()
+    if traced:
+        tracemalloc.start()
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        elapsed = time.perf_counter() - started
+        if profiled:
+            run_metrics.profiler.disable()
+            run_metrics.profiling = False
+        if traced:
+            save_tracemalloc(stats)
+        rss_after = peak_rss_mb()
+        with run_metrics.lock:
+            run_metrics.stack.pop()
+            stats["calls"] += 1
+            stats["seconds"] = round(stats["seconds"] + elapsed, 4)
+            stats["rows"] += current["rows"] or 0
+            stats["peak_rss_mb"] = rss_after
+            if rss_after is not None:
+                stats["rss_growth_mb"] = round(stats["rss_growth_mb"] + rss_after - rss_before, 1)
+
+
+# 🗜️ Paměť DataFrame před a po převodu na kompaktní typy (LOW_MEMORY) – sčítá se přes chunky fáze
+def record_memory(name, before_bytes, after_bytes):
+    with run_metrics.lock:
+        memory = run_metrics.memory.setdefault(name, {"calls": 0, "before_mb": 0.0, "after_mb": 0.0, "saved_mb": 0.0})
+        memory["calls"] += 1
+        memory["before_mb"] = round(memory["before_mb"] + before_bytes / 1048576, 2)
+        memory["after_mb"] = round(memory["after_mb"] + after_bytes / 1048576, 2)
+        memory["saved_mb"] = round(memory["before_mb"] - memory["after_mb"], 2)
+
+
+# 🎯 Dekorátor – celé volání funkce jako fáze; počet řádků = len(argumentu rows_arg) (None = bez řádků)
+def timed(name, rows_arg=0):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows = len(args[rows_arg]) if rows_arg is not None and len(args) > rows_arg \
+                and hasattr(args[rows_arg], "__len__") else None
+            with stage(name, rows):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 📥 Měření generátoru (streamované čtení Excelu) – čas jen uvnitř next(), řádky = len(chunku)
+def timed_iter(name, iterable):
+    iterator = iter(iterable)
+    while True:
+        with stage(name) as current:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            current["rows"] = len(item)
+        yield item
+
+
+def save_profile(profiler):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    out = os.path.join(METRICS_DIR, f"{run_metrics.script}__{PROFILE_STAGE.replace('/', '_')}.prof")
+    profiler.dump_stats(out)
+    print(f"\n🔬 cProfile fáze {PROFILE_STAGE} uložen do {out} (nejdražší funkce):")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(PROFILE_TOP)
+
+
+# 📸 Špička alokací fáze + místa s největšími alokacemi (z nejnáročnějšího vstupu do fáze)
+def save_tracemalloc(stats):
+    peak_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    if peak_mb < stats.get("tracemalloc_peak_mb", 0):
+        return
+    stats["tracemalloc_peak_mb"] = peak_mb
+    stats["tracemalloc_top"] = [str(s) for s in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]]
+
+
+# 🌐 Počty a latence volání API – všechna volání simple_salesforce jdou přes requests.Session.request
+def instrument_requests():
+    import requests
+
+    original_request = requests.Session.request
+
+    def request(session, method, url, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original_request(session, method, url, *args, **kwargs)
+        finally:
+            run_metrics.record_api_call(method, url, time.perf_counter() - started)
+
+    requests.Session.request = request
+
+
+# ▶️ Start měření běhu ze vstupního skriptu: počítání volání API + zápis metrik při ukončení procesu
+#    METRICS=0 → nic; opakované volání (skript spuštěný z jiného skriptu) se ignoruje
+def start_run():
+    if not METRICS_ENABLED or run_metrics.running:
+        return
+    run_metrics.running = True
+    run_metrics.started = time.time()
+    instrument_requests()
+    atexit.register(run_metrics.save)
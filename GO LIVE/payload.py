@@ -0,0 +1,73 @@
+import datetime
+import numpy as np
+import pandas as pd
+from metrics import timed
+from compact_dtypes import LOW_MEMORY, compact_frame
+
+# 🧼 Sdílená sanitizace dat pro Salesforce – po sloupcích místo hodnoty po hodnotě
+DATE_FORMAT = "%Y-%m-%d"
+NULL_VALUES = ["nan", "NaN", np.inf, -np.inf]
+# Object sloupce s těmito typy hodnot nemohou obsahovat datum → přeskočí se kontrola po hodnotách
+NO_DATE_TYPES = {"string", "empty", "integer", "floating", "mixed-integer-float", "decimal", "boolean"}
+# Bulk API CSV: prázdná hodnota = pole neměnit, #N/A = vymazat (stejně jako null v JSON)
+CSV_NULL = "#N/A"
+
+
+# 🧽 NaN/inf/"nan" → None, datum → YYYY-MM-DD, numpy typy → Python hodnoty
+#    S LOW_MEMORY=1 se vyčištěné textové sloupce znovu zhustí (category / Arrow string)
+@timed("sanitize")
+def sanitize_frame(df):
+    return compact_frame(pd.DataFrame({col: sanitize_column(s) for col, s in df.items()}, index=df.index), "sanitize")
+
+
+def sanitize_column(s):
+    # 🗜️ Kompaktní typy (LOW_MEMORY) zůstávají – prázdné hodnoty převede na None až frame_records
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        null = [c for c in s.cat.categories if c in NULL_VALUES]
+        return s.cat.remove_categories(null) if null else s
+    if LOW_MEMORY and isinstance(s.dtype, pd.StringDtype):
+        null = s.isin(NULL_VALUES[:2])
+        return s.where(~null) if null.any() else s
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_integer_dtype(s):
+        return s
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.strftime(DATE_FORMAT).astype(object).where(s.notna(), None)
+    if pd.api.types.is_float_dtype(s):
+        invalid = ~np.isfinite(s.to_numpy(dtype=float))
+        return s.astype(object).where(~invalid, None) if invalid.any() else s
+
+    values = s.astype(object)
+    null = values.isna() | values.isin(NULL_VALUES)
+    if null.any():
+        values = values.where(~null, None)
+    if pd.api.types.infer_dtype(values, skipna=True) not in NO_DATE_TYPES:
+        is_date = values.map(lambda v: isinstance(v, (datetime.date, pd.Timestamp)))
+        if is_date.any():
+            values = values.where(~is_date, values[is_date].map(lambda v: v.strftime(DATE_FORMAT)))
+    return values
+
+
+# 📤 Záznamy pro Bulk API (list dictů) sestavené po sloupcích z vyčištěného DataFrame
+@timed("serialize")
+def frame_records(df):
+    columns = list(df.columns)
+    values = [column_values(s) for _, s in df.items()]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+# Hodnoty sloupce jako Python objekty – chybějící hodnoty kompaktních typů (NaN/<NA>) → None
+def column_values(s):
+    if s.dtype != object and s.hasnans:
+        return s.astype(object).where(s.notna(), None).tolist()
+    return s.tolist()
+
+
+# 📦 CSV payload jobu Bulk API 2.0 přímo z vyčištěného DataFrame (bez mezikroku přes dicty)
+#    Bulk API v1 a sObject Collections posílají JSON ze záznamů frame_records (batche se dělí po záznamech)
+@timed("serialize")
+def frame_payload(df):
+    # Bulk API CSV očekává true/false
+    bools = [col for col, s in df.items() if pd.api.types.is_bool_dtype(s)]
+    if bools:
+        df = df.assign(**{col: df[col].map({True: "true", False: "false"}) for col in bools})
+    return df.to_csv(index=False, na_rep=CSV_NULL, lineterminator="\n").encode("utf-8")
@@ -0,0 +1,121 @@
+import os
+import pandas as pd
+from describe_cache import describe_fields
+from metrics import timed
+
+# 🛫 Kontrola dat proti metadatům objektu ještě před odesláním do Bulk API
+#    PREFLIGHT=0 kontrolu vypne
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT", "1") != "0"
+
+TEXT_TYPES = {"string", "textarea", "email", "phone", "url", "picklist", "multipicklist", "combobox", "encryptedstring"}
+NUMBER_TYPES = {"double", "currency", "percent", "int", "long"}
+BOOLEAN_VALUES = ["true", "false", "1", "0"]
+ID_PATTERN = r"^[a-zA-Z0-9]{15}(?:[a-zA-Z0-9]{3})?$"
+
+
+class Preflight:
+    def __init__(self, sf, object_name, operation="upsert"):
+        self.object_name = object_name
+        self.operation = operation
+        self.fields = {}
+        self.enabled = PREFLIGHT_ENABLED
+        if self.enabled:
+            try:
+                # Názvy polí jsou v Salesforce case-insensitive
+                self.fields = {name.lower(): meta for name, meta in describe_fields(sf, object_name).items()}
+            except Exception as e:
+                print(f"⚠️ Pre-flight {object_name} vypnut – describe selhal: {e}")
+                self.enabled = False
+        self.reported = set()
+        self.rejected_count = 0
+
+    # 🔍 Vrací (df, records) k odeslání + (df, response) odmítnutých řádků ve formátu výsledků Bulk API
+    #    records[i] odpovídá df.iloc[i]; df musí obsahovat všechna pole záznamů
+    @timed("preflight", rows_arg=1)
+    def validate(self, df, records):
+        if not self.enabled or not records:
+            return df, records, df.iloc[:0], []
+
+        dropped = [col for col in records[0] if "." not in col and not self.writable(col)]
+        if dropped:
+            # Nové dicty – původní záznamy mohou být ještě ve frontě debug výpisu
+            records = [{k: v for k, v in rec.items() if k not in dropped} for rec in records]
+        fields = [col for col in records[0] if "." not in col]
+
+        codes = pd.Series(None, index=df.index, dtype=object)
+        messages = pd.Series(None, index=df.index, dtype=object)
+        failed_fields = pd.Series(None, index=df.index, dtype=object)
+        for col in fields:
+            for mask, code, message in field_checks(df[col], self.fields[col.lower()], self.operation):
+                mask = mask & codes.isna()
+                codes[mask] = code
+                messages[mask] = f"Pre-flight: {col} – {message}"
+                failed_fields[mask] = col
+
+        invalid = codes.notna().to_numpy()
+        if not invalid.any():
+            return df, records, df.iloc[:0], []
+
+        self.rejected_count += int(invalid.sum())
+        print(f"🛫 Pre-flight {self.object_name}: {int(invalid.sum())} z {len(records)} řádků neodesláno (chybná data)")
+        rejected_response = [
+            {"success": False, "created": False, "id": None,
+             "errors": [{"statusCode": code, "message": message, "fields": [field]}]}
+            for code, message, field in zip(codes[invalid], messages[invalid], failed_fields[invalid])
+        ]
+        records = [rec for rec, bad in zip(records, invalid) if not bad]
+        return df[~invalid], records, df[invalid], rejected_response
+
+    # ✍️ Pole musí existovat a být zapisovatelné pro danou operaci – jinak se vynechá z payloadu
+    def writable(self, col):
+        meta = self.fields.get(col.lower())
+        if meta is None:
+            problem = "neexistuje"
+        elif self.operation in ("insert", "upsert") and not meta["createable"]:
+            problem = "nelze zapisovat při vytvoření"
+        elif self.operation in ("update", "upsert") and not meta["updateable"]:
+            problem = "nelze aktualizovat"
+        else:
+            return True
+        if col not in self.reported:
+            self.reported.add(col)
+            print(f"⚠️ Pole {self.object_name}.{col} {problem} – vynecháno z nahrávaných dat")
+        return False
+
+
+# 🧪 Kontroly jednoho sloupce → [(maska chybných řádků, statusCode, zpráva)]
+def field_checks(values, meta, operation):
+    # Text až před doplněním "" – kategorie (LOW_MEMORY) novou hodnotu doplnit nedovolí
+    text = values.astype(str).where(values.notna(), "")
+    present = text != ""
+    field_type = meta["type"]
+    checks = []
+
+    required = (field_type != "boolean" and not meta["nillable"] and not meta["defaultedOnCreate"]
+                and operation in ("insert", "upsert"))
+    if required:
+        checks.append((~present, "REQUIRED_FIELD_MISSING", "povinné pole není vyplněné"))
+
+    if field_type in TEXT_TYPES and meta["length"]:
+        checks.append((present & (text.str.len() > meta["length"]), "STRING_TOO_LONG",
+                       f"hodnota delší než {meta['length']} znaků"))
+
+    if field_type in ("picklist", "multipicklist") and meta["restrictedPicklist"]:
+        allowed = set(meta["picklistValues"])
+        if field_type == "multipicklist":
+            bad = text.str.split(";").map(lambda parts: not set(parts) <= allowed)
+        else:
+            bad = ~text.isin(allowed)
+        checks.append((present & bad, "INVALID_OR_NULL_FOR_RESTRICTED_PICKLIST", "hodnota není v picklistu"))
+
+    if field_type in NUMBER_TYPES:
+        checks.append((present & pd.to_numeric(values, errors="coerce").isna(), "INVALID_FIELD", "není číslo"))
+    elif field_type == "date":
+        parsed = pd.to_datetime(text.where(present), format="%Y-%m-%d", errors="coerce")
+        checks.append((present & parsed.isna(), "INVALID_FIELD", "datum není ve formátu YYYY-MM-DD"))
+    elif field_type == "boolean":
+        checks.append((present & ~text.str.lower().isin(BOOLEAN_VALUES), "INVALID_FIELD", "není boolean"))
+    elif field_type == "reference":
+        checks.append((present & ~text.str.match(ID_PATTERN), "MALFORMED_ID", "neplatné Salesforce Id"))
+
+    return checks
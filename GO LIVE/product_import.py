@@ -1,45 +1,45 @@
-import pandas as pd
-from simple_salesforce import Salesforce
+from sf_session import connect
 import os
-from dotenv import load_dotenv
 import sys
-
-# === Načtení .env souboru ===
-load_dotenv("credentials.env")
-
-username = os.getenv("SF_USERNAME")
-password = os.getenv("SF_PASSWORD")
-token = os.getenv("SF_TOKEN")
-domain = os.getenv("SF_DOMAIN", "login")  # "test" pro sandbox
-
-if not all([username, password, token]):
-    print("❌ Chybí přihlašovací údaje v souboru credentials.env.")
-    sys.exit(1)
+from bulk_upload import bulk_upsert, summarize_results
+from excel_cache import read_excel_cached
+from bulk2_upload import BULK2_ENABLED, bulk2_load
+from sobject_collections import use_collections, collections_load
+from payload import sanitize_frame, frame_records
+from preflight import Preflight
+from metrics import stage, start_run
+from checkpoint import Checkpoint
+from sdl_mapping import load_plan
+from compact_dtypes import compact_frame
+from load_verify import LoadVerifier
 
 # === CONFIG ===
 EXCEL_FILE = "produkty 28.3..xlsx"
 OUTPUT_FILE = "produkty_28.3_OUT.csv"
+ERRORS_FILE = "produkty_28.3_errors.csv"
 SHEET_NAME = "Sheet1"
 IMPORT_ID_FIELD = "Import_ID__c"
 SALESFORCE_OBJECT = "Product2"
 IMPORT_ID_PREFIX = "PROD-"
 MAPPING_FILE = "ProductMapping.sdl"
+BATCH_SIZE = int(os.getenv("PRODUCT_BATCH_SIZE", "2000"))
+
+# === Měření běhu (METRICS=0 vypne) ===
+start_run()
 
 # === Přihlášení do Salesforce ===
 try:
-    sf = Salesforce(
-        username=username,
-        password=password,
-        security_token=token,
-        domain=domain
-    )
+    with stage("login"):
+        sf = connect()
     print("✅ Přihlášení do Salesforce úspěšné.")
 except Exception as e:
     print(f"❌ Přihlášení selhalo: {e}")
     sys.exit(1)
 
 # === Načtení Excelu ===
-df = pd.read_excel(EXCEL_FILE, sheet_name=SHEET_NAME).fillna("")
+with stage("excel_read") as current:
+    df = compact_frame(read_excel_cached(EXCEL_FILE, sheet_name=SHEET_NAME).fillna(""), "excel_read")
+    current["rows"] = len(df)
 
 # === Odstranění sloupců s konfigurací ===
 for col in ["Product Configuration", "Product Configurations"]:
@@ -50,38 +50,15 @@ for col in ["Product Configuration", "Product Configurations"]:
 print("📋 Sloupce v původním Excelu:")
 print(df.columns)
 
-# === Načtení SDL mappingu ===
-def parse_sdl(path):
-    mapping = {}
-    with open(path, "r") as f:
-        for line in f:
-            if "=" in line:
-                src, target = line.strip().split("=")
-                mapping[src.strip()] = target.strip()
-    return mapping
-
-sdl_mapping = parse_sdl(MAPPING_FILE)
+# === Zkompilovaný plán SDL mappingu (přejmenování + boolean transformace) ===
+plan = load_plan(MAPPING_FILE)
 print("🗺️ Načtený mapping:")
-print(sdl_mapping)
+print(plan.describe())
 
-df = df.rename(columns=sdl_mapping)
+with stage("transform", len(df)):
+    df = plan.apply(df)
 
 if "IsActive" in df.columns:
-    df["IsActive"] = df["IsActive"].astype(str).str.strip().str.lower().map({
-        "true": True,
-        "1.0": True,
-        "yes": True,
-        "ano": True,
-        "x": True,
-        "false": False,
-        "0": False,
-        "no": False,
-        "ne": False,
-        "": False,
-        "0.0": False,
-        "nan": False
-    }).fillna(False)
-
     print("🔁 Sloupec IsActive byl přetypován na boolean:")
     print(df["IsActive"].value_counts(dropna=False))
 
@@ -89,52 +66,80 @@ if "IsActive" in df.columns:
 print("✅ Sloupce po mappingu:")
 print(df.columns)
 
-# === Automatický převod ostatních boolean-like polí ===
-def is_boolean_like(series):
-    unique_values = set(series.dropna().unique())
-    return unique_values.issubset({0, 1, 0.0, 1.0, "0", "1", True, False})
-
-for col in df.columns:
-    if col != "IsActive" and is_boolean_like(df[col]):
-        print(f"🔁 Přetypovávám {col} na boolean (auto)")
-        df[col] = df[col].apply(
-            lambda x: True if str(x).strip().lower() in ["1", "true", "yes", "ano", "x"]
-            else False
-        )
-
 # === Generování Import_ID__c ===
 def generate_import_id(index):
     return f"{IMPORT_ID_PREFIX}{str(index + 1).zfill(3)}"
 
-if IMPORT_ID_FIELD not in df.columns:
-    df[IMPORT_ID_FIELD] = ""
-
-for i, row in df.iterrows():
-    if not row[IMPORT_ID_FIELD]:
-        df.at[i, IMPORT_ID_FIELD] = generate_import_id(i)
-
-# === Nahrání do Salesforce (všechny záznamy) ===
-inserted_ids = []
-for _, row in df.iterrows():
-    data = row.to_dict()
-    data.pop("Product_Configuration__c", None)
-
-    print("📤 Odesílám záznam:")
-    print(data)
-
-    try:
-        result = sf.__getattr__(SALESFORCE_OBJECT).create(data)
-        inserted_ids.append(result["id"])
-    except Exception as e:
-        print(f"❌ Chyba při vkládání: {data.get('Name')} – {e}")
-        inserted_ids.append("")
+with stage("transform", len(df)):
+    if IMPORT_ID_FIELD not in df.columns:
+        df[IMPORT_ID_FIELD] = ""
+
+    df = df.reset_index(drop=True)
+    missing_ids = df[IMPORT_ID_FIELD].astype(str).str.strip() == ""
+    df.loc[missing_ids, IMPORT_ID_FIELD] = df.index[missing_ids].map(generate_import_id)
+
+# === Bulk upsert do Salesforce podle Import_ID__c ===
+# 🧽 Vyčištění (NaN/inf/"nan" → None, data → YYYY-MM-DD, numpy typy → Python hodnoty) a převod na záznamy
+upload_df = sanitize_frame(df.drop(columns=["Product_Configuration__c", "Salesforce_ID"], errors="ignore"))
+records = frame_records(upload_df)
+
+# === Pre-flight kontrola proti metadatům Product2 ===
+upload_df, records, rejected, rejected_response = Preflight(sf, SALESFORCE_OBJECT).validate(upload_df, records)
+
+print(f"📤 Nahrávám {len(records)} produktů (Bulk API batch max {BATCH_SIZE})...")
+# ⏩ Batche přerušeného běhu se s --resume neodesílají znovu
+checkpoint = Checkpoint(sf, SALESFORCE_OBJECT)
+progress = checkpoint.start(records, upload_df.index)
+pending = progress.pending(records)
+sent = []
+if pending:
+    with stage("upload", len(pending)):
+        if use_collections(SALESFORCE_OBJECT, len(pending)):
+            sent = collections_load(sf, SALESFORCE_OBJECT, pending, external_id_field=IMPORT_ID_FIELD,
+                                    checkpoint=progress)
+        elif BULK2_ENABLED:
+            sent = bulk2_load(sf, SALESFORCE_OBJECT, upload_df.iloc[progress.todo][list(records[0])],
+                              external_id_field=IMPORT_ID_FIELD, checkpoint=progress)
+        else:
+            sent = bulk_upsert(sf, SALESFORCE_OBJECT, pending, external_id_field=IMPORT_ID_FIELD,
+                               batch_size=BATCH_SIZE, checkpoint=progress)
+response = progress.merge(sent)
+
+success_count, created_count, failures = summarize_results(response)
+print(f"✅ Úspěšně nahráno: {success_count}")
+print(f"🆕 Z toho nově vytvořeno: {created_count}")
+print(f"❌ Selhalo: {len(failures) + len(rejected)}")
+
+for (_, row), res in zip(rejected.iterrows(), rejected_response):
+    print(f"❌ Neodesláno: {row.get('Name')} – {res.get('errors')}")
+for rec, res in zip(records, response):
+    if not res.get("success"):
+        print(f"❌ Chyba při vkládání: {rec.get('Name')} – {res.get('errors')}")
 
 # === Doplnění Salesforce ID a výstup ===
-df["Salesforce_ID"] = inserted_ids + [""] * (len(df) - len(inserted_ids))
+# Výsledky bulk operace jsou ve stejném pořadí jako odeslané záznamy
+df["Salesforce_ID"] = ""
+df.loc[upload_df.index, "Salesforce_ID"] = [r.get("id") if r.get("success") else "" for r in response]
 
 print("✅ Salesforce ID byla přidána:")
 print(df[["Name", "Salesforce_ID"]].head())
 
 # === Výstupní soubor do CSV ===
-df.to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
+with stage("export", len(df)):
+    df.to_csv(OUTPUT_FILE, index=False, encoding="utf-8-sig")
+
+# === Neodeslané a neúspěšné produkty zvlášť (jen když nějaké jsou – run_pipeline podle něj stage zopakuje) ===
+errors_df = df[df["Salesforce_ID"] == ""]
+if os.path.exists(ERRORS_FILE):
+    os.remove(ERRORS_FILE)
+if len(errors_df):
+    errors_df.to_csv(ERRORS_FILE, index=False, encoding="utf-8-sig")
+    print(f"❌ Chybné produkty uloženy do {ERRORS_FILE}")
+checkpoint.finish()
+
+# === Ověření hodnot v org proti odeslaným (VERIFY_LOAD=1) ===
+verifier = LoadVerifier(sf, SALESFORCE_OBJECT, "produkty_verify.csv", key_field=IMPORT_ID_FIELD)
+verifier.expect(records, response)
+verifier.finish()
+
 print(f"✅ Hotovo! Výstupní soubor: {OUTPUT_FILE}")
\ No newline at end of file
@@ -0,0 +1,65 @@
+import os
+import pandas as pd
+from metrics import timed
+
+RESULT_COLUMNS = ["Salesforce_ID", "Success", "Created", "Updated", "Chyba_kód", "Chyba_zpráva"]
+
+
+# 🧾 Průběžný zápis výsledků bulk operace vedle původních dat
+#    Výsledky Bulk API jsou ve stejném pořadí jako odeslané záznamy → párování podle pozice
+class ResultWriter:
+    def __init__(self, results_path, errors_path):
+        self.results_path = results_path
+        self.errors_path = errors_path
+        self.success_count = 0
+        self.created_count = 0
+        self.failure_count = 0
+        self.results_written = False
+        self.errors_written = False
+        # Staré výstupy z předchozího běhu by se míchaly s novými
+        for path in (results_path, errors_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # 🔗 Spojí odeslané řádky s odpověďmi a hned je zapíše na disk
+    @timed("results_write", rows_arg=1)
+    def write(self, df, response):
+        if len(df) != len(response):
+            raise ValueError(f"Počet výsledků ({len(response)}) neodpovídá počtu odeslaných řádků ({len(df)})")
+        result = results_frame(response, df.index)
+        out = pd.concat([df, result], axis=1)
+
+        out.to_csv(self.results_path, index=False, mode="a" if self.results_written else "w",
+                   header=not self.results_written)
+        self.results_written = True
+
+        errors = out[~result["Success"]]
+        if not errors.empty:
+            errors.to_csv(self.errors_path, index=False, mode="a" if self.errors_written else "w",
+                          header=not self.errors_written)
+            self.errors_written = True
+
+        self.success_count += int(result["Success"].sum())
+        self.created_count += int(result["Created"].sum())
+        self.failure_count += len(errors)
+        return out
+
+    @property
+    def updated_count(self):
+        return self.success_count - self.created_count
+
+
+# 📊 Odpovědi Bulk API → sloupce výsledku (index = index odeslaných řádků)
+def results_frame(response, index):
+    raw = pd.DataFrame.from_records(response, columns=["id", "success", "created", "errors"])
+    success = raw["success"].fillna(False).astype(bool).to_numpy()
+    created = raw["created"].fillna(False).astype(bool).to_numpy() & success
+    first_error = [e[0] if isinstance(e, list) and e else {} for e in raw["errors"]]
+    return pd.DataFrame({
+        "Salesforce_ID": raw["id"].where(success, None).to_numpy(),
+        "Success": success,
+        "Created": created,
+        "Updated": success & ~created,
+        "Chyba_kód": [e.get("statusCode") for e in first_error],
+        "Chyba_zpráva": [e.get("message") for e in first_error],
+    }, index=index)
@@ -0,0 +1,218 @@
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# 🧭 Spouštění GO LIVE skriptů podle závislostí – nezávislé větve běží paralelně
+#    Stage hotová s chybnými řádky (neprázdný soubor chyb) se nezapíše jako hotová → další spuštění pipeline
+#    ji zopakuje; delta pošle jen chybné a změněné řádky, navazující stage se spustí jen při změně jejích vstupů
+STATE_DIR = os.getenv("DELTA_STATE_DIR", "state")
+STATE_FILE = os.path.join(STATE_DIR, "pipeline.json")
+LOG_DIR = "logs"
+CREDENTIALS_FILE = "credentials.env"
+FAKE_SF_SCRIPT = "fake_salesforce.py"
+# Proměnné prostředí, které mění výsledek běhu → jsou součástí otisku stage
+FINGERPRINT_ENV = ["SF_USERNAME", "SF_DOMAIN", "FULL_UPLOAD", "SF_BULK_API", "PREFLIGHT", "ACCOUNT_INDEX_REBUILD",
+                   "FAKE_SF_URL", "ACCOUNT_DEDUP", "VERIFY_LOAD"]
+
+# 📋 Stage: skript, vstupní soubory, výstupní artefakty, soubory chybných řádků, předchozí stage
+STAGES = {
+    "accounts": {
+        "script": "accounts_import.py",
+        "inputs": ["accounts 28.3..xlsx", "AccountsMapping.sdl"],
+        "outputs": ["accounts_imported_out.csv"],
+        "errors": ["accounts_import_errors.csv"],
+        "after": [],
+    },
+    "contacts": {
+        "script": "contacts_import.py",
+        "inputs": ["contacts 28.3..xlsx", "ContactsMapping.sdl", "accounts_imported_out.csv"],
+        "outputs": [],
+        "errors": ["output/contacts_import_errors.csv"],
+        "after": ["accounts"],
+    },
+    "assets": {
+        "script": "assets_import.py",
+        "inputs": ["assets 28.3.2025 - Terminals.xlsx", "AssetsMapping.sdl", "accounts_imported_out.csv"],
+        "outputs": [],
+        "errors": ["output/assets_import_errors.csv"],
+        "after": ["accounts"],
+    },
+    "invoices": {
+        "script": "invoices_import.py",
+        "inputs": ["invoices  28.3..xlsx", "InvoicesMapping.sdl", "accounts_imported_out.csv"],
+        "outputs": [],
+        "errors": ["output/invoices_import_errors.csv"],
+        "after": ["accounts"],
+    },
+    "products": {
+        "script": "product_import.py",
+        "inputs": ["produkty 28.3..xlsx", "ProductMapping.sdl"],
+        "outputs": ["produkty_28.3_OUT.csv"],
+        "errors": ["produkty_28.3_errors.csv"],
+        "after": [],
+    },
+    "product_structure": {
+        "script": "import_product_structure.py",
+        "inputs": ["kusovníky 28.3..xlsx", "KusovnikMapping.sdl", "produkty_28.3_OUT.csv"],
+        "outputs": ["kusovnik_rollup.csv", "kusovnik_order.csv"],
+        "errors": ["product_structure_import_errors.csv"],
+        "after": ["products"],
+    },
+}
+
+
+# 🔑 Otisk stage = skript + sdílené moduly + vstupy + relevantní proměnné prostředí
+def stage_fingerprint(name):
+    stage = STAGES[name]
+    scripts = {s["script"] for s in STAGES.values()}
+    shared_modules = sorted(p for p in glob.glob("*.py") if p not in scripts and p not in (os.path.basename(__file__), FAKE_SF_SCRIPT))
+    h = hashlib.sha256()
+    for path in [stage["script"], *shared_modules, *stage["inputs"], CREDENTIALS_FILE]:
+        h.update(path.encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        else:
+            h.update(b"<missing>")
+    h.update(json.dumps({key: os.getenv(key) for key in FINGERPRINT_ENV}, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+# ▶️ Běh jednoho skriptu – výstup do logs/<stage>.log (paralelní výstupy by se míchaly)
+def run_stage(name, resume=False):
+    stage = STAGES[name]
+    log_path = os.path.join(LOG_DIR, f"{name}.log")
+    started = time.time()
+    command = [sys.executable, stage["script"]]
+    if os.getenv("FAKE_SF_URL"):
+        command = [sys.executable, FAKE_SF_SCRIPT, "run", stage["script"]]
+    if resume:
+        command.append("--resume")
+    with open(log_path, "w", encoding="utf-8") as log:
+        result = subprocess.run(command, stdout=log, stderr=subprocess.STDOUT,
+                                env={**os.environ, "PYTHONUNBUFFERED": "1"})
+    missing = [p for p in stage["outputs"] if not os.path.exists(p)]
+    ok = result.returncode == 0 and not missing
+    failed_rows = {p: count_rows(p) for p in stage["errors"] if ok and os.path.exists(p)}
+    status = ("⚠️" if failed_rows else "✅") if ok else "❌"
+    print(f"{status} {name} ({time.time() - started:.0f} s, log {log_path})"
+          + (f" – chybí výstupy: {missing}" if missing else "")
+          + "".join(f" – {count} chybných řádků v {p}" for p, count in failed_rows.items()))
+    return ok, not failed_rows
+
+
+# 🔢 Počet datových řádků CSV (bez hlavičky; buňky mohou obsahovat nové řádky)
+def count_rows(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return max(0, sum(1 for _ in csv.reader(f)) - 1)
+
+
+def run_pipeline(selected, force=False, jobs=3, resume=False):
+    os.makedirs(LOG_DIR, exist_ok=True)
+    state = load_state()
+    pending = {name: set(STAGES[name]["after"]) & set(selected) for name in selected}
+    done, failed, skipped, incomplete = set(), set(), set(), set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            # Stage s neúspěšnou závislostí se nespustí
+            for name in [n for n, deps in pending.items() if deps & failed]:
+                print(f"⛔ {name} přeskočeno – selhala závislost {sorted(pending[name] & failed)}")
+                failed.add(name)
+                del pending[name]
+
+            for name in [n for n, deps in pending.items() if deps <= done]:
+                del pending[name]
+                # Otisk až po doběhnutí závislostí – jejich výstupy jsou vstupy této stage
+                fingerprint = stage_fingerprint(name)
+                if not force and state.get(name) == fingerprint:
+                    print(f"⏭️ {name} beze změny – přeskočeno")
+                    skipped.add(name)
+                    done.add(name)
+                    continue
+                print(f"▶️ {name} spuštěno")
+                running[pool.submit(run_stage, name, resume)] = (name, fingerprint)
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprint = running.pop(future)
+                ok, complete = future.result()
+                if not ok:
+                    failed.add(name)
+                    continue
+                done.add(name)
+                if complete:
+                    state[name] = fingerprint
+                else:
+                    # Chybné řádky → bez otisku, příští běh stage zopakuje
+                    state.pop(name, None)
+                    incomplete.add(name)
+                save_state(state)
+
+    print(f"\n🏁 Hotovo: {len(done) - len(skipped)} spuštěno, {len(skipped)} přeskočeno, {len(failed)} selhalo")
+    if incomplete:
+        print(f"⚠️ S chybnými řádky: {', '.join(sorted(incomplete))} – po opravě dat spusťte pipeline znovu, "
+              f"tyto stage se zopakují (delta pošle jen chybné a změněné řádky)")
+    return not failed
+
+
+# 🔗 Vybrané stage včetně všech jejich předchůdců
+def with_dependencies(names):
+    selected = set()
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name not in selected:
+            selected.add(name)
+            stack.extend(STAGES[name]["after"])
+    return [name for name in STAGES if name in selected]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spuštění GO LIVE importů podle závislostí")
+    parser.add_argument("stages", nargs="*", help=f"jen tyto stage a jejich závislosti ({', '.join(STAGES)})")
+    parser.add_argument("--force", action="store_true", help="spustit i stage beze změny")
+    parser.add_argument("--jobs", type=int, default=3, help="max. počet paralelně běžících skriptů")
+    parser.add_argument("--resume", action="store_true",
+                        help="stage přerušené minule pokračují od posledního hotového batche")
+    parser.add_argument("--fake-sf", action="store_true",
+                        help="běh proti lokální náhradě Salesforce (fake_salesforce.py, volby FAKE_SF_*)")
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"neznámé stage: {', '.join(unknown)}")
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    selected = with_dependencies(args.stages) if args.stages else list(STAGES)
+    if args.fake_sf:
+        # Jeden server pro celou pipeline – child stage vidí accounty nahrané stage accounts
+        from fake_salesforce import default_options, start_server
+        _, os.environ["FAKE_SF_URL"] = start_server(default_options())
+        print(f"🧪 Fake Salesforce: {os.environ['FAKE_SF_URL']}")
+    sys.exit(0 if run_pipeline(selected, force=args.force, jobs=args.jobs, resume=args.resume) else 1)
@@ -0,0 +1,233 @@
+import os
+import re
+import shlex
+import unicodedata
+from functools import lru_cache
+import pandas as pd
+
+# 🗺️ SDL mapping (Data Loader) → zkompilovaný plán přejmenování a transformací nad celými sloupci
+#    Soubor se čte jako Java .properties: komentáře # a !, escapy (\ , \uXXXX, \=, \:), pokračování řádku "\"
+#    Odchylky kvůli ručně psaným SDL: mezera v klíči bez escapu patří ke klíči (oddělovač je "=" nebo ":")
+#    a opakovaný klíč nebo seznam cílů "A, B" = stejný sloupec do více polí (fan-out, např. Billing + Shipping)
+#
+#    Transformace cílových polí jsou v komentářích "#@", takže Data Loader je ignoruje:
+#      #@ Blocked__c = bool                   → True pro 1/true/yes/ano/x (nebo vlastní výčet), jinak False
+#                                               porovnává se text bez mezer a velikosti písmen, čísla z Excelu
+#                                               bez ".0" (1 i 1.0 → "1") – původní .apply v accounts_import
+#                                               porovnával přesný text, takže číselná 1 z Excelu byla False
+#      #@ Status__c = map 0:STATE_NEW 1:...   → picklist podle hodnoty, nenamapované → None
+#      #@ Total_Amount__c = number decimal-comma   → "1 234,5" → 1234.5, nečíselné → NaN
+#      #@ PartnerWeb_ORG_ID__c = number integer    → "508.0" → 508
+#      #@ Blocked_on_date__c = date %Y-%m-%d  → text data v daném formátu, neplatné → NaN
+#      #@ * = bool-auto                       → ostatní sloupce jen s hodnotami 0/1/True/False na boolean
+DIRECTIVE_PREFIX = "#@"
+DEFAULT_TRUE_VALUES = ("1", "true", "yes", "ano", "x")
+BOOLEAN_LIKE_VALUES = {0, 1, 0.0, 1.0, "0", "1", True, False}
+DEFAULT_DATE_FORMAT = "%Y-%m-%d"
+ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "f": "\f"}
+
+
+class TransformPlan:
+    def __init__(self, path, pairs, transforms, auto_bool):
+        self.path = path
+        # (zdroj, cíl) v pořadí souboru – první cíl zdroje je přejmenování, další jsou kopie
+        self.pairs = pairs
+        self.transforms = transforms
+        self.auto_bool = auto_bool
+        self.targets = {}
+        for source, target in pairs:
+            self.targets.setdefault(source, [])
+            if target not in self.targets[source]:
+                self.targets[source].append(target)
+        self.normalized = {}
+        for source in self.targets:
+            self.normalized.setdefault(normalize_column_name(source), source)
+        self.resolved = {}
+
+    # 🧭 Sloupec souboru → zdroj v SDL: nejdřív přesná shoda, pak po normalizaci (velikost písmen, mezery,
+    #    tečky, diakritika) – výsledek se pamatuje pro každou hlavičku (chunky mají stejné sloupce)
+    def resolve(self, columns):
+        key = tuple(columns)
+        if key not in self.resolved:
+            matched = {}
+            for column in columns:
+                if str(column).strip() in self.targets:
+                    matched[column] = str(column).strip()
+            for column in columns:
+                source = self.normalized.get(normalize_column_name(str(column)))
+                if column not in matched and source and source not in matched.values():
+                    matched[column] = source
+            rename = {column: self.targets[source][0] for column, source in matched.items()}
+            copies = [(self.targets[source][0], target) for source, target in self.pairs
+                      if source in matched.values() and target != self.targets[source][0]]
+            self.resolved[key] = rename, list(dict.fromkeys(copies))
+        return self.resolved[key]
+
+    # 🎯 Filtr sloupců souboru, ze kterých vzniknou daná cílová pole (usecols pro read_excel_chunks)
+    def source_filter(self, targets):
+        sources = {source for source, target in self.pairs if target in targets}
+        return lambda column: (str(column).strip() in sources
+                               or self.normalized.get(normalize_column_name(str(column))) in sources)
+
+    # 🏷️ Přejmenování podle SDL + kopie do dalších cílů (fan-out)
+    def rename(self, df):
+        rename, copies = self.resolve(df.columns)
+        df = df.rename(columns=rename)
+        for primary, target in copies:
+            df[target] = df[primary]
+        return df
+
+    # 🔁 Transformace cílových polí – každá jedna operace nad celým sloupcem
+    def transform(self, df):
+        for column, (kind, convert) in self.transforms.items():
+            if column in df.columns:
+                df[column] = convert(df[column])
+        if self.auto_bool:
+            for column in df.columns:
+                if column not in self.transforms and is_boolean_like(df[column]):
+                    print(f"🔁 Přetypovávám {column} na boolean (auto)")
+                    df[column] = self.auto_bool(df[column])
+        return df
+
+    def apply(self, df):
+        return self.transform(self.rename(df))
+
+    def describe(self):
+        mapping = {source: ", ".join(targets) for source, targets in self.targets.items()}
+        kinds = {column: kind for column, (kind, _) in self.transforms.items()}
+        return f"{mapping}" + (f"\n🔁 Transformace: {kinds}" if kinds else "")
+
+
+# 📥 Plán se kompiluje jednou – cache podle cesty, času změny a výchozích transformací skriptu
+#    defaults = transformace ve stejné syntaxi jako "#@" řádky (bez "#@"), SDL je může přepsat
+def load_plan(path, defaults=()):
+    stat = os.stat(path)
+    return compile_plan(os.path.abspath(path), stat.st_mtime_ns, stat.st_size, tuple(defaults))
+
+
+@lru_cache(maxsize=None)
+def compile_plan(path, mtime_ns, size, defaults):
+    pairs, directives = parse_sdl(path)
+    transforms, auto_bool = {}, None
+    for directive in [*defaults, *directives]:
+        target, _, spec = directive.partition("=")
+        target, spec = target.strip(), shlex.split(spec)
+        if not target or not spec:
+            raise ValueError(f"{path}: neplatná transformace '{directive}'")
+        kind, args = spec[0], spec[1:]
+        if kind == "bool-auto" and target == "*":
+            auto_bool = bool_transform(args)
+        elif kind in TRANSFORM_KINDS:
+            transforms[target] = (kind, TRANSFORM_KINDS[kind](args))
+        else:
+            raise ValueError(f"{path}: neznámá transformace '{kind}' u {target}")
+    return TransformPlan(path, pairs, transforms, auto_bool)
+
+
+# 📄 Čtení SDL – vrací dvojice (zdroj, cíl) v pořadí souboru a texty "#@" transformací
+def parse_sdl(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Java .properties jsou podle specifikace v ISO-8859-1
+        text = raw.decode("latin-1")
+
+    pairs, directives = [], []
+    for line in logical_lines(text):
+        if line.startswith(DIRECTIVE_PREFIX):
+            directives.append(line[len(DIRECTIVE_PREFIX):].strip())
+            continue
+        if line.startswith(("#", "!")):
+            continue
+        key, value = split_property(line)
+        source = unescape(key).strip()
+        for target in unescape(value).split(","):
+            if source and target.strip():
+                pairs.append((source, target.strip()))
+    return pairs, directives
+
+
+# 📜 Logické řádky – řádek končící lichým počtem "\" pokračuje na dalším (úvodní mezery se zahodí)
+def logical_lines(text):
+    buffer = ""
+    for physical in text.splitlines():
+        line = buffer + physical.lstrip()
+        trailing = len(line) - len(line.rstrip("\\"))
+        if trailing % 2 == 1 and not line.startswith(("#", "!")):
+            buffer = line[:-1]
+            continue
+        buffer = ""
+        if line.strip():
+            yield line.strip()
+    if buffer.strip():
+        yield buffer.strip()
+
+
+# ✂️ Klíč a hodnota – první neescapované "=" nebo ":" (bez nich první neescapovaná mezera)
+def split_property(line):
+    for separators in ("=:", " \t"):
+        escaped = False
+        for i, char in enumerate(line):
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char in separators:
+                return line[:i], line[i + 1:].strip()
+    return line, ""
+
+
+def unescape(text):
+    return re.sub(r"\\(u[0-9a-fA-F]{4}|.)", lambda m: chr(int(m.group(1)[1:], 16)) if len(m.group(1)) == 5
+                  else ESCAPES.get(m.group(1), m.group(1)), text)
+
+
+# 🔡 Porovnávací tvar názvu sloupce (bez diakritiky, mezer a interpunkce)
+def normalize_column_name(name):
+    folded = unicodedata.normalize("NFKD", name.strip().lower())
+    return re.sub(r"[^0-9a-z_]", "", "".join(c for c in folded if not unicodedata.combining(c)))
+
+
+# 🔤 Text hodnoty pro porovnání – čísla z Excelu bez ".0" (1.0 → "1")
+def value_text(series):
+    return series.astype(str).str.strip().str.replace(r"^(-?\d+)\.0$", r"\1", regex=True)
+
+
+def is_boolean_like(series):
+    return set(series.dropna().unique()).issubset(BOOLEAN_LIKE_VALUES)
+
+
+def bool_transform(args):
+    true_values = [value.lower() for value in args] or list(DEFAULT_TRUE_VALUES)
+    return lambda series: value_text(series).str.lower().isin(true_values).astype(bool)
+
+
+def map_transform(args):
+    mapping = dict(arg.split(":", 1) for arg in args)
+    return lambda series: value_text(series).map(mapping).astype(object)
+
+
+def number_transform(args):
+    def convert(series):
+        text = series.astype(str)
+        if "decimal-comma" in args:
+            text = text.str.replace(",", ".", regex=False).str.replace(" ", "", regex=False)
+        if "integer" in args:
+            text = text.str.replace(r"\.0$", "", regex=True)
+        return pd.to_numeric(text, errors="coerce")
+    return convert
+
+
+def date_transform(args):
+    fmt = args[0] if args else DEFAULT_DATE_FORMAT
+    return lambda series: pd.to_datetime(series, errors="coerce").dt.strftime(fmt)
+
+
+TRANSFORM_KINDS = {
+    "bool": bool_transform,
+    "map": map_transform,
+    "number": number_transform,
+    "date": date_transform,
+}
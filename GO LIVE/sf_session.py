@@ -0,0 +1,156 @@
+import atexit
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import requests
+from dotenv import load_dotenv
+from simple_salesforce import Salesforce, SalesforceLogin
+from simple_salesforce.exceptions import SalesforceError, SalesforceExpiredSession
+
+# 🔑 Sdílená session Salesforce – token a instance se ukládají na disk a další skripty je převezmou bez loginu
+#    Salesforce session vyprší po nečinnosti (výchozí 2 h, v orgu bývá kratší) → token se použije jen do
+#    SF_SESSION_IDLE_MINUTES od posledního použití a před prvním voláním se ověří; neplatný = nový login
+#    Během běhu se vypršelá session obnoví: REST volání sám simple_salesforce (INVALID_SESSION_ID → login),
+#    Bulk 1.0 / 2.0 volání loaderů přes session_retry() (nový login, handler z nového tokenu, jeden pokus znovu)
+#    Soubor obsahuje jen token (ne heslo), adresář 0700 a soubor 0600; SF_SESSION_CACHE=0 cache vypne
+STATE_DIR = os.getenv("DELTA_STATE_DIR", "state")
+SESSION_DIR = os.path.join(STATE_DIR, "sessions")
+SESSION_CACHE = os.getenv("SF_SESSION_CACHE", "1") == "1"
+SESSION_IDLE_MINUTES = float(os.getenv("SF_SESSION_IDLE_MINUTES", "60"))
+# Velikost poolu keep-alive spojení – souběžná volání (Collections, Bulk 2.0 polling) sdílí jednu session
+HTTP_POOL_SIZE = int(os.getenv("SF_HTTP_POOL_SIZE", "16"))
+CREDENTIALS_FILE = "credentials.env"
+
+EXPIRED_SESSION_CODES = ("INVALID_SESSION_ID", "InvalidSessionId")
+
+# Jedno připojení na proces (connect() volané znovu vrací stejný objekt)
+connection = None
+# Souběžná vlákna se stejným vypršelým tokenem se přihlásí jen jednou
+refresh_lock = threading.Lock()
+
+
+def connect():
+    global connection
+    if connection is not None:
+        return connection
+
+    load_dotenv(CREDENTIALS_FILE)
+    credentials = {
+        "username": os.getenv("SF_USERNAME"),
+        "password": os.getenv("SF_PASSWORD"),
+        "security_token": os.getenv("SF_TOKEN"),
+        "domain": os.getenv("SF_DOMAIN", "login"),  # "test" pro sandbox
+    }
+    if not all([credentials["username"], credentials["password"], credentials["security_token"]]):
+        print(f"❌ Chybí přihlašovací údaje v souboru {CREDENTIALS_FILE}.")
+        sys.exit(1)
+    http = pooled_session()
+    path = cache_path(credentials["username"], credentials["domain"])
+
+    def login():
+        session_id, instance = SalesforceLogin(session=http, **credentials)
+        save_session(path, session_id, instance, credentials)
+        return session_id, instance
+
+    sf = None
+    cached = load_session(path)
+    if cached:
+        sf = Salesforce(instance=cached["instance"], session_id=cached["session_id"], session=http)
+        try:
+            sf.limits()
+            print(f"🔑 Převzata uložená session ({cached['instance']}, nečinná {idle_minutes(cached):.0f} min)")
+        except SalesforceExpiredSession:
+            print("🔑 Uložená session vypršela – nové přihlášení")
+            sf = None
+    if sf is None:
+        session_id, instance = login()
+        sf = Salesforce(instance=instance, session_id=session_id, session=http)
+
+    # simple_salesforce obnovuje session jen u objektů přihlášených jménem a heslem → vlastní login
+    sf._salesforce_login_partial = login
+    if path:
+        atexit.register(touch_session, path, sf)
+    connection = sf
+    return sf
+
+
+# 🔁 Volání Bulk API s obnovou session – action() si handler (sf.bulk / sf.bulk2) sestaví při každém pokusu
+#    simple_salesforce obnovuje session jen u REST volání; Bulk 1.0 vrací InvalidSessionId (400), Bulk 2.0 a
+#    přímá call_salesforce volání 401 → nový login a jeden pokus znovu (volání musí být bezpečně opakovatelné)
+def session_retry(sf, action):
+    session_id = sf.session_id
+    try:
+        return action()
+    except SalesforceError as e:
+        if not is_expired_session(e):
+            raise
+        refresh_session(sf, session_id)
+        return action()
+
+
+def is_expired_session(error):
+    return isinstance(error, SalesforceExpiredSession) or any(code in str(error.content)
+                                                             for code in EXPIRED_SESSION_CODES)
+
+
+def refresh_session(sf, stale_session_id):
+    with refresh_lock:
+        if sf.session_id == stale_session_id:
+            print("🔑 Session vypršela během běhu – nové přihlášení")
+            sf._refresh_session()
+
+
+# 🌐 Jedna requests.Session pro REST, Bulk i Bulk 2.0 – pool se zvětší na existujících adaptérech
+def pooled_session():
+    http = requests.Session()
+    for adapter in http.adapters.values():
+        adapter.init_poolmanager(HTTP_POOL_SIZE, HTTP_POOL_SIZE)
+    return http
+
+
+# 📁 Soubor session podle uživatele a domény (sandbox a produkce se nepletou)
+def cache_path(username, domain):
+    if not SESSION_CACHE or not username:
+        return None
+    key = hashlib.sha256(f"{username}|{domain}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SESSION_DIR, f"{key}.json")
+
+
+def load_session(path):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if idle_minutes(cached) >= SESSION_IDLE_MINUTES:
+        return None
+    return cached
+
+
+def idle_minutes(cached):
+    return (time.time() - cached.get("last_used", 0)) / 60
+
+
+def save_session(path, session_id, instance, credentials):
+    if not path:
+        return
+    os.makedirs(SESSION_DIR, mode=0o700, exist_ok=True)
+    data = {"session_id": session_id, "instance": instance, "username": credentials["username"],
+            "domain": credentials["domain"], "last_used": time.time()}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+# ⏱️ Na konci procesu se posune čas posledního použití (jen pokud soubor patří stále této session)
+def touch_session(path, sf):
+    cached = load_session(path)
+    if cached and cached["session_id"] == sf.session_id:
+        save_session(path, sf.session_id, sf.sf_instance, cached)
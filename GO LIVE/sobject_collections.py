@@ -0,0 +1,87 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from more_itertools import chunked
+from simple_salesforce.exceptions import SalesforceError
+from bulk_upload import batch_failed_results, is_lock_error
+from metrics import stage
+
+# 🚚 Volba transportu podle počtu odesílaných záznamů – malé loady (delta opravy, produkty) přes
+#    sObject Collections (REST composite, 200 záznamů na volání, souběžně přes keep-alive session),
+#    velké přes Bulk API; u pár set záznamů se režie jobu (vytvoření, batch, polling, uzavření) nevyplatí
+#    SF_TRANSPORT=auto|collections|bulk, SF_COLLECTIONS_MAX_RECORDS = práh, SF_COLLECTIONS_PARALLEL = souběh
+TRANSPORT = os.getenv("SF_TRANSPORT", "auto")
+COLLECTIONS_MAX_RECORDS = int(os.getenv("SF_COLLECTIONS_MAX_RECORDS", "2000"))
+COLLECTIONS_PARALLEL = int(os.getenv("SF_COLLECTIONS_PARALLEL", "4"))
+COLLECTION_SIZE = 200  # limit sObject Collections na jedno volání
+DEFAULT_EXTERNAL_ID_FIELD = "Import_ID__c"
+
+# Poslední volba pro každý objekt – vypisuje se jen změna
+chosen_transports = {}
+
+
+# 🔀 Collections, nebo Bulk? (volá se před každým uploadem – u chunků podle počtu záznamů chunku)
+def use_collections(object_name, count):
+    collections = TRANSPORT == "collections" or (TRANSPORT == "auto" and count <= COLLECTIONS_MAX_RECORDS)
+    transport = "sObject Collections" if collections else "Bulk API"
+    if chosen_transports.get(object_name) != transport:
+        chosen_transports[object_name] = transport
+        print(f"🚚 {object_name}: {count} záznamů → {transport} (práh {COLLECTIONS_MAX_RECORDS}, SF_TRANSPORT={TRANSPORT})")
+    return collections
+
+
+# 📤 Upload přes sObject Collections – výsledky ve formátu Bulk API 1.0 ve stejném pořadí jako vstup
+#    Záznamy se zámkem se na konci zkusí ještě jednou sériově (souběžná volání mohla sdílet parent)
+#    checkpoint = UploadProgress – každé dokončené volání se hned zapíše (zamčené záznamy až po opakování)
+def collections_load(sf, object_name, records, operation="upsert", external_id_field=DEFAULT_EXTERNAL_ID_FIELD,
+                     max_parallel=COLLECTIONS_PARALLEL, checkpoint=None):
+    chunks = list(chunked(records, COLLECTION_SIZE))
+    print(f"📨 {object_name}: {len(chunks)} volání sObject Collections ({len(records)} záznamů, souběžně max {max_parallel})")
+    response = []
+    with stage("collections", len(records)), ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        for results in pool.map(lambda chunk: send_collection(sf, object_name, chunk, operation, external_id_field),
+                                chunks):
+            if checkpoint is not None:
+                checkpoint.batch_done(range(len(response), len(response) + len(results)), results)
+            response.extend(results)
+
+    locked = [i for i, r in enumerate(response) if is_lock_error(r)]
+    if locked:
+        print(f"🔁 Opakuji {len(locked)} zamčených záznamů sériově")
+        for indices in chunked(locked, COLLECTION_SIZE):
+            retried = send_collection(sf, object_name, [records[i] for i in indices], operation, external_id_field)
+            for i, res in zip(indices, retried):
+                response[i] = res
+            if checkpoint is not None:
+                checkpoint.batch_done(indices, retried)
+    return response
+
+
+def send_collection(sf, object_name, chunk, operation, external_id_field):
+    body = {"allOrNone": False, "records": [{"attributes": {"type": object_name}, **rec} for rec in chunk]}
+    if operation == "upsert":
+        method, path = "PATCH", f"composite/sobjects/{object_name}/{external_id_field}"
+    elif operation == "update":
+        method, path = "PATCH", "composite/sobjects"
+    elif operation == "insert":
+        method, path = "POST", "composite/sobjects"
+    else:
+        raise ValueError(f"sObject Collections nepodporují operaci {operation}")
+    try:
+        results = sf.restful(path, method=method, data=json.dumps(body, default=str))
+    except SalesforceError as e:
+        # Odmítnuté celé volání (neznámé pole, limit…) → chyba u každého záznamu volání
+        return batch_failed_results(chunk, f"sObject Collections: {e}")
+    return [normalize_result(r, operation) for r in results]
+
+
+# 🔁 Výsledek záznamu jako v Bulk API 1.0 (insert v Collections neposílá "created")
+def normalize_result(result, operation):
+    success = bool(result.get("success"))
+    return {
+        "success": success,
+        "created": result.get("created", operation == "insert" and success),
+        "id": result.get("id"),
+        "errors": [{"statusCode": e.get("statusCode"), "message": e.get("message"), "fields": e.get("fields") or []}
+                   for e in result.get("errors") or []],
+    }
@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# 🧪 Testy běží nad moduly ze složky GO LIVE; stav (delta, checkpointy, cache) do dočasné složky
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.update(METRICS="0", SF_SESSION_CACHE="0", EXCEL_CACHE="0",
+                  DELTA_STATE_DIR=tempfile.mkdtemp(prefix="golive-tests-"))
+
+
+# 🏢 Fake Salesforce ve vlákně + přihlášená session; volby serveru přes @pytest.mark.fake_sf(...)
+@pytest.fixture
+def fake_sf(request, monkeypatch):
+    import requests
+    import sf_session
+    from fake_salesforce import option_parser, start_server, redirect_requests
+
+    marker = request.node.get_closest_marker("fake_sf")
+    args = [f"--{key.replace('_', '-')}={value}" for key, value in (marker.kwargs if marker else {}).items()]
+    server, url = start_server(option_parser().parse_args(args))
+    monkeypatch.setattr(requests.Session, "__init__", requests.Session.__init__)
+    redirect_requests(url)
+    for key, value in {"SF_USERNAME": "fake@example.com", "SF_PASSWORD": "fake", "SF_TOKEN": "fake"}.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(sf_session, "connection", None)
+    yield server, sf_session.connect()
+    server.shutdown()
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "fake_sf(**options): volby fake_salesforce serveru pro fixture fake_sf")
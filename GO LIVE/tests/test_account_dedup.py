@@ -0,0 +1,65 @@
+import pandas as pd
+from account_dedup import (AccountDedup, MATCH_FIELDS, candidate_pairs, certain_duplicates, merge_plan,
+                           normalize_accounts, score_pair)
+
+ROWS = [
+    # Zdroj, Import_ID__c, Salesforce_ID, Name, E_mail__c, Phone, BillingStreet, BillingPostalCode, BillingCity
+    ("soubor", "ACC0001", None, "Bitcomp s.r.o.", "info@bitcomp.cz", "+420 777 123 456", "Hlavní 1", "602 00", "Brno"),
+    ("soubor", "ACC0002", None, "BITCOMP, s. r. o.", "INFO@bitcomp.cz", "777123456", "Hlavni 1", "60200", "Brno"),
+    ("org", None, "001000000000001", "Bitcomp sro", None, None, None, "60200", "Brno"),
+    ("soubor", "ACC0003", None, "Jiná firma a.s.", None, "00420 777 123 456", None, None, "Praha"),
+    ("soubor", "ACC0004", None, "Úplně jiná s.r.o.", "jina@example.com", None, None, "11000", "Praha"),
+]
+
+
+def accounts():
+    rows = pd.DataFrame([row + ("CZ",) for row in ROWS],
+                        columns=["Zdroj", "Import_ID__c", "Salesforce_ID", *MATCH_FIELDS])
+    keys = normalize_accounts(rows)
+    key_rows = keys.to_dict("records")
+    edges = [edge for edge in (score_pair(key_rows, i, j) for i, j in candidate_pairs(keys)) if edge]
+    return rows, keys, edges
+
+
+def test_normalized_keys_ignore_legal_form_case_and_prefix():
+    _, keys, _ = accounts()
+    assert keys["name"].tolist()[:3] == ["bitcomp"] * 3
+    assert keys.loc[0, "phone"] == keys.loc[1, "phone"] == keys.loc[3, "phone"] == "777123456"
+    assert keys.loc[0, "email"] == keys.loc[1, "email"]
+
+
+def test_edges_score_matching_fields():
+    _, _, edges = accounts()
+    scores = {(i, j): (score, reason) for i, j, score, reason in edges}
+    assert scores[(0, 1)] == (1.0, "název, e-mail, telefon, adresa")
+    assert scores[(0, 2)] == (0.6, "název")
+    assert scores[(0, 3)] == (0.3, "telefon")
+    assert not any(4 in pair for pair in scores)
+
+
+# Plán: jedna skupina přes všechny hrany, ponechává se account z org
+def test_merge_plan_keeps_org_account():
+    rows, _, edges = accounts()
+    plan = merge_plan(rows, edges)
+    assert plan["Cluster"].unique().tolist() == [1]
+    assert plan[["Zdroj", "Role"]].values.tolist()[0] == ["org", "ponechat"]
+    assert sorted(plan.loc[plan["Role"] == "sloučit", "Import_ID__c"]) == ["ACC0001", "ACC0002", "ACC0003"]
+
+
+# Samotný telefon (ACC0003) není jistá duplicita → ACCOUNT_DEDUP=skip ho odešle
+def test_certain_duplicates_skip_only_strong_matches():
+    rows, _, edges = accounts()
+    duplicates = certain_duplicates(rows, edges)
+    assert duplicates == {"ACC0002": ("ACC0001", "název, e-mail, telefon, adresa")}
+
+
+def test_filter_rejects_certain_duplicates():
+    dedup = AccountDedup(None, mode="skip")
+    dedup.duplicates = {"ACC0002": ("ACC0001", "e-mail")}
+    df = pd.DataFrame({"Import_ID__c": ["ACC0001", "ACC0002", "ACC0003"]})
+    records = df.to_dict("records")
+    kept, kept_records, rejected, response = dedup.filter(df, records)
+    assert kept_records == [records[0], records[2]]
+    assert rejected["Import_ID__c"].tolist() == ["ACC0002"]
+    assert response[0]["errors"][0]["statusCode"] == "DUPLICATE_LOCAL"
+    assert dedup.skipped_count == 1
@@ -0,0 +1,64 @@
+from batch_sizing import AdaptiveBatcher, record_bytes
+
+
+def ok():
+    return {"success": True, "errors": []}
+
+
+def failed(code, message=""):
+    return {"success": False, "errors": [{"statusCode": code, "message": message}]}
+
+
+def batcher(limit=1000):
+    b = AdaptiveBatcher("Contact", max_records=4000, max_bytes=10 ** 9, target_seconds=100, adaptive=True)
+    b.limit = limit
+    return b
+
+
+def test_lock_errors_halve_the_batch():
+    b = batcher()
+    b.observe(1000, 10, [failed("UNABLE_TO_LOCK_ROW")] * 100 + [ok()] * 900)
+    assert b.limit == 500
+
+
+def test_timeout_messages_count_as_pressure():
+    b = batcher()
+    b.observe(1000, 10, [failed("UNKNOWN_EXCEPTION", "Apex CPU time limit exceeded")] * 60 + [ok()] * 940)
+    assert b.limit == 500
+
+
+def test_slow_batch_shrinks_to_target_time():
+    b = batcher()
+    b.observe(1000, 250, [ok()] * 1000)
+    assert b.limit == 400
+
+
+def test_fast_full_batch_grows_up_to_max():
+    b = batcher(3000)
+    b.observe(3000, 10, [ok()] * 3000)
+    assert b.limit == 4000
+
+
+# Malý poslední batch (méně než limit) nic neříká o kapacitě → limit zůstává
+def test_partial_batch_keeps_limit():
+    b = batcher()
+    b.observe(300, 1, [ok()] * 300)
+    assert b.limit == 1000
+
+
+def test_limit_never_drops_below_minimum():
+    b = batcher(250)
+    b.observe(250, 10, [failed("UNABLE_TO_LOCK_ROW")] * 250)
+    assert b.limit == b.min_records == 200
+
+
+def test_disabled_adaptation_keeps_limit():
+    b = AdaptiveBatcher("Contact", max_records=1000, adaptive=False)
+    b.observe(1000, 10 ** 4, [failed("UNABLE_TO_LOCK_ROW")] * 1000)
+    assert b.limit == 1000
+
+
+def test_batches_respect_byte_limit():
+    records = [{"Name": "x" * 100} for _ in range(10)]
+    b = AdaptiveBatcher("Account", max_records=1000, max_bytes=3 * record_bytes(records[0]))
+    assert [len(chunk) for chunk, _ in b.batches(records)] == [3, 3, 3, 1]
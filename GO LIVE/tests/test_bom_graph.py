@@ -0,0 +1,72 @@
+import pandas as pd
+from bom_graph import BomGraph
+
+
+def graph(rows):
+    return BomGraph(pd.DataFrame(rows, columns=["product", "path", "component", "quantity", "unit"]))
+
+
+# P → A (2×) → B (3×), P → C; A má i vlastní kusovník
+TREE = [
+    ("P", "1.", "P", 1, "ks"),
+    ("P", "1. 1.", "A", 2, "ks"),
+    ("P", "1. 1. 1.", "B", 3, "ks"),
+    ("P", "1. 2.", "C", 1, "m"),
+    ("A", "1.", "A", 1, "ks"),
+    ("A", "1. 1.", "B", 3, "ks"),
+]
+
+
+def test_parents_come_before_components():
+    order = graph(TREE).topological_order()
+    position = {code: i for i, code in enumerate(order["code"])}
+    assert position["P"] < position["A"] < position["B"]
+    assert position["P"] < position["C"]
+    assert dict(zip(order["code"], order["level"])) == {"P": 0, "A": 1, "B": 2, "C": 1}
+
+
+def test_explode_multiplies_quantities_across_levels():
+    exploded = graph(TREE).explode(["P"])
+    assert sorted(exploded.itertuples(index=False, name=None)) == [("P", "A", 1, 2.0), ("P", "B", 2, 6.0),
+                                                                    ("P", "C", 1, 1.0)]
+    rollup = graph(TREE).rollup(["P"])
+    assert rollup[["component", "quantity", "unit"]].values.tolist() == [["B", 6.0, "ks"], ["C", 1.0, "m"]]
+
+
+# X obsahuje Y a Y obsahuje X → hrany cyklu se označí a z grafu vypadnou, zbytek zůstane v pořádku
+def test_cycle_rows_are_flagged():
+    bom = graph(TREE + [
+        ("X", "1.", "X", 1, "ks"),
+        ("X", "1. 1.", "Y", 1, "ks"),
+        ("Y", "1.", "Y", 1, "ks"),
+        ("Y", "1. 1.", "X", 1, "ks"),
+    ])
+    assert sorted(bom.cycle_codes) == ["X", "Y"]
+    assert bom.issue_codes.fillna("").tolist() == [""] * 6 + ["", "BOM_CYCLE", "", "BOM_CYCLE"]
+    assert set(bom.topological_order()["code"]) == {"P", "A", "B", "C", "X", "Y"}
+    assert len(bom.explode(["X"])) == 0
+
+
+def test_tree_errors_and_orphans():
+    bom = graph([
+        ("P", "1.", "P", 1, "ks"),
+        ("P", "1. 1.", "A", 1, "ks"),
+        ("P", "1. 1.", "B", 1, "ks"),
+        ("P", "1. 3. 1.", "C", 1, "ks"),
+        ("P", "1. x", "D", 1, "ks"),
+        ("Q", "1.", "R", 1, "ks"),
+        ("Q", "1. 1.", "S", 1, "ks"),
+    ])
+    assert bom.issue_codes.fillna("").tolist() == ["", "", "BOM_TREE", "BOM_ORPHAN", "BOM_TREE", "BOM_TREE",
+                                                   "BOM_ORPHAN"]
+
+
+def test_validate_rejects_flagged_rows():
+    rows = TREE + [("P", "1. 9. 1.", "Z", 1, "ks")]
+    bom = graph(rows)
+    df = pd.DataFrame({"Product_Code__c": [r[2] for r in rows]})
+    records = df.to_dict("records")
+    valid, valid_records, rejected, response = bom.validate(df, records, df.index)
+    assert len(valid) == len(valid_records) == 6
+    assert rejected["Product_Code__c"].tolist() == ["Z"]
+    assert response[0]["errors"][0]["statusCode"] == "BOM_ORPHAN"
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+import bulk2_upload
+from bulk2_upload import bulk2_load, job_results, row_keys
+from payload import frame_payload
+
+
+def accounts(count):
+    return pd.DataFrame({"Name": [f"Firma {i}" for i in range(count)],
+                         "Import_ID__c": [f"ACC{i:04d}" for i in range(count)]})
+
+
+@pytest.mark.fake_sf()
+def test_results_follow_sent_row_order(fake_sf):
+    _, sf = fake_sf
+    response = bulk2_load(sf, "Account", accounts(6), wait=0.01)
+    assert [r["success"] for r in response] == [True] * 6
+    assert len({r["id"] for r in response}) == 6
+
+
+# Selhaný job: zpracované řádky mají své výsledky, zbytek NOT_PROCESSED s chybou jobu (abort nesmí spadnout)
+@pytest.mark.fake_sf(job_failure_rate=1)
+def test_failed_job_returns_partial_results(fake_sf):
+    server, sf = fake_sf
+    response = bulk2_load(sf, "Account", accounts(6), wait=0.01)
+    assert [r["success"] for r in response] == [True] * 3 + [False] * 3
+    assert {r["errors"][0]["statusCode"] for r in response[3:]} == {"NOT_PROCESSED"}
+    assert "fake job failure" in response[3]["errors"][0]["message"]
+    assert len(server.org.records["Account"]) == 3
+
+
+def test_row_keys_number_identical_rows():
+    frame = pd.DataFrame({"Name": ["A", "B", "A"], "Phone": ["1", "#N/A", "1"]})
+    keys = row_keys(frame, ["Name", "Phone"])
+    assert keys[0] != keys[2]
+    assert keys[1] == "B\x1f\x1f0"
+
+
+# Výsledky jobu chodí rozdělené na úspěšné/chybné a v jiném pořadí → párují se podle klíče, ne podle pozice
+def test_job_results_align_shuffled_results(monkeypatch):
+    sent = accounts(4)
+    downloads = {
+        "successfulResults": pd.DataFrame({"sf__Id": ["001D", "001A"], "sf__Created": ["false", "true"],
+                                           "Name": ["Firma 3", "Firma 0"], "Import_ID__c": ["ACC0003", "ACC0000"]}),
+        "failedResults": pd.DataFrame({"sf__Id": [""], "sf__Error": ["DUPLICATE_VALUE:duplicitní hodnota"],
+                                       "Name": ["Firma 1"], "Import_ID__c": ["ACC0001"]}),
+    }
+    monkeypatch.setattr(bulk2_upload, "download_results", lambda sf, obj, job_id, kind: downloads[kind])
+    response = job_results(None, "Account", "750X", frame_payload(sent), "Import_ID__c", "job selhal")
+    assert [r["id"] for r in response] == ["001A", None, None, "001D"]
+    assert [r["created"] for r in response] == [True, False, False, False]
+    assert response[1]["errors"][0] == {"statusCode": "DUPLICATE_VALUE", "message": "duplicitní hodnota", "fields": []}
+    assert response[2]["errors"][0]["statusCode"] == "NOT_PROCESSED"
+
+
+# Insert bez externího Id: stejné řádky se rozliší pořadím výskytu
+def test_job_results_insert_identical_rows(monkeypatch):
+    sent = pd.DataFrame({"Name": ["A", "A", "B"]})
+    downloads = {"successfulResults": pd.DataFrame({"sf__Id": ["001B", "001X", "001Y"], "sf__Created": ["true"] * 3,
+                                                    "Name": ["B", "A", "A"]}),
+                 "failedResults": None}
+    monkeypatch.setattr(bulk2_upload, "download_results", lambda sf, obj, job_id, kind: downloads[kind])
+    response = job_results(None, "Account", "750X", frame_payload(sent), None)
+    assert [r["id"] for r in response] == ["001X", "001Y", "001B"]
@@ -0,0 +1,35 @@
+from bulk_upload import partition_by_parent
+
+
+def contacts(parents):
+    return [{"LastName": f"Kontakt {i}", "AccountId": parent} for i, parent in enumerate(parents)]
+
+
+def parents_of(records, batch):
+    return {records[i]["AccountId"] for i in batch if records[i]["AccountId"]}
+
+
+# Žádný parent nesmí být ve dvou paralelních batchích (zámek parentu → UNABLE_TO_LOCK_ROW)
+def test_parallel_batches_do_not_share_parents():
+    records = contacts(["A", "B", "A", "C", "B", "A", None, "D", None, "C"])
+    parallel, serial = partition_by_parent(records, range(len(records)), "AccountId", batch_size=4)
+    assert serial == []
+    for i, batch in enumerate(parallel):
+        assert len(batch) <= 4
+        assert batch == sorted(batch)
+        for other in parallel[i + 1:]:
+            assert not parents_of(records, batch) & parents_of(records, other)
+    assert sorted(i for batch in parallel for i in batch) == list(range(len(records)))
+
+
+def test_oversized_parent_group_goes_serial():
+    records = contacts(["A"] * 5 + ["B", "C"])
+    parallel, serial = partition_by_parent(records, range(len(records)), "AccountId", batch_size=2)
+    assert serial == [[0, 1], [2, 3], [4]]
+    assert sorted(i for batch in parallel for i in batch) == [5, 6]
+
+
+def test_only_given_indices_are_partitioned():
+    records = contacts(["A", "B", "A", "B"])
+    parallel, serial = partition_by_parent(records, [1, 3], "AccountId", batch_size=10)
+    assert (parallel, serial) == ([[1, 3]], [])
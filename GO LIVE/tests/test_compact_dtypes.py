@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+import compact_dtypes
+import payload
+from compact_dtypes import compact_column, compact_frame, text_frame
+from payload import frame_records, sanitize_frame
+
+
+@pytest.fixture
+def low_memory(monkeypatch):
+    monkeypatch.setattr(compact_dtypes, "LOW_MEMORY", True)
+    monkeypatch.setattr(payload, "LOW_MEMORY", True)
+
+
+def frame():
+    return pd.DataFrame({
+        "Country": ["CZ", "CZ", "SK", None] * 5,
+        "Name": [f"Firma {i}" for i in range(20)],
+        "Count": list(range(20)),
+        "Helios": pd.Series([1, None, 300, 4] * 5, dtype=object),
+        "Active": [True, False, None, True] * 5,
+        "ZIP": ["602 00", 60200, None, "110 00"] * 5,
+        "Amount": [1.0, 2.5, np.nan, 4.0] * 5,
+    })
+
+
+def test_compact_column_types():
+    df = frame()
+    assert isinstance(compact_column(df["Country"]).dtype, pd.CategoricalDtype)
+    assert compact_column(df["Name"]).dtype == compact_dtypes.TEXT_DTYPE
+    assert str(compact_column(df["Count"]).dtype) == "Int8"
+    assert str(compact_column(df["Helios"]).dtype) == "Int16"
+    assert str(compact_column(df["Active"]).dtype) == "boolean"
+    # Čísla i texty v jednom sloupci a floaty se nepřevádějí (změnily by odesílané hodnoty)
+    assert compact_column(df["ZIP"]).dtype == object
+    assert compact_column(df["Amount"]).dtype == float
+
+
+def test_compact_frame_is_noop_without_low_memory():
+    df = frame()
+    assert compact_frame(df, "test") is df
+
+
+# Kompaktní typy nesmí změnit odesílané záznamy (payload ani delta hashe)
+def test_compacted_frame_sends_same_records(low_memory):
+    df = frame()
+    compacted = compact_frame(df, "test")
+    assert compacted.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+    assert frame_records(sanitize_frame(compacted)) == frame_records(sanitize_frame(df))
+
+
+def test_text_frame_keeps_categories_and_blanks_missing(low_memory):
+    text = text_frame(compact_frame(frame(), "test"))
+    assert isinstance(text["Country"].dtype, pd.CategoricalDtype)
+    assert text["Country"].tolist()[:4] == ["CZ", "CZ", "SK", ""]
+    assert text["Helios"].tolist()[:2] == ["1", ""]
@@ -0,0 +1,62 @@
+import pytest
+import delta_state
+from delta_state import DeltaState
+
+
+class FakeOrg:
+    sf_instance = "test.my.salesforce.com"
+
+
+def records():
+    return [{"Import_ID__c": f"ACC{i:04d}", "Name": f"Firma {i}"} for i in range(3)]
+
+
+def ok():
+    return {"success": True}
+
+
+def failed():
+    return {"success": False}
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(delta_state, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(delta_state, "FULL_UPLOAD", False)
+
+
+def uploaded(rows, response):
+    state = DeltaState(FakeOrg(), "Account")
+    state.changed_mask(rows)
+    state.mark_uploaded(rows, response)
+    state.save()
+
+
+# Další běh pošle jen změněné záznamy a ty, které minule selhaly
+def test_next_run_sends_only_changed_or_failed():
+    rows = records()
+    uploaded(rows, [ok(), failed(), ok()])
+    rows[2]["Name"] = "Přejmenovaná firma"
+    state = DeltaState(FakeOrg(), "Account")
+    assert state.changed_mask(rows) == [False, True, True]
+    assert state.unchanged_count == 1
+
+
+def test_records_without_key_are_always_sent():
+    rows = [{"Import_ID__c": None, "Name": "Bez klíče"}]
+    uploaded(rows, [ok()])
+    assert DeltaState(FakeOrg(), "Account").changed_mask(rows) == [True]
+
+
+def test_full_upload_sends_everything(monkeypatch):
+    rows = records()
+    uploaded(rows, [ok()] * 3)
+    monkeypatch.setattr(delta_state, "FULL_UPLOAD", True)
+    assert DeltaState(FakeOrg(), "Account").changed_mask(rows) == [True] * 3
+
+
+def test_state_is_separate_per_org_and_object():
+    uploaded(records(), [ok()] * 3)
+    other_org = type("OtherOrg", (), {"sf_instance": "prod.my.salesforce.com"})()
+    assert DeltaState(other_org, "Account").changed_mask(records()) == [True] * 3
+    assert DeltaState(FakeOrg(), "Contact").changed_mask(records()) == [True] * 3
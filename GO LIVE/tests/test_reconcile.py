@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+from reconcile import ResultWriter, results_frame
+
+
+def ok(sf_id, created=True):
+    return {"success": True, "created": created, "id": sf_id, "errors": []}
+
+
+def failed(code, message):
+    return {"success": False, "created": False, "id": None,
+            "errors": [{"statusCode": code, "message": message, "fields": []}]}
+
+
+@pytest.fixture
+def writer(tmp_path):
+    return ResultWriter(str(tmp_path / "results.csv"), str(tmp_path / "errors.csv"))
+
+
+# Výsledek patří k řádku na stejné pozici – i když index odeslaných řádků není souvislý (přeskočené řádky)
+def test_results_follow_row_position():
+    result = results_frame([ok("001A"), failed("DUPLICATE_VALUE", "dup"), ok("001C", created=False)],
+                           pd.Index([4, 7, 9]))
+    assert result.index.tolist() == [4, 7, 9]
+    assert result["Salesforce_ID"].fillna("").tolist() == ["001A", "", "001C"]
+    assert result["Created"].tolist() == [True, False, False]
+    assert result["Updated"].tolist() == [False, False, True]
+    assert result.loc[7, "Chyba_kód"] == "DUPLICATE_VALUE"
+
+
+def test_writer_appends_chunks_and_counts(writer):
+    first = pd.DataFrame({"Name": ["A", "B"]}, index=[0, 1])
+    second = pd.DataFrame({"Name": ["C"]}, index=[2])
+    writer.write(first, [ok("001A"), failed("REQUIRED_FIELD_MISSING", "chybí")])
+    writer.write(second, [ok("001C", created=False)])
+
+    results = pd.read_csv(writer.results_path)
+    errors = pd.read_csv(writer.errors_path)
+    assert results["Name"].tolist() == ["A", "B", "C"]
+    assert results["Salesforce_ID"].tolist()[::2] == ["001A", "001C"]
+    assert errors["Name"].tolist() == ["B"]
+    assert (writer.success_count, writer.created_count, writer.updated_count, writer.failure_count) == (2, 1, 1, 1)
+
+
+def test_writer_rejects_misaligned_response(writer):
+    with pytest.raises(ValueError):
+        writer.write(pd.DataFrame({"Name": ["A", "B"]}), [ok("001A")])
+
+
+def test_writer_removes_previous_outputs(tmp_path):
+    (tmp_path / "results.csv").write_text("stary beh\n")
+    ResultWriter(str(tmp_path / "results.csv"), str(tmp_path / "errors.csv"))
+    assert not (tmp_path / "results.csv").exists()
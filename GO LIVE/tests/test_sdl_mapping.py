@@ -0,0 +1,103 @@
+import os
+import pandas as pd
+import pytest
+from sdl_mapping import load_plan, parse_sdl
+
+GO_LIVE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_sdl(tmp_path, text, name="Mapping.sdl"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+# Čísla z Excelu (1, 1.0) i text s mezerami/velkými písmeny jsou True – původní skript bral jen přesný text "1"/"true"
+def test_bool_accepts_excel_numbers(tmp_path):
+    plan = load_plan(write_sdl(tmp_path, "Blocked=Blocked__c\n#@ Blocked__c = bool 1 true\n"))
+    df = plan.apply(pd.DataFrame({"Blocked": [1, 1.0, "1.0", " TRUE", 0, "0.0", None, "ano"]}))
+    assert df["Blocked__c"].tolist() == [True, True, True, True, False, False, False, False]
+
+
+# Kusovník: "#@" transformace mění hodnoty polí (bez nich je plan.transform beze změny)
+def test_directives_transform_structure_fields(tmp_path):
+    sdl = ("Mnozstvi=Quantity__c\n"
+           "Merna\\ jednotka=Measure_of_Quantity__c\n"
+           "#@ Quantity__c = number decimal-comma\n"
+           "#@ Measure_of_Quantity__c = map ks:PCS m:METER\n")
+    plan = load_plan(write_sdl(tmp_path, sdl, "KusovnikMapping.sdl"))
+    df = pd.DataFrame({"Quantity__c": ["1 234,5", "2", "x"], "Measure_of_Quantity__c": ["ks", "m", "kg"]})
+    out = plan.transform(df.copy())
+    assert out["Quantity__c"].tolist()[:2] == [1234.5, 2.0]
+    assert pd.isna(out["Quantity__c"].iloc[2])
+    assert out["Measure_of_Quantity__c"].tolist()[:2] == ["PCS", "METER"]
+    assert pd.isna(out["Measure_of_Quantity__c"].iloc[2])
+
+
+def test_kusovnik_sdl_has_no_transforms():
+    plan = load_plan(os.path.join(GO_LIVE_DIR, "KusovnikMapping.sdl"))
+    df = pd.DataFrame({"Quantity__c": ["1,5"], "Tree_Number__c": [1.0]})
+    assert plan.transforms == {} and plan.auto_bool is None
+    assert plan.transform(df.copy()).equals(df)
+
+
+# Java .properties: escapy v klíči, \uXXXX, pokračování řádku; "#@" řádky jsou transformace, ostatní # a ! komentáře
+def test_parse_properties_and_directives(tmp_path):
+    sdl = ("#Mapping values\n"
+           "! komentář\n"
+           "Merna\\ jednotka=Measure_of_Quantity__c\n"
+           "Reg.\\u010D.\\ Produktu=Name\n"
+           "Billing Street=BillingStreet, \\\n"
+           "    ShippingStreet\n"
+           "City=BillingCity\n"
+           "City=ShippingCity\n"
+           "#@ Blocked__c = bool 1 true\n"
+           "#@   Status__c = map \"0:New state\" 1:Active\n")
+    pairs, directives = parse_sdl(write_sdl(tmp_path, sdl))
+    assert pairs == [("Merna jednotka", "Measure_of_Quantity__c"), ("Reg.č. Produktu", "Name"),
+                     ("Billing Street", "BillingStreet"), ("Billing Street", "ShippingStreet"),
+                     ("City", "BillingCity"), ("City", "ShippingCity")]
+    assert directives == ["Blocked__c = bool 1 true", 'Status__c = map "0:New state" 1:Active']
+
+
+def test_directive_arguments_are_shell_quoted(tmp_path):
+    plan = load_plan(write_sdl(tmp_path, 'Status=Status__c\n#@ Status__c = map "0:New state" 1:Active\n'))
+    df = plan.apply(pd.DataFrame({"Status": [0, 1.0]}))
+    assert df["Status__c"].tolist() == ["New state", "Active"]
+
+
+# Skript může dodat výchozí transformace, "#@" řádek v SDL je přepíše
+def test_sdl_directive_overrides_defaults(tmp_path):
+    path = write_sdl(tmp_path, "Active=IsActive__c\n#@ IsActive__c = bool ano\n")
+    plan = load_plan(path, defaults=("IsActive__c = bool 1", "* = bool-auto"))
+    df = plan.apply(pd.DataFrame({"Active": ["ano", "1"], "Flag": [1, 0]}))
+    assert df["IsActive__c"].tolist() == [True, False]
+    assert df["Flag"].tolist() == [True, False]
+
+
+@pytest.mark.parametrize("directive", ["Status__c = upper", "Status__c =", "= bool"])
+def test_invalid_directive_is_rejected(tmp_path, directive):
+    with pytest.raises(ValueError):
+        load_plan(write_sdl(tmp_path, f"Status=Status__c\n#@ {directive}\n"))
+
+
+def test_columns_resolve_after_normalization(tmp_path):
+    plan = load_plan(write_sdl(tmp_path, "Reg.\\u010D.\\ Produktu=Name\nE-mail=E_mail__c\n"))
+    df = plan.rename(pd.DataFrame({"REG. C. PRODUKTU ": ["P1"], "e-mail": ["a@b.cz"]}))
+    assert list(df.columns) == ["Name", "E_mail__c"]
+
+
+# Soubor z Data Loaderu v ISO-8859-1 (ne UTF-8)
+def test_latin1_sdl(tmp_path):
+    path = tmp_path / "Latin.sdl"
+    path.write_bytes(b"D\xe9lka=Length__c\n")
+    assert parse_sdl(str(path))[0] == [("D\u00e9lka", "Length__c")]
+
+
+# AccountsMapping.sdl: opakované klíče City/ZIP/… = fakturační i doručovací adresa
+def test_accounts_sdl_fans_out_address():
+    plan = load_plan(os.path.join(GO_LIVE_DIR, "AccountsMapping.sdl"))
+    assert plan.targets["City"] == ["BillingCity", "ShippingCity"]
+    df = plan.rename(pd.DataFrame({"City": ["Brno"], "Blocked": [1]}))
+    assert df[["BillingCity", "ShippingCity"]].iloc[0].tolist() == ["Brno", "Brno"]
+    assert sorted(plan.transforms) == ["Blocked__c", "Blocked_on_date__c", "Last_jnvoice_date__c", "Verified__c"]